@@ -1,12 +1,27 @@
 import os
-from dotenv import load_dotenv
-from flask import Flask, render_template, request
+import time
 
-from markowitz.data import get_price_data
-from markowitz.optimizer import optimize_portfolio, compute_efficient_frontier
-from markowitz.montecarlo import run_monte_carlo
-from markowitz.risk_free_rate import get_10year_treasury_rate
-from markowitz.capm import get_capm_expected_returns
+from dotenv import load_dotenv
+from flask import Flask, Response, g, jsonify, render_template, request, url_for
+
+# Solo módulos livianos: la página inicial no carga numpy/pandas/scipy/yfinance.
+# Las funciones del pipeline se importan al primer uso (ver markowitz.warmup).
+from markowitz import metrics
+from markowitz.charts import create_chart_store, to_binary
+from markowitz.jobs import STATUS_DONE, STATUS_ERROR, JobQueueFull, create_job_manager
+from markowitz.risk_free_rate import get_risk_free_rate_info, peek_risk_free_rate_info
+from markowitz.tickers import MAX_TICKERS, MIN_TICKERS, validate_tickers
+from markowitz.warmup import lazy_import, warm_up
+
+run_optimization = lazy_import("markowitz.pipeline", "run_optimization")
+parse_views = lazy_import("markowitz.black_litterman", "parse_views")
+run_batch = lazy_import("markowitz.batch", "run_batch")
+validate_baskets = lazy_import("markowitz.batch", "validate_baskets")
+run_sensitivity = lazy_import("markowitz.sensitivity", "run_sensitivity")
+validate_sweep = lazy_import("markowitz.sensitivity", "validate_sweep")
+backtest_tickers = lazy_import("markowitz.backtest", "backtest_tickers")
+validate_backtest = lazy_import("markowitz.backtest", "validate_backtest")
+get_default_universe_index = lazy_import("markowitz.universe", "get_default_universe_index")
 
 load_dotenv()
 
@@ -14,6 +29,33 @@ load_dotenv()
 def create_app():
     app = Flask(__name__)
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-key")
+    jobs = create_job_manager()
+    charts = create_chart_store()
+
+    @app.before_request
+    def _start_timing():
+        g.metrics_token = metrics.start_request()
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def _emit_server_timing(response):
+        token = g.pop("metrics_token", None)
+        if token is None:
+            return response
+        metrics.observe("request", time.perf_counter() - g.pop("request_start"))
+        spans = metrics.finish_request(token)
+        if spans:
+            response.headers["Server-Timing"] = metrics.server_timing_header(spans)
+        return response
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    @app.context_processor
+    def ticker_limits():
+        """Límites de la canasta para el formulario y sus textos (ver static/js/main.js)."""
+        return {"min_tickers": MIN_TICKERS, "max_tickers": MAX_TICKERS}
 
     @app.template_filter("pct")
     def format_pct(value, decimals=2):
@@ -25,6 +67,7 @@ def create_app():
     @app.route("/", methods=["GET", "POST"])
     def index():
         error = None
+        error_code = None
         result = None
         defaults = {"period": "5y"}
 
@@ -33,69 +76,13 @@ def create_app():
             period = request.form.get("period", defaults["period"])
             tickers = _parse_tickers(tickers_raw)
 
-            if not (5 <= len(tickers) <= 30):
-                error = "Debes ingresar entre 5 y 30 tickers."
-                try:
-                    risk_free_rate = get_10year_treasury_rate()
-                except Exception:
-                    risk_free_rate = 0.04
-                return render_template(
-                    "index.html",
-                    error=error,
-                    tickers_text=tickers_raw,
-                    period=period,
-                    risk_free_rate=risk_free_rate,
-                )
-
-            # Obtener tasa libre de riesgo del bono del tesoro a 10 años
             try:
-                risk_free_rate = get_10year_treasury_rate()
-            except Exception:
-                risk_free_rate = 0.04  # Fallback en caso de error
-
-            try:
-                prices = get_price_data(tickers, period=period)
-
-                # Calcular retornos esperados usando CAPM
-                capm_data = get_capm_expected_returns(prices, risk_free_rate, period=period)
-                expected_returns = capm_data['expected_returns']
-                betas = capm_data['betas']
-                market_return = capm_data['market_return']
-
-                # Optimizar portafolio usando retornos CAPM
-                opt = optimize_portfolio(prices, risk_free_rate=risk_free_rate, expected_returns_annual=expected_returns)
-                frontier = compute_efficient_frontier(prices, n_points=30, risk_free_rate=risk_free_rate, expected_returns_annual=expected_returns)
-
-                # Simulación de portafolios aleatorios
-                mc = run_monte_carlo(prices, n_portfolios=5000, risk_free_rate=risk_free_rate, expected_returns_annual=expected_returns)
-
-                rows = []
-                for i, ticker in enumerate(opt["tickers"]):
-                    rows.append(
-                        {
-                            "ticker": ticker,
-                            "weight": _to_float(opt["weights"][i]),
-                            "contrib_return": _to_float(opt["contrib_return"].iloc[i]),
-                            "contrib_var": _to_float(opt["contrib_var"].iloc[i]),
-                            "beta": _to_float(betas[ticker]),
-                            "volatility": _to_float(opt["individual_volatilities"][ticker]),  # Volatilidad anual del activo
-                            "expected_return_capm": _to_float(expected_returns[ticker]),
-                        }
-                    )
-
-                result = {
-                    "rows": rows,
-                    "expected_return": _to_float(opt["expected_return"]),
-                    "volatility": _to_float(opt["volatility"]),
-                    "sharpe": _to_float(opt["sharpe"]),
-                    "frontier": frontier,
-                    "montecarlo": mc,
-                    "risk_free_rate": _to_float(risk_free_rate),
-                    "market_return": _to_float(market_return),
-                }
-
-                # Sanitizar recursivamente TODOS los valores para asegurar tipos Python nativos
-                result = _sanitize_for_template(result)
+                validate_tickers(tickers)
+                result = run_optimization(tickers, period=period)
+            except ValueError as exc:
+                error = str(exc)
+                error_code = getattr(exc, "code", None)
+                print(f"ERROR CAPTURADO EN PROCESAMIENTO: {error}", flush=True)
             except Exception as exc:  # noqa: BLE001
                 error = str(exc)
                 print(f"ERROR CAPTURADO EN PROCESAMIENTO: {error}", flush=True)
@@ -104,102 +91,277 @@ def create_app():
 
             if error:
                 print(f"Retornando página de error con mensaje: {error}", flush=True)
+                rf_info = get_risk_free_rate_info()
                 return render_template(
                     "index.html",
                     error=error,
+                    error_code=error_code,
                     tickers_text=tickers_raw,
                     period=period,
-                    risk_free_rate=risk_free_rate,
+                    risk_free_rate=rf_info["rate"],
+                    risk_free_rate_source=rf_info["source"],
                 )
 
+            # La nube Monte Carlo no se incrusta en el HTML: el gráfico la pide aparte
+            columns = result["montecarlo"].pop("columns", None)
+            montecarlo_url = url_for("get_chart", token=charts.put(columns)) if columns else None
+
             # Renderizar resultado
-            return render_template(
-                "result.html",
-                result=result,
-                tickers=tickers,
-                period=period,
-            )
+            with metrics.span("render"):
+                return render_template(
+                    "result.html",
+                    result=result,
+                    tickers=tickers,
+                    period=period,
+                    montecarlo_url=montecarlo_url,
+                )
 
-        # Obtener tasa libre de riesgo para mostrar en la página inicial
-        try:
-            risk_free_rate = get_10year_treasury_rate()
-        except Exception:
-            risk_free_rate = 0.04  # Fallback en caso de error
+        # Tasa libre de riesgo para la página inicial (desde caché; si venció se
+        # revalida en segundo plano sin hacer esperar la respuesta)
+        rf_info = peek_risk_free_rate_info()
 
         return render_template(
             "index.html",
             error=error,
             tickers_text="",
             period=defaults["period"],
-            risk_free_rate=risk_free_rate,
+            risk_free_rate=rf_info["rate"],
+            risk_free_rate_source=rf_info["source"],
         )
 
-    return app
+    @app.route("/api/charts/<token>", methods=["GET"])
+    def get_chart(token):
+        """
+        Columnas float32 de un gráfico (ver markowitz.charts).
+        JSON con base64 por defecto; ?format=binary entrega las columnas
+        concatenadas en orden (nombres y largo en X-Chart-Columns y X-Chart-Length).
+        """
+        payload = charts.get(token)
+        if payload is None:
+            return jsonify({"error": "Gráfico no encontrado o expirado."}), 404
+        if request.args.get("format") == "binary":
+            response = Response(to_binary(payload), mimetype="application/octet-stream")
+            response.headers["X-Chart-Columns"] = ",".join(payload["columns"])
+            response.headers["X-Chart-Length"] = str(payload["length"])
+        else:
+            response = jsonify(payload)
+        response.headers["Cache-Control"] = "private, max-age=900"
+        return response
+
+    @app.route("/warmup", methods=["GET", "POST"])
+    def warmup():
+        """Importa el stack numérico y cachea la tasa libre de riesgo (ver markowitz.warmup)."""
+        return jsonify(warm_up())
+
+    @app.route("/api/jobs", methods=["POST"])
+    def submit_job():
+        """
+        Encola una optimización.
+        Body JSON: {"tickers": [...] | "AAA BBB", "period": "5y", "covariance": "ledoit_wolf",
+                    "views": [{"asset": "AAPL", "return": 0.12, "confidence": 0.6}, ...]}.
+        """
+        from markowitz.covariance import ESTIMATORS
+
+        payload = request.get_json(silent=True) or {}
+        period = payload.get("period", "5y")
+        covariance = payload.get("covariance")
+        views = payload.get("views")
 
+        try:
+            tickers = _parse_ticker_field(payload.get("tickers", []))
+            validate_tickers(tickers)
+            if covariance is not None and covariance not in ESTIMATORS:
+                raise ValueError(f"Estimador de covarianza no soportado: {covariance}")
+            if views is not None:
+                if not isinstance(views, list):
+                    raise ValueError("'views' debe ser una lista de vistas.")
+                parse_views(views, tickers)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
 
-def _to_float(value):
-    """
-    Convierte un valor (escalar, Series, numpy array) a float Python.
-    Maneja Series de pandas, numpy arrays, y escalares.
-    """
-    import numpy as np
-    import pandas as pd
+        try:
+            options = {"covariance": covariance} if covariance else {}
+            if views:
+                options["views"] = views
+            job_id = jobs.submit(run_optimization, tickers, period=period, **options)
+        except JobQueueFull as exc:
+            return jsonify({"error": str(exc)}), 503
+
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": url_for("get_job", job_id=job_id),
+        }), 202
+
+    @app.route("/api/batch", methods=["POST"])
+    def submit_batch():
+        """
+        Encola la optimización de varias canastas con una sola descarga.
+        Body JSON: {"baskets": [[...], "AAA BBB", ...], "period": "5y", "covariance": "sample"}.
+        El resultado (ver markowitz.batch.run_batch) se consulta en /api/jobs/<job_id>.
+        """
+        from markowitz.covariance import ESTIMATORS
+
+        payload = request.get_json(silent=True) or {}
+        baskets = payload.get("baskets")
+        period = payload.get("period", "5y")
+        covariance = payload.get("covariance")
 
-    if isinstance(value, pd.Series):
-        # Si es una Series con un solo valor, extraerlo
-        if len(value) == 1:
-            return float(value.iloc[0])
-        else:
-            raise ValueError(f"Se esperaba un valor escalar, pero se recibió una Series con {len(value)} elementos")
-    elif isinstance(value, np.ndarray):
-        # Si es un array numpy con un solo valor
-        if value.size == 1:
-            return float(value.item())
-        else:
-            raise ValueError(f"Se esperaba un valor escalar, pero se recibió un array con {value.size} elementos")
-    elif isinstance(value, np.generic):
-        # Si es un tipo numpy genérico (np.float64, np.int64, etc.)
-        return float(value.item())
-    else:
-        # Es un escalar, convertir a float
-        return float(value)
-
-
-def _sanitize_for_template(obj):
-    """
-    Recursively converts all pandas/numpy types to Python natives.
-    Ensures template can safely render all values.
-    """
-    import numpy as np
-    import pandas as pd
-
-    if isinstance(obj, dict):
-        return {key: _sanitize_for_template(value) for key, value in obj.items()}
-    elif isinstance(obj, (list, tuple)):
-        return [_sanitize_for_template(item) for item in obj]
-    elif isinstance(obj, (pd.Series, pd.DataFrame)):
-        raise ValueError(f"Found pandas {type(obj).__name__} that should have been converted")
-    elif isinstance(obj, np.ndarray):
-        if obj.size == 1:
-            return float(obj.item())
-        else:
-            return [_sanitize_for_template(item) for item in obj]
-    elif isinstance(obj, np.generic):
-        # Convert numpy scalar types to Python natives
-        return obj.item()
-    elif isinstance(obj, (np.integer, np.floating)):
-        return float(obj)
-    elif isinstance(obj, str):
-        return obj
-    elif isinstance(obj, (int, float, bool, type(None))):
-        return obj
-    else:
-        # For any other type, try to convert to float
         try:
-            return float(obj)
-        except (TypeError, ValueError):
-            # If conversion fails, return as-is and let validation catch it
-            return obj
+            if not isinstance(baskets, list):
+                raise ValueError("El campo 'baskets' debe ser una lista de canastas.")
+            baskets = [_parse_ticker_field(basket) for basket in baskets]
+            validate_baskets(baskets)
+            if covariance is not None and covariance not in ESTIMATORS:
+                raise ValueError(f"Estimador de covarianza no soportado: {covariance}")
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        try:
+            job_id = jobs.submit(run_batch, baskets, period=period, covariance=covariance)
+        except JobQueueFull as exc:
+            return jsonify({"error": str(exc)}), 503
+
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": url_for("get_job", job_id=job_id),
+            "n_baskets": len(baskets),
+        }), 202
+
+    @app.route("/api/sensitivity", methods=["POST"])
+    def submit_sensitivity():
+        """
+        Encola un análisis de sensibilidad sobre una canasta.
+        Body JSON: {"tickers": [...], "periods": ["1y", "5y"], "risk_free_rates": [0.02, 0.04],
+                    "return_models": ["capm", "historical"]}.
+        El resultado (ver markowitz.sensitivity.run_sensitivity) se consulta en /api/jobs/<job_id>.
+        """
+        from markowitz.covariance import ESTIMATORS
+        from markowitz.sensitivity import DEFAULT_PERIODS, RETURN_MODELS
+
+        payload = request.get_json(silent=True) or {}
+        periods = payload.get("periods", list(DEFAULT_PERIODS))
+        rates = payload.get("risk_free_rates")
+        return_models = payload.get("return_models", list(RETURN_MODELS))
+        covariance = payload.get("covariance")
+
+        try:
+            tickers = _parse_ticker_field(payload.get("tickers", []))
+            validate_tickers(tickers)
+            if not isinstance(periods, list) or not isinstance(return_models, list) or \
+                    (rates is not None and not isinstance(rates, list)):
+                raise ValueError("'periods', 'risk_free_rates' y 'return_models' deben ser listas.")
+            validate_sweep(periods, rates, return_models)
+            if covariance is not None and covariance not in ESTIMATORS:
+                raise ValueError(f"Estimador de covarianza no soportado: {covariance}")
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        try:
+            job_id = jobs.submit(run_sensitivity, tickers, periods=periods, risk_free_rates=rates,
+                                 return_models=return_models, covariance=covariance, as_lists=True)
+        except JobQueueFull as exc:
+            return jsonify({"error": str(exc)}), 503
+
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": url_for("get_job", job_id=job_id),
+        }), 202
+
+    @app.route("/api/backtest", methods=["POST"])
+    def submit_backtest():
+        """
+        Encola un backtest walk-forward de la cartera óptima.
+        Body JSON: {"tickers": [...], "period": "10y", "window": 252, "rebalance": "M",
+                    "objective": "max_sharpe", "transaction_cost": 0.001}.
+        El resultado (ver markowitz.backtest.backtest_tickers) se consulta en /api/jobs/<job_id>.
+        """
+        payload = request.get_json(silent=True) or {}
+        options = {
+            "period": payload.get("period", "10y"),
+            "window": payload.get("window", 252),
+            "rebalance": payload.get("rebalance", "M"),
+            "objective": payload.get("objective", "max_sharpe"),
+            "transaction_cost": payload.get("transaction_cost", 0.0),
+        }
+
+        try:
+            tickers = _parse_ticker_field(payload.get("tickers", []))
+            validate_tickers(tickers)
+            validate_backtest(**options)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
+        try:
+            job_id = jobs.submit(backtest_tickers, tickers, as_lists=True, **options)
+        except JobQueueFull as exc:
+            return jsonify({"error": str(exc)}), 503
+
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": url_for("get_job", job_id=job_id),
+        }), 202
+
+    @app.route("/api/jobs/<job_id>", methods=["GET"])
+    def get_job(job_id):
+        """Estado del trabajo; incluye `result` o `error` cuando terminó."""
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "Trabajo no encontrado o expirado."}), 404
+
+        body = {"job_id": job_id, "status": job["status"]}
+        if job["status"] == STATUS_DONE:
+            body["result"] = job["result"]
+        elif job["status"] == STATUS_ERROR:
+            body["error"] = job["error"]
+        return jsonify(body)
+
+    @app.route("/api/universe/screen", methods=["GET"])
+    def universe_screen():
+        """Screen sobre el índice precalculado: ?metric=beta&suffix=.SN&n=10&order=asc."""
+        index = get_default_universe_index()
+        if index is None:
+            return jsonify({"error": "El índice del universo no se ha precalculado."}), 404
+        try:
+            rows = index.screen(
+                metric=request.args.get("metric", "beta"),
+                n=request.args.get("n", 10, type=int),
+                suffix=request.args.get("suffix"),
+                ascending=request.args.get("order", "asc") != "desc",
+            )
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        return jsonify({"results": rows, "built_at": index.meta.get("built_at")})
+
+    @app.route("/api/universe/least-correlated/<ticker>", methods=["GET"])
+    def universe_least_correlated(ticker):
+        """Acciones del índice menos correlacionadas con `ticker`: ?n=10&suffix=.SN."""
+        index = get_default_universe_index()
+        if index is None:
+            return jsonify({"error": "El índice del universo no se ha precalculado."}), 404
+        try:
+            rows = index.least_correlated(
+                ticker.upper(),
+                n=request.args.get("n", 10, type=int),
+                suffix=request.args.get("suffix"),
+            )
+        except KeyError as exc:
+            return jsonify({"error": exc.args[0]}), 404
+        return jsonify({"results": rows, "built_at": index.meta.get("built_at")})
+
+    return app
+
+
+def _parse_ticker_field(value):
+    """Tickers de un campo JSON: lista de strings o texto separado por espacios/comas."""
+    if isinstance(value, list):
+        value = " ".join(str(t) for t in value)
+    if not isinstance(value, str):
+        raise ValueError("Los tickers deben ser una lista o un texto.")
+    return _parse_tickers(value)
 
 
 def _parse_tickers(raw):
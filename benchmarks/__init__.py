@@ -0,0 +1 @@
+"""Benchmarks de rendimiento (ver bench_markowitz.py)."""
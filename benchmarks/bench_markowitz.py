@@ -0,0 +1,302 @@
+"""
+Benchmarks del núcleo numérico de markowitz con curvas de escalamiento.
+
+Genera paneles de precios sintéticos (sin red) y mide optimize_portfolio,
+compute_efficient_frontier, run_monte_carlo, calculate_betas, run_backtest y
+la limpieza de precios de get_price_data variando el número de activos, el largo del
+histórico y la cantidad de portafolios simulados. El caso run_optimization
+corre el pipeline completo leyendo los paneles con ReplaySource (ver
+markowitz.sources), sin almacén de precios ni caché de resultados.
+
+Uso:
+    python -m benchmarks.bench_markowitz --output bench.json
+    python -m benchmarks.bench_markowitz --quick --compare bench_baseline.json
+
+Con --compare se marca como regresión todo caso cuya mediana supere a la del
+baseline en más de --threshold (25% por defecto) y el proceso termina con
+código 1, para poder usarlo en CI.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from markowitz import pipeline, sources
+from markowitz.backtest import run_backtest
+from markowitz.capm import calculate_betas
+from markowitz.data import clean_price_panel
+from markowitz.density import CloudDensity
+from markowitz.model import MarketModel
+from markowitz.montecarlo import run_monte_carlo
+from markowitz.optimizer import compute_efficient_frontier, optimize_portfolio
+from markowitz.tickers import MAX_TICKERS, MIN_TICKERS
+
+FULL_GRID = {
+    "n_assets": [5, 10, 30, 100, 300, 1000],
+    "n_days": [252, 1260, 2520],
+    "n_portfolios": [5_000, 100_000, 1_000_000],
+}
+
+QUICK_GRID = {
+    "n_assets": [5, 30],
+    "n_days": [252],
+    "n_portfolios": [5_000],
+}
+
+# Si una corrida supera este tiempo no se prueban tamaños mayores del mismo caso
+DEFAULT_MAX_SECONDS = 30.0
+
+
+def synthetic_prices(n_assets, n_days, seed=123):
+    """Panel de precios con retornos normales correlacionados vía un factor común."""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0004, 0.01, n_days)
+    betas = rng.uniform(0.5, 1.5, n_assets)
+    idio = rng.normal(0.0, 0.01, (n_days, n_assets)) * rng.uniform(0.5, 2.0, n_assets)
+    returns = market[:, None] * betas + idio
+    dates = pd.bdate_range("2010-01-04", periods=n_days)
+    prices = 100 * np.cumprod(1 + returns, axis=0)
+    return pd.DataFrame(prices, index=dates, columns=[f"T{i:04d}" for i in range(n_assets)])
+
+
+def synthetic_market(prices, seed=321):
+    """Serie de índice de mercado alineada con `prices`."""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0004, 0.01, len(prices))
+    return pd.Series(100 * np.cumprod(1 + returns), index=prices.index, name="^GSPC")
+
+
+def replay_directory(prices, market):
+    """Directorio temporal con los paneles de `prices`, el índice y ^TNX para ReplaySource."""
+    directory = tempfile.mkdtemp(prefix="bench_replay_")
+    sources.write_panel(prices.assign(**{"^GSPC": market}), os.path.join(directory, "adj_close_1d.csv"))
+    sources.write_panel(pd.DataFrame({"^TNX": 4.0}, index=prices.index[-5:]),
+                        os.path.join(directory, "close_1d.csv"))
+    return directory
+
+
+@contextlib.contextmanager
+def _offline_pipeline(source):
+    """Pipeline contra `source`, sin almacén de precios y con la caché de resultados vacía."""
+    previous_source = sources.set_source(source)
+    previous_store = os.environ.get("PRICE_STORE_DIR")
+    os.environ["PRICE_STORE_DIR"] = ""
+    pipeline.result_cache.clear()
+    try:
+        yield
+    finally:
+        sources.set_source(previous_source)
+        if previous_store is None:
+            del os.environ["PRICE_STORE_DIR"]
+        else:
+            os.environ["PRICE_STORE_DIR"] = previous_store
+
+
+def _run_pipeline(ctx):
+    with _offline_pipeline(ctx["source"]):
+        return pipeline.run_optimization(ctx["tickers"], period="max")
+
+
+def _cases(grid):
+    """Genera (nombre, params, setup, fn) para cada combinación de la grilla."""
+    days_default = grid["n_days"][0]
+
+    for n_days in grid["n_days"]:
+        for n_assets in grid["n_assets"]:
+            params = {"n_assets": n_assets, "n_days": n_days}
+
+            def setup(n_assets=n_assets, n_days=n_days):
+                prices = synthetic_prices(n_assets, n_days)
+                return {"prices": prices, "model": MarketModel.from_prices(prices)}
+
+            yield "market_model", params, setup, lambda ctx: MarketModel.from_prices(ctx["prices"])
+            yield "optimize_portfolio", params, setup, lambda ctx: optimize_portfolio(
+                model=ctx["model"], risk_free_rate=0.02)
+            yield "min_variance_portfolio", params, setup, lambda ctx: optimize_portfolio(
+                model=ctx["model"], objective="min_variance")
+            yield "compute_efficient_frontier", params, setup, lambda ctx: compute_efficient_frontier(
+                model=ctx["model"], n_points=200)
+
+            # Ventana de un año (o la mitad del histórico si es más corto), rebalanceo mensual
+            yield "run_backtest", params, setup, lambda ctx, window=min(252, n_days // 2): run_backtest(
+                ctx["prices"], window=window, rebalance="M", risk_free_rate=0.02)
+
+            def betas_setup(n_assets=n_assets, n_days=n_days):
+                prices = synthetic_prices(n_assets, n_days)
+                return {"prices": prices, "market": synthetic_market(prices)}
+
+            yield "calculate_betas", params, betas_setup, lambda ctx: calculate_betas(
+                ctx["prices"], ctx["market"])
+
+            def clean_setup(n_assets=n_assets, n_days=n_days):
+                prices = synthetic_prices(n_assets, n_days)
+                prices.iloc[::50, 0] = np.nan  # filas incompletas como las de Yahoo
+                return {"prices": prices, "tickers": list(prices.columns)}
+
+            yield "clean_price_panel", params, clean_setup, lambda ctx: clean_price_panel(
+                ctx["prices"], ctx["tickers"])
+
+            def pipeline_setup(n_assets=n_assets, n_days=n_days):
+                prices = synthetic_prices(n_assets, n_days)
+                source = sources.ReplaySource(replay_directory(prices, synthetic_market(prices)))
+                source.panel()  # lectura del CSV fuera de la medición
+                return {"source": source, "tickers": list(prices.columns)}
+
+            if MIN_TICKERS <= n_assets <= MAX_TICKERS:
+                yield "run_optimization", params, pipeline_setup, _run_pipeline
+
+    for n_portfolios in grid["n_portfolios"]:
+        for n_assets in grid["n_assets"]:
+            params = {"n_assets": n_assets, "n_days": days_default, "n_portfolios": n_portfolios}
+
+            def mc_setup(n_assets=n_assets):
+                return {"model": MarketModel.from_prices(synthetic_prices(n_assets, days_default))}
+
+            yield "run_monte_carlo", params, mc_setup, lambda ctx, n=n_portfolios: run_monte_carlo(
+                model=ctx["model"], n_portfolios=n, as_dicts=False)
+            yield "monte_carlo_density", params, mc_setup, lambda ctx, n=n_portfolios: run_monte_carlo(
+                model=ctx["model"], n_portfolios=n, as_dicts=False, density=CloudDensity(),
+                keep_points=False)["density"].to_dict()
+
+
+def run_benchmarks(grid, repeats=3, max_seconds=DEFAULT_MAX_SECONDS, only=None, log=print):
+    """
+    Ejecuta la grilla y devuelve la lista de resultados.
+    Cada resultado: {case, params, median, min, repeats} o {case, params, skipped}.
+    """
+    results = []
+    too_slow = {}  # caso -> params de la primera corrida que superó max_seconds
+
+    for name, params, setup, fn in _cases(grid):
+        if only and name not in only:
+            continue
+        if _dominated(params, too_slow.get(name)):
+            results.append({"case": name, "params": params, "skipped": "tamaño menor ya superó max_seconds"})
+            continue
+
+        ctx = setup()
+        timings = []
+        for _ in range(repeats):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                fn(ctx)
+                timings.append(time.perf_counter() - start)
+            if timings[-1] > max_seconds:
+                too_slow[name] = params
+                break
+
+        entry = {
+            "case": name,
+            "params": params,
+            "median": statistics.median(timings),
+            "min": min(timings),
+            "repeats": len(timings),
+        }
+        results.append(entry)
+        log(f"{name:28s} {_format_params(params):45s} {entry['median'] * 1000:10.2f} ms")
+
+    return results
+
+
+def compare(results, baseline, threshold=0.25):
+    """
+    Compara medianas contra un baseline.
+    Devuelve lista de regresiones {case, params, baseline, current, ratio}.
+    """
+    reference = {
+        _key(entry): entry["median"]
+        for entry in baseline.get("results", [])
+        if "median" in entry
+    }
+    regressions = []
+    for entry in results:
+        if "median" not in entry:
+            continue
+        base = reference.get(_key(entry))
+        if base is None or base <= 0:
+            continue
+        ratio = entry["median"] / base
+        if ratio > 1 + threshold:
+            regressions.append({
+                "case": entry["case"],
+                "params": entry["params"],
+                "baseline": base,
+                "current": entry["median"],
+                "ratio": ratio,
+            })
+    return regressions
+
+
+def _key(entry):
+    return entry["case"], json.dumps(entry["params"], sort_keys=True)
+
+
+def _dominated(params, slow_params):
+    """True si `params` es al menos tan grande como una corrida que ya fue lenta."""
+    if slow_params is None:
+        return False
+    return all(params.get(k, 0) >= v for k, v in slow_params.items())
+
+
+def _format_params(params):
+    return " ".join(f"{k}={v}" for k, v in params.items())
+
+
+def _metadata():
+    import scipy
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="bench_results.json", help="Archivo JSON de salida")
+    parser.add_argument("--compare", help="JSON de baseline contra el cual comparar")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Tolerancia relativa de regresión")
+    parser.add_argument("--quick", action="store_true", help="Grilla reducida (para CI)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, default=DEFAULT_MAX_SECONDS)
+    parser.add_argument("--only", nargs="*", help="Casos a ejecutar (por defecto todos)")
+    args = parser.parse_args(argv)
+
+    grid = QUICK_GRID if args.quick else FULL_GRID
+    results = run_benchmarks(grid, repeats=args.repeats, max_seconds=args.max_seconds, only=args.only)
+
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump({"meta": _metadata(), "results": results}, fh, indent=2)
+    print(f"Resultados guardados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, threshold=args.threshold)
+        for reg in regressions:
+            print(
+                f"REGRESIÓN {reg['case']} {_format_params(reg['params'])}: "
+                f"{reg['baseline'] * 1000:.2f} ms -> {reg['current'] * 1000:.2f} ms (x{reg['ratio']:.2f})"
+            )
+        if regressions:
+            return 1
+        print("Sin regresiones respecto al baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
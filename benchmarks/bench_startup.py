@@ -0,0 +1,123 @@
+"""
+Benchmark del arranque en frío de la app.
+
+Cada repetición corre en un intérprete nuevo y mide:
+    import_app      importar app.py (crea la app)
+    first_landing   importar app.py y servir GET / por primera vez
+    warmup          GET /warmup a continuación (importa el stack numérico)
+
+Además verifica que la página inicial no haya cargado ningún módulo de
+markowitz.warmup.HEAVY_MODULES (la revalidación de la tasa que programa en
+segundo plano no se ejecuta durante la medición). La descarga de la tasa
+libre de riesgo se reemplaza por una grabación vacía (PRICE_SOURCE=replay),
+así que no usa red.
+
+Uso:
+    python -m benchmarks.bench_startup --output startup.json
+    python -m benchmarks.bench_startup --compare startup_baseline.json
+
+Termina con código 1 si la página inicial cargó módulos pesados o, con
+--compare, si algún caso es más lento que el baseline por sobre --threshold.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.bench_markowitz import _metadata, compare
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# La revalidación de la tasa que programa la página inicial corre en otro
+# hilo e importa pandas/yfinance; se registra sin ejecutarla para medir (y
+# verificar) solo el camino de la solicitud.
+_CHILD = """
+import json, time
+from markowitz import risk_free_rate
+scheduled = []
+risk_free_rate._start_refresh = lambda: scheduled.append(True)
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+assert client.get("/").status_code == 200
+landing = time.perf_counter()
+from markowitz.warmup import loaded_heavy_modules
+heavy = loaded_heavy_modules()
+assert scheduled, "la página inicial no programó la revalidación de la tasa"
+risk_free_rate.clear_risk_free_rate_cache()
+assert client.get("/warmup").status_code == 200
+warm = time.perf_counter()
+print(json.dumps({"import_app": imported - start, "first_landing": landing - start,
+                  "warmup": warm - landing, "heavy_on_landing": heavy}))
+"""
+
+CASES = ("import_app", "first_landing", "warmup")
+
+
+def run_once():
+    """Una medición en un proceso nuevo: dict con los segundos de cada caso y heavy_on_landing."""
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, PRICE_SOURCE="replay", PRICE_SOURCE_DIR=directory,
+                   PRICE_STORE_DIR="", RESULT_CACHE_DIR="")
+        completed = subprocess.run([sys.executable, "-c", _CHILD], cwd=ROOT, env=env,
+                                   capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure_startup(repeats=5, log=print):
+    """
+    Repite run_once y devuelve (results, heavy_on_landing), con results en el
+    formato de bench_markowitz ({case, params, median, min, repeats}).
+    """
+    runs = [run_once() for _ in range(repeats)]
+    heavy = sorted({name for run in runs for name in run["heavy_on_landing"]})
+    results = []
+    for case in CASES:
+        timings = [run[case] for run in runs]
+        entry = {"case": case, "params": {}, "median": statistics.median(timings),
+                 "min": min(timings), "repeats": len(timings)}
+        results.append(entry)
+        log(f"{case:28s} {entry['median'] * 1000:10.2f} ms")
+    return results, heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="startup_results.json", help="Archivo JSON de salida")
+    parser.add_argument("--compare", help="JSON de baseline contra el cual comparar")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Tolerancia relativa de regresión")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results, heavy = measure_startup(repeats=args.repeats)
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump({"meta": _metadata(), "results": results, "heavy_on_landing": heavy}, fh, indent=2)
+    print(f"Resultados guardados en {args.output}")
+
+    status = 0
+    if heavy:
+        print(f"REGRESIÓN la página inicial cargó módulos pesados: {', '.join(heavy)}")
+        status = 1
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, threshold=args.threshold)
+        for reg in regressions:
+            print(
+                f"REGRESIÓN {reg['case']}: "
+                f"{reg['baseline'] * 1000:.2f} ms -> {reg['current'] * 1000:.2f} ms (x{reg['ratio']:.2f})"
+            )
+        if regressions:
+            status = 1
+        elif not heavy:
+            print("Sin regresiones respecto al baseline.")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
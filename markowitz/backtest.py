@@ -0,0 +1,319 @@
+"""
+Backtesting walk-forward con ventana móvil.
+
+En cada fecha de rebalanceo se re-optimiza con los retornos de la ventana
+inmediatamente anterior (sin mirar el futuro) y los pesos se mantienen, a la
+deriva con los precios, hasta el siguiente rebalanceo. Se registran los
+retornos realizados, el turnover de cada rebalanceo y el drawdown.
+
+La media y la covarianza de la ventana no se recalculan desde cero: se
+mantienen las sumas Σx y Σxx' de las filas de la ventana y al deslizarla se
+suman las filas que entran y se restan las que salen (RollingMoments). Cada
+optimización arranca en caliente desde los pesos del rebalanceo anterior.
+
+backtest_tickers descarga los precios de una canasta y corre el backtest;
+es lo que encola el endpoint /api/backtest.
+"""
+import numpy as np
+import pandas as pd
+
+from markowitz import metrics
+from markowitz.data import get_price_data
+from markowitz.model import TRADING_DAYS_PER_YEAR
+from markowitz.optimizer import OBJECTIVES, QP_MIN_ASSETS, optimize_slsqp
+from markowitz.qp import max_sharpe_weights, min_variance_weights
+from markowitz.risk_free_rate import get_risk_free_rate_info
+from markowitz.store import period_start
+from markowitz.tickers import validate_tickers
+
+# Frecuencias de rebalanceo por calendario (primer día hábil de cada periodo)
+REBALANCE_FREQUENCIES = {"W": "W", "M": "M", "Q": "Q", "Y": "Y"}
+
+# Cada cuántos deslizamientos se recalculan las sumas desde cero, para que el
+# error de redondeo acumulado por sumar y restar filas no crezca sin límite
+RESYNC_EVERY = 64
+
+
+class RollingMoments:
+    """
+    Media y covarianza muestral de las filas [start, stop) de `values`,
+    actualizadas incrementalmente al mover la ventana.
+
+    Deslizar k filas cuesta O(k·n²) en vez de O(ventana·n²). Las sumas se
+    acumulan sobre los datos centrados en la media de la primera ventana,
+    lo que evita la cancelación de Σxx' - n·μμ' cuando la media es grande
+    respecto a la dispersión.
+    """
+
+    def __init__(self, values, start, stop):
+        self.values = np.asarray(values, dtype=float)
+        self._shift = self.values[start:stop].mean(axis=0)
+        self._recompute(start, stop)
+
+    def _recompute(self, start, stop):
+        block = self.values[start:stop] - self._shift
+        self.start, self.stop = start, stop
+        self._sum = block.sum(axis=0)
+        self._cross = block.T @ block
+        self._updates = 0
+
+    def slide_to(self, start, stop):
+        """Mueve la ventana a [start, stop) (solo hacia adelante)."""
+        if start < self.start or stop < self.stop:
+            raise ValueError("RollingMoments solo avanza la ventana.")
+        if start >= self.stop or self._updates >= RESYNC_EVERY:
+            # Sin filas en común (o toca resincronizar): sale más barato recalcular
+            self._recompute(start, stop)
+            return
+        entering = self.values[self.stop:stop] - self._shift
+        leaving = self.values[self.start:start] - self._shift
+        self._sum += entering.sum(axis=0) - leaving.sum(axis=0)
+        self._cross += entering.T @ entering - leaving.T @ leaving
+        self.start, self.stop = start, stop
+        self._updates += 1
+
+    @property
+    def n_obs(self):
+        return self.stop - self.start
+
+    @property
+    def mean(self):
+        return self._shift + self._sum / self.n_obs
+
+    @property
+    def cov(self):
+        n_obs = self.n_obs
+        centered_mean = self._sum / n_obs
+        cov = (self._cross - n_obs * np.outer(centered_mean, centered_mean)) / (n_obs - 1)
+        return (cov + cov.T) / 2
+
+
+def validate_backtest(period="10y", window=TRADING_DAYS_PER_YEAR, rebalance="M",
+                      objective="max_sharpe", transaction_cost=0.0):
+    """Lanza ValueError si los parámetros del backtest no son válidos (sin descargar nada)."""
+    if not isinstance(period, str) or period in ("max", "ytd"):
+        raise ValueError(f"Periodo no soportado: {period}")
+    period_start(period)
+    if isinstance(window, bool) or not isinstance(window, int) or window < 2:
+        raise ValueError("La ventana debe ser un entero de al menos 2 retornos.")
+    if isinstance(rebalance, str):
+        if rebalance not in REBALANCE_FREQUENCIES:
+            raise ValueError(
+                f"Frecuencia de rebalanceo no soportada: {rebalance}. "
+                f"Opciones: {', '.join(REBALANCE_FREQUENCIES)} o un número de días."
+            )
+    elif isinstance(rebalance, bool) or not isinstance(rebalance, int) or rebalance < 1:
+        raise ValueError("La frecuencia de rebalanceo debe ser de al menos 1 día.")
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Objetivo no soportado: {objective}")
+    if isinstance(transaction_cost, bool) or not isinstance(transaction_cost, (int, float)) \
+            or not 0 <= transaction_cost < 1:
+        raise ValueError("El costo de transacción debe ser un número entre 0 y 1.")
+
+
+def rebalance_positions(index, window, rebalance):
+    """
+    Posiciones (en el índice de retornos) donde se rebalancea.
+
+    rebalance: entero (cada cuántos días hábiles) o "W", "M", "Q", "Y" (primer
+    día de cada semana, mes, trimestre o año). El primer rebalanceo es
+    siempre la primera fecha con `window` retornos previos.
+    """
+    n_obs = len(index)
+    if window < 2:
+        raise ValueError("La ventana debe tener al menos 2 retornos.")
+    if n_obs <= window:
+        raise ValueError(f"Se requieren más de {window} retornos para una ventana de {window} días.")
+
+    if isinstance(rebalance, str):
+        if rebalance not in REBALANCE_FREQUENCIES:
+            raise ValueError(
+                f"Frecuencia de rebalanceo no soportada: {rebalance}. "
+                f"Opciones: {', '.join(REBALANCE_FREQUENCIES)} o un número de días."
+            )
+        periods = pd.DatetimeIndex(index).to_period(REBALANCE_FREQUENCIES[rebalance]).asi8
+        starts = np.flatnonzero(periods[1:] != periods[:-1]) + 1
+        positions = np.concatenate([[window], starts[starts > window]])
+    else:
+        step = int(rebalance)
+        if step < 1:
+            raise ValueError("La frecuencia de rebalanceo debe ser de al menos 1 día.")
+        positions = np.arange(window, n_obs, step)
+    return positions.astype(int)
+
+
+def run_backtest(price_df, window=TRADING_DAYS_PER_YEAR, rebalance="M", risk_free_rate=0.0,
+                 objective="max_sharpe", solver="auto", transaction_cost=0.0):
+    """
+    Backtest walk-forward de la cartera óptima.
+
+    Args:
+        price_df: DataFrame de precios limpios (columnas = tickers), como el
+                  de get_price_data.
+        window: largo de la ventana de estimación, en retornos diarios.
+        rebalance: días hábiles entre rebalanceos o "W", "M", "Q", "Y".
+        risk_free_rate: tasa libre de riesgo anual (Sharpe y optimización).
+        objective: "max_sharpe" o "min_variance".
+        solver: "slsqp", "qp" o "auto" (como en optimize_portfolio).
+        transaction_cost: costo proporcional por unidad de turnover (p.ej.
+                          0.001 = 10 pb), descontado el día del rebalanceo.
+
+    Los retornos esperados son los promedios históricos de la ventana y la
+    covarianza la muestral (las únicas que se pueden deslizar fila a fila).
+    Si una optimización falla se mantienen los pesos vigentes.
+
+    Returns:
+        dict con:
+            - tickers: lista de tickers
+            - dates: DatetimeIndex de los días con retorno realizado
+            - returns: array de retornos diarios del portafolio (netos de costos)
+            - equity: array del valor acumulado (parte en 1)
+            - drawdown: array de la caída desde el máximo previo
+            - rebalance_dates: DatetimeIndex de los rebalanceos
+            - weights: array (rebalanceos x activos) con los pesos objetivo
+            - turnover: array con Σ|Δw| de cada rebalanceo (el primero, desde
+                        caja, vale 1)
+            - summary: dict con annual_return, annual_volatility, sharpe,
+                       max_drawdown, average_turnover, total_cost y failures
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Objetivo no soportado: {objective}")
+    if solver not in ("auto", "slsqp", "qp"):
+        raise ValueError(f"Solver no soportado: {solver}")
+
+    returns = price_df.pct_change().iloc[1:]
+    values = returns.to_numpy(dtype=float)
+    n_obs, n_assets = values.shape
+    if n_assets < 2:
+        raise ValueError("Se requieren al menos 2 activos válidos para el backtest.")
+    if solver == "auto":
+        solver = "qp" if n_assets >= QP_MIN_ASSETS else "slsqp"
+
+    positions = rebalance_positions(returns.index, window, rebalance)
+    bounds = np.append(positions[1:], n_obs)
+
+    moments = RollingMoments(values, positions[0] - window, positions[0])
+    portfolio_returns = np.empty(n_obs - positions[0])
+    all_weights = np.empty((positions.size, n_assets))
+    turnover = np.empty(positions.size)
+    held = np.zeros(n_assets)       # pesos a la deriva justo antes de rebalancear
+    previous = None                 # pesos objetivo del rebalanceo anterior
+    failures = 0
+    total_cost = 0.0
+
+    with metrics.span("backtest"):
+        for i, (start, end) in enumerate(zip(positions, bounds)):
+            moments.slide_to(start - window, start)
+            mean_annual = moments.mean * TRADING_DAYS_PER_YEAR
+            cov_annual = moments.cov * TRADING_DAYS_PER_YEAR
+            try:
+                weights = _solve(mean_annual, cov_annual, risk_free_rate, objective, solver, previous)
+            except ValueError as e:
+                print(f"Warning: rebalanceo {returns.index[start].date()} sin solución ({e}); se mantienen los pesos")
+                failures += 1
+                weights = held if previous is not None else np.full(n_assets, 1.0 / n_assets)
+            else:
+                weights = np.clip(weights, 0.0, None)
+                weights = weights / weights.sum()
+                previous = weights
+
+            traded = float(np.abs(weights - held).sum())
+            cost = transaction_cost * traded
+            total_cost += cost
+
+            # Compra y mantención hasta el próximo rebalanceo: valor relativo de
+            # cada activo y del portafolio en cada día del bloque
+            growth = np.cumprod(1.0 + values[start:end], axis=0)
+            value = (growth @ weights) * (1.0 - cost)
+            block = value / np.concatenate([[1.0], value[:-1]]) - 1.0
+            portfolio_returns[start - positions[0]:end - positions[0]] = block
+
+            held = weights * growth[-1] / (growth[-1] @ weights)
+            all_weights[i] = weights
+            turnover[i] = traded
+
+    equity = np.cumprod(1.0 + portfolio_returns)
+    peaks = np.maximum.accumulate(np.concatenate([[1.0], equity]))[1:]
+    drawdown = equity / peaks - 1.0
+
+    n_days = portfolio_returns.size
+    annual_return = float(equity[-1] ** (TRADING_DAYS_PER_YEAR / n_days) - 1.0)
+    annual_volatility = (
+        float(np.std(portfolio_returns, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)) if n_days > 1 else 0.0
+    )
+    mean_annual_return = float(np.mean(portfolio_returns) * TRADING_DAYS_PER_YEAR)
+    sharpe = (mean_annual_return - risk_free_rate) / annual_volatility if annual_volatility else float("nan")
+
+    return {
+        "tickers": list(returns.columns),
+        "dates": returns.index[positions[0]:],
+        "returns": portfolio_returns,
+        "equity": equity,
+        "drawdown": drawdown,
+        "rebalance_dates": returns.index[positions],
+        "weights": all_weights,
+        "turnover": turnover,
+        "summary": {
+            "annual_return": annual_return,          # CAGR
+            "annual_volatility": annual_volatility,
+            "sharpe": sharpe,                        # Anualizado (media aritmética)
+            "max_drawdown": float(drawdown.min()),
+            "average_turnover": float(turnover[1:].mean()) if turnover.size > 1 else 0.0,
+            "total_cost": total_cost,
+            "failures": failures,
+        },
+    }
+
+
+def _solve(mean_annual, cov_annual, risk_free_rate, objective, solver, previous):
+    """Optimización de una ventana arrancando desde los pesos anteriores."""
+    if solver == "qp":
+        if objective == "max_sharpe":
+            return max_sharpe_weights(mean_annual, cov_annual, risk_free_rate, x0=previous)
+        return min_variance_weights(cov_annual, x0=previous)
+    return optimize_slsqp(mean_annual, cov_annual, risk_free_rate, objective, x0=previous)
+
+
+def backtest_tickers(tickers, period="10y", window=TRADING_DAYS_PER_YEAR, rebalance="M",
+                     objective="max_sharpe", transaction_cost=0.0, risk_free_rate=None, as_lists=False):
+    """
+    Descarga los precios de `tickers` y corre run_backtest sobre ellos.
+
+    Args:
+        tickers: lista de tickers.
+        period: histórico a descargar (la primera ventana sale de su inicio).
+        risk_free_rate: tasa anual; por defecto la actual (get_risk_free_rate_info).
+        as_lists: devolver listas y fechas ISO (JSON) en vez de arrays e índices.
+        El resto como en run_backtest.
+
+    Returns:
+        El dict de run_backtest más period, risk_free_rate y risk_free_rate_source.
+    """
+    validate_tickers(tickers)
+    validate_backtest(period, window, rebalance, objective, transaction_cost)
+
+    with metrics.span("fetch"):
+        prices = get_price_data(tickers, period=period)
+    if risk_free_rate is None:
+        rate_info = get_risk_free_rate_info()
+        risk_free_rate, source = rate_info["rate"], rate_info["source"]
+    else:
+        source = "request"
+
+    result = run_backtest(prices, window=window, rebalance=rebalance, risk_free_rate=risk_free_rate,
+                          objective=objective, transaction_cost=transaction_cost)
+    result.update(period=period, risk_free_rate=risk_free_rate, risk_free_rate_source=source)
+    return _to_lists(result) if as_lists else result
+
+
+def _to_lists(result):
+    converted = {}
+    for key, value in result.items():
+        if isinstance(value, pd.DatetimeIndex):
+            value = [date.strftime("%Y-%m-%d") for date in value]
+        elif isinstance(value, np.ndarray):
+            value = value.tolist()
+        elif key == "summary":
+            value = {name: None if isinstance(v, float) and np.isnan(v) else v for name, v in value.items()}
+        converted[key] = value
+    return converted
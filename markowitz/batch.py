@@ -0,0 +1,135 @@
+"""
+Optimización por lotes de muchas canastas que comparten tickers.
+
+La unión de los tickers se descarga una sola vez y, para cada grupo de
+canastas con el mismo índice de mercado, retornos y covarianza se calculan
+una vez sobre la unión; cada canasta usa las submatrices de sus tickers
+(MarketModel.subset). Las optimizaciones por canasta corren en paralelo.
+
+El resultado de cada canasta es idéntico al de run_optimization: solo se
+reutiliza el modelo de la unión cuando la canasta, una vez limpia, cubre
+exactamente las mismas fechas y el estimador no depende del resto del
+universo (Ledoit-Wolf sí depende); si no, se construye su propio modelo.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from markowitz import metrics
+from markowitz.capm import market_candidates
+from markowitz.covariance import ESTIMATORS
+from markowitz.data import clean_price_panel
+from markowitz.fetch import fetch_batch_inputs
+from markowitz.model import MarketModel
+from markowitz.pipeline import DEFAULT_COVARIANCE, analyze_basket
+from markowitz.tickers import validate_tickers
+
+MAX_BATCH_BASKETS = int(os.getenv("MAX_BATCH_BASKETS", "100"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+# Estimadores cuya covarianza de un subconjunto es la submatriz de la del universo
+SLICEABLE_ESTIMATORS = ("sample", "ewma", "single_index")
+
+
+def validate_baskets(baskets):
+    """Lanza ValueError si el lote está vacío, es muy grande o alguna canasta es inválida."""
+    if not baskets:
+        raise ValueError("Debes enviar al menos una canasta.")
+    if len(baskets) > MAX_BATCH_BASKETS:
+        raise ValueError(f"Se admiten como máximo {MAX_BATCH_BASKETS} canastas por lote.")
+    for i, basket in enumerate(baskets, start=1):
+        try:
+            validate_tickers(basket)
+        except ValueError as exc:
+            raise ValueError(f"Canasta {i}: {exc}") from None
+
+
+def run_batch(baskets, period="5y", covariance=None, max_workers=BATCH_WORKERS):
+    """
+    Optimiza varias canastas con una sola descarga.
+
+    Returns:
+        dict con:
+            - results: lista en el orden de `baskets`; cada elemento es
+              {"tickers", "result"} (como run_optimization) o {"tickers", "error"}
+            - n_tickers: tamaño de la unión descargada
+            - shared_models: canastas que reutilizaron el modelo de la unión
+            - risk_free_rate, risk_free_rate_source
+    """
+    validate_baskets(baskets)
+    covariance = covariance or DEFAULT_COVARIANCE
+    if covariance not in ESTIMATORS:
+        raise ValueError(f"Estimador de covarianza no soportado: {covariance}")
+
+    with metrics.span("fetch"):
+        inputs = fetch_batch_inputs(baskets, period=period)
+    panel = inputs["prices"]
+
+    with metrics.span("model"):
+        plans = _plan_models(baskets, panel, inputs["market_prices"], covariance)
+
+    def solve(plan):
+        if "error" in plan:
+            return {"tickers": plan["tickers"], "error": plan["error"]}
+        try:
+            model = plan["model"] or MarketModel.from_prices(
+                plan["prices"], covariance=covariance, market_prices=plan["market_prices"])
+            result = analyze_basket(plan["prices"], model, plan["market_prices"], inputs["risk_free_rate"],
+                                    inputs["risk_free_rate_source"], period=period)
+        except Exception as exc:  # noqa: BLE001
+            print(f"Warning: canasta {plan['tickers']} falló: {exc}")
+            return {"tickers": plan["tickers"], "error": str(exc)}
+        return {"tickers": plan["tickers"], "result": result}
+
+    with metrics.span("optimize_batch"):
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="batch") as executor:
+            results = list(executor.map(solve, plans))
+
+    return {
+        "results": results,
+        "n_tickers": int(panel.shape[1]),
+        "shared_models": sum(1 for plan in plans if plan.get("model") is not None),
+        "risk_free_rate": inputs["risk_free_rate"],
+        "risk_free_rate_source": inputs["risk_free_rate_source"],
+    }
+
+
+def _plan_models(baskets, panel, market_prices, covariance):
+    """
+    Limpia cada canasta y le asigna el submodelo de la unión de su grupo de
+    mercado cuando es equivalente; model=None indica construir uno propio.
+    """
+    plans = []
+    for basket, market in zip(baskets, market_prices):
+        plan = {"tickers": list(basket), "market_prices": market, "model": None}
+        if isinstance(market, Exception):
+            plan["error"] = str(market)
+        else:
+            try:
+                plan["prices"] = clean_price_panel(panel.reindex(columns=basket), basket)
+            except ValueError as exc:
+                plan["error"] = str(exc)
+        plans.append(plan)
+
+    if covariance not in SLICEABLE_ESTIMATORS:
+        return plans
+
+    # Canastas con el mismo índice de mercado y exactamente las mismas fechas
+    # comparten el modelo de su unión
+    groups = {}
+    for plan in plans:
+        if "error" not in plan:
+            key = (tuple(market_candidates(plan["tickers"])), plan["prices"].index.asi8.tobytes())
+            groups.setdefault(key, []).append(plan)
+
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        union = list(dict.fromkeys(t for plan in members for t in plan["tickers"]))
+        union_prices = clean_price_panel(panel.reindex(columns=union), union)
+        if not union_prices.index.equals(members[0]["prices"].index):
+            continue
+        union_model = MarketModel.from_prices(union_prices, covariance=covariance,
+                                              market_prices=members[0]["market_prices"])
+        for plan in members:
+            plan["model"] = union_model.subset(plan["tickers"])
+    return plans
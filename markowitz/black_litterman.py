@@ -0,0 +1,221 @@
+"""
+Retornos esperados de Black-Litterman.
+
+El prior de equilibrio sale del mismo modelo de mercado que usa el resto
+del pipeline: por defecto los retornos CAPM rf + β(E[Rm] - rf) y, si se
+entregan pesos de mercado w, los retornos implícitos rf + δ Σ w. Las vistas
+del inversor (absolutas o relativas, cada una con su confianza) se combinan
+con el prior:
+
+    μ_BL = π + τ Σ P' (τ P Σ P' + Ω)⁻¹ (q - P π)
+
+Con Σ = L L' (el Cholesky ya cacheado en MarketModel) se tiene
+P Σ P' = (P L)(P L)', de modo que nunca se invierte Σ: cada cambio de vistas
+resuelve solo el sistema k x k de las vistas con su propio Cholesky.
+
+Los priors se cachean por (tickers, periodo, fecha del último dato,
+estimador, tasa libre de riesgo): cambiar las vistas no recalcula modelo,
+betas ni covarianza.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import LinAlgError, cho_factor, cho_solve
+
+from markowitz.capm import get_capm_expected_returns
+from markowitz.model import MarketModel
+
+# Escala de la incertidumbre del prior (τ) y aversión al riesgo (δ) por defecto
+DEFAULT_TAU = 0.05
+DEFAULT_RISK_AVERSION = 2.5
+
+# Confianza de una vista sin "confidence": Ω_jj = τ p Σ p' (la de He-Litterman)
+DEFAULT_VIEW_CONFIDENCE = 0.5
+
+# Priors guardados en memoria (LRU)
+PRIOR_CACHE_SIZE = int(os.getenv("BL_PRIOR_CACHE_SIZE", "32"))
+
+_lock = threading.Lock()
+_priors = OrderedDict()
+
+
+class EquilibriumPrior:
+    """
+    Prior de equilibrio π sobre un MarketModel, listo para combinar vistas.
+
+    Atributos:
+        model: MarketModel del universo
+        expected_returns: Series π (anual, en el orden de model.tickers)
+        tau: escala de la incertidumbre del prior
+        capm: dict de get_capm_expected_returns (None si π viene de pesos
+              de mercado sin CAPM)
+    """
+
+    def __init__(self, model, expected_returns, tau=DEFAULT_TAU, capm=None):
+        self.model = model
+        self.expected_returns = pd.Series(
+            model.expected_returns(expected_returns), index=model.tickers, dtype=float,
+        )
+        self.tau = tau
+        self.capm = capm
+
+    def posterior(self, views):
+        """
+        Retornos esperados a posteriori para `views` (ver parse_views).
+
+        Returns:
+            dict con:
+                - expected_returns: Series μ_BL (anual)
+                - prior: Series π
+                - views: lista de dicts {weights, return, confidence,
+                         prior_return, posterior_return} por vista
+        """
+        P, q, confidences = parse_views(views, self.model.tickers)
+        prior = self.expected_returns.to_numpy()
+        if P.shape[0] == 0:
+            return {"expected_returns": self.expected_returns.copy(), "prior": self.expected_returns.copy(),
+                    "views": []}
+
+        # P Σ P' = (P L)(P L)' con el Cholesky cacheado del modelo
+        projected = P @ self.model.cholesky
+        view_cov = self.tau * (projected @ projected.T)
+        omega = np.diag(view_cov) * (1 - confidences) / confidences
+        system = view_cov + np.diag(omega)
+        try:
+            factor = cho_factor(system, lower=True, check_finite=False)
+        except LinAlgError:
+            raise ValueError("Las vistas son redundantes o contradictorias con confianza total.") from None
+        correction = cho_solve(factor, q - P @ prior, check_finite=False)
+        posterior = prior + self.tau * (self.model.cholesky @ (projected.T @ correction))
+
+        tickers = self.model.tickers
+        return {
+            "expected_returns": pd.Series(posterior, index=tickers),
+            "prior": self.expected_returns.copy(),
+            "views": [
+                {
+                    "weights": {tickers[i]: float(P[j, i]) for i in np.flatnonzero(P[j])},
+                    "return": float(q[j]),
+                    "confidence": float(confidences[j]),
+                    "prior_return": float(P[j] @ prior),
+                    "posterior_return": float(P[j] @ posterior),
+                }
+                for j in range(P.shape[0])
+            ],
+        }
+
+
+def equilibrium_prior(model, risk_free_rate, capm=None, market_weights=None,
+                      risk_aversion=DEFAULT_RISK_AVERSION, tau=DEFAULT_TAU):
+    """
+    Construye el prior de equilibrio.
+
+    Args:
+        model: MarketModel del universo.
+        risk_free_rate: tasa libre de riesgo anual.
+        capm: dict de get_capm_expected_returns; sus retornos son π si no
+              se entregan pesos de mercado.
+        market_weights: pesos de mercado (Series por ticker o array); si se
+                        entregan, π = rf + δ Σ w.
+        risk_aversion: δ, solo con market_weights.
+        tau: escala de la incertidumbre del prior.
+    """
+    if market_weights is not None:
+        if isinstance(market_weights, pd.Series):
+            market_weights = market_weights.reindex(model.tickers).fillna(0.0)
+        weights = np.asarray(market_weights, dtype=float)
+        if weights.shape != (model.n_assets,) or weights.sum() <= 0:
+            raise ValueError("Los pesos de mercado deben cubrir los tickers del modelo.")
+        weights = weights / weights.sum()
+        implied = risk_free_rate + risk_aversion * (model.cov_operator @ weights)
+        return EquilibriumPrior(model, implied, tau=tau, capm=capm)
+    if capm is None:
+        raise ValueError("Se requieren los retornos CAPM o pesos de mercado para el prior.")
+    return EquilibriumPrior(model, capm["expected_returns"], tau=tau, capm=capm)
+
+
+def get_prior(prices, market_prices, risk_free_rate, period="5y", covariance="sample", tau=DEFAULT_TAU):
+    """
+    Prior CAPM cacheado por (tickers, periodo, fecha del último dato,
+    estimador, tasa libre de riesgo). En un acierto se reutilizan modelo,
+    betas y covarianza sin recalcular nada.
+    """
+    key = (
+        tuple(prices.columns), period, str(prices.index[-1].date()), covariance,
+        round(float(risk_free_rate), 6), market_prices.name, tau,
+    )
+    with _lock:
+        prior = _priors.get(key)
+        if prior is not None:
+            _priors.move_to_end(key)
+            return prior
+
+    model = MarketModel.from_prices(prices, covariance=covariance, market_prices=market_prices)
+    capm = get_capm_expected_returns(prices, risk_free_rate, period=period, model=model,
+                                     market_prices=market_prices)
+    prior = equilibrium_prior(model, risk_free_rate, capm=capm, tau=tau)
+
+    with _lock:
+        _priors[key] = prior
+        while len(_priors) > PRIOR_CACHE_SIZE:
+            _priors.popitem(last=False)
+    return prior
+
+
+def clear_prior_cache():
+    with _lock:
+        _priors.clear()
+
+
+def parse_views(views, tickers):
+    """
+    Convierte vistas a (P, q, confianzas). Cada vista es un dict con
+    "return" (anual), "confidence" opcional en (0, 1] y una de:
+
+        {"asset": "AAPL", "return": 0.12}                  # absoluta
+        {"long": "AAPL", "short": "MSFT", "return": 0.03}  # AAPL supera a MSFT
+        {"weights": {"AAPL": 0.5, "NVDA": 0.5, "MSFT": -1}, "return": 0.02}
+
+    Raises:
+        ValueError: si alguna vista está mal formada o usa tickers ajenos.
+    """
+    views = list(views or [])
+    position = {ticker: i for i, ticker in enumerate(tickers)}
+    P = np.zeros((len(views), len(tickers)))
+    q = np.empty(len(views))
+    confidences = np.empty(len(views))
+
+    for j, view in enumerate(views):
+        if not isinstance(view, dict):
+            raise ValueError(f"Vista {j + 1}: se esperaba un objeto.")
+        if "asset" in view:
+            weights = {view["asset"]: 1.0}
+        elif "long" in view and "short" in view:
+            if view["long"] == view["short"]:
+                raise ValueError(f"Vista {j + 1}: 'long' y 'short' deben ser activos distintos.")
+            weights = {view["long"]: 1.0, view["short"]: -1.0}
+        elif isinstance(view.get("weights"), dict) and view["weights"]:
+            weights = view["weights"]
+        else:
+            raise ValueError(f"Vista {j + 1}: indica 'asset', 'long'/'short' o 'weights'.")
+
+        for ticker, weight in weights.items():
+            ticker = str(ticker).strip().upper()
+            if ticker not in position:
+                raise ValueError(f"Vista {j + 1}: {ticker} no está en el portafolio.")
+            P[j, position[ticker]] += float(weight)
+        if not P[j].any():
+            raise ValueError(f"Vista {j + 1}: los pesos no pueden ser todos cero.")
+
+        try:
+            q[j] = float(view["return"])
+            confidences[j] = float(view.get("confidence", DEFAULT_VIEW_CONFIDENCE))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Vista {j + 1}: 'return' y 'confidence' deben ser números.") from None
+        if not 0 < confidences[j] <= 1:
+            raise ValueError(f"Vista {j + 1}: la confianza debe estar en (0, 1].")
+
+    return P, q, confidences
@@ -1,9 +1,18 @@
 """
 Módulo para calcular retornos esperados usando el modelo CAPM.
 """
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
 import numpy as np
 import pandas as pd
-import yfinance as yf
+
+from markowitz import metrics
+from markowitz.covariance import market_betas
+from markowitz.data import load_through_store
+from markowitz.singleflight import coalesced
+from markowitz.sources import get_source
+from markowitz.store import get_default_store
 
 
 # Candidatos de índice de mercado por sufijo, en orden de preferencia.
@@ -33,11 +42,11 @@ def infer_market_ticker(tickers):
     Retorna el primer candidato de índice de mercado según el sufijo común de los tickers.
     Para lógica con fallback usar get_market_data() directamente.
     """
-    candidates = _market_candidates(tickers)
+    candidates = market_candidates(tickers)
     return candidates[0]
 
 
-def _market_candidates(tickers):
+def market_candidates(tickers):
     """Lista ordenada de tickers candidatos a usar como proxy de mercado."""
     if not tickers:
         return ["^GSPC"]
@@ -57,88 +66,83 @@ def _market_candidates(tickers):
     return ["^GSPC"]
 
 
-def _extract_adj_close_series(market, market_ticker):
-    """
-    Extrae 'Adj Close' como pd.Series desde el DataFrame que devuelve yf.download.
-    Maneja columnas planas y MultiIndex en cualquier orientación sin usar squeeze()
-    (que colapsa a escalar si el DataFrame es de shape (1,1)).
-    """
-    if isinstance(market.columns, pd.MultiIndex):
-        level0 = market.columns.get_level_values(0)
-        level1 = market.columns.get_level_values(1)
-        if "Adj Close" in level0:
-            adj_close = market["Adj Close"]
-        elif "Adj Close" in level1:
-            adj_close = market.xs("Adj Close", level=1, axis=1)
-        elif "Close" in level0:
-            adj_close = market["Close"]
-        elif "Close" in level1:
-            adj_close = market.xs("Close", level=1, axis=1)
-        else:
-            raise ValueError(
-                f"No se encontró 'Adj Close' ni 'Close' para {market_ticker}. "
-                f"Columnas: {market.columns.tolist()}"
-            )
-    else:
-        if "Adj Close" in market.columns:
-            adj_close = market["Adj Close"]
-        elif "Close" in market.columns:
-            adj_close = market["Close"]
-        else:
-            raise ValueError(
-                f"No se encontró 'Adj Close' ni 'Close' para {market_ticker}. "
-                f"Columnas: {market.columns.tolist()}"
-            )
-
-    if isinstance(adj_close, pd.DataFrame):
-        # Tomar primera columna como Series (evita squeeze que colapsa (1,1) a escalar)
-        adj_close = adj_close.iloc[:, 0]
-
-    if not isinstance(adj_close, pd.Series):
-        raise ValueError(
-            f"Tipo inesperado extrayendo precios de {market_ticker}: {type(adj_close).__name__}"
-        )
-
-    return adj_close.dropna()
-
-
-def get_market_data(period="5y", market_ticker="^GSPC", tickers=None):
+def _download_market_frame(tickers, **kwargs):
+    """Descarga un único índice de la fuente activa y lo devuelve como DataFrame de una columna."""
+    candidate = tickers[0]
+    market = get_source().history([candidate], field="Adj Close", interval="1d", **kwargs)
+    if candidate not in market.columns or market[candidate].dropna().empty:
+        raise ValueError("DataFrame vacío")
+    return market[[candidate]].dropna()
+
+
+@metrics.timed("download_market")
+@coalesced(
+    "market_data",
+    key=lambda period="5y", market_ticker="^GSPC", tickers=None, use_store=True, parallel=True, timeout=None: (
+        period, tuple(market_candidates(tickers)) if tickers is not None else market_ticker, use_store,
+    ),
+    share=pd.Series.copy,
+)
+def get_market_data(period="5y", market_ticker="^GSPC", tickers=None, use_store=True,
+                    parallel=True, timeout=None):
     """
     Obtiene la serie de precios ajustados del índice de mercado.
     Si se pasan `tickers`, prueba los candidatos del sufijo en orden y cae a ^GSPC
     cuando el índice local no tiene histórico suficiente en Yahoo (p.ej. ^IPSA).
     Si se pasa un `market_ticker` explícito, intenta sólo ese (con fallback a ^GSPC).
+    Lee primero del almacén local de precios (ver markowitz.store).
+
+    Con parallel=True todos los candidatos se descargan a la vez y se elige el
+    primero, en orden de preferencia, con histórico suficiente: la latencia es
+    la de la descarga más lenta necesaria y no la suma de todas.
+    timeout: segundos máximos de espera por candidato (None = sin límite).
+
+    Las llamadas concurrentes que resuelven los mismos candidatos comparten
+    una sola descarga (ver markowitz.singleflight).
     """
+    store = get_default_store() if use_store else None
     if tickers is not None:
-        candidates = _market_candidates(tickers)
+        candidates = market_candidates(tickers)
     else:
         candidates = [market_ticker]
         if market_ticker != "^GSPC":
             candidates.append("^GSPC")
 
     errors = []
-    for candidate in candidates:
+    if parallel and len(candidates) > 1:
+        executor = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="market")
         try:
-            market = yf.download(
-                candidate, period=period, interval="1d",
-                progress=False, auto_adjust=False,
-            )
-            if market.empty:
-                errors.append(f"{candidate}: DataFrame vacío")
-                continue
-
-            series = _extract_adj_close_series(market, candidate)
-
-            if len(series) < MIN_MARKET_ROWS:
-                errors.append(f"{candidate}: solo {len(series)} filas (se requieren {MIN_MARKET_ROWS}+)")
+            futures = [executor.submit(_load_market_candidate, c, period, store) for c in candidates]
+            for candidate, future in zip(candidates, futures):
+                try:
+                    series = future.result(timeout=timeout)
+                except FuturesTimeoutError:
+                    errors.append(f"{candidate}: sin respuesta en {timeout}s")
+                    metrics.increment("markowitz_download_failures_total", source="market_index")
+                    continue
+                except Exception as e:  # noqa: BLE001
+                    errors.append(f"{candidate}: {e}")
+                    metrics.increment("markowitz_download_failures_total", source="market_index")
+                    continue
+                print(f"DEBUG CAPM - Usando índice de mercado: {candidate} ({len(series)} filas)")
+                if errors:
+                    metrics.increment("markowitz_fallbacks_total", kind="market_index")
+                return series
+        finally:
+            # No esperar a candidatos de menor preferencia que sigan descargando
+            executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        for candidate in candidates:
+            try:
+                series = _load_market_candidate(candidate, period, store)
+            except Exception as e:  # noqa: BLE001
+                errors.append(f"{candidate}: {e}")
+                metrics.increment("markowitz_download_failures_total", source="market_index")
                 continue
-
-            series.name = candidate
             print(f"DEBUG CAPM - Usando índice de mercado: {candidate} ({len(series)} filas)")
+            if errors:
+                metrics.increment("markowitz_fallbacks_total", kind="market_index")
             return series
-        except Exception as e:  # noqa: BLE001
-            errors.append(f"{candidate}: {e}")
-            continue
 
     raise ValueError(
         "No se pudo obtener un índice de mercado con histórico suficiente. "
@@ -146,7 +150,27 @@ def get_market_data(period="5y", market_ticker="^GSPC", tickers=None):
     )
 
 
-def calculate_betas(price_df, market_prices):
+def _load_market_candidate(candidate, period, store):
+    """
+    Serie de precios de un candidato a índice de mercado.
+    Lanza ValueError si viene vacía o con menos de MIN_MARKET_ROWS filas.
+    """
+    if store is not None:
+        frame = load_through_store(store, [candidate], period, _download_market_frame)
+    else:
+        frame = _download_market_frame([candidate], period=period)
+    if candidate not in frame.columns:
+        raise ValueError("DataFrame vacío")
+
+    series = frame[candidate].dropna()
+    if len(series) < MIN_MARKET_ROWS:
+        raise ValueError(f"solo {len(series)} filas (se requieren {MIN_MARKET_ROWS}+)")
+
+    series.name = candidate
+    return series
+
+
+def calculate_betas(price_df, market_prices, model=None):
     """
     Calcula el beta de cada acción respecto al mercado.
     Beta = Cov(Ri, Rm) / Var(Rm)
@@ -154,6 +178,8 @@ def calculate_betas(price_df, market_prices):
     Args:
         price_df: DataFrame con precios de las acciones
         market_prices: Series con precios del mercado
+        model: MarketModel opcional; si se entrega se reutilizan sus retornos
+               y, si se construyó con este mismo mercado, sus betas
 
     Returns:
         Series con los betas de cada acción
@@ -163,8 +189,8 @@ def calculate_betas(price_df, market_prices):
     print(f"DEBUG CAPM - Fechas acciones: {len(price_df.index)}, desde {price_df.index[0]} hasta {price_df.index[-1]}")
     print(f"DEBUG CAPM - Fechas mercado: {len(market_prices.index)}, desde {market_prices.index[0]} hasta {market_prices.index[-1]}")
 
-    # Calcular retornos
-    stock_returns = price_df.pct_change().dropna()
+    # Calcular retornos (o reutilizar los del modelo de mercado)
+    stock_returns = model.returns if model is not None else price_df.pct_change().dropna()
     market_returns = market_prices.pct_change().dropna()
 
     # Alinear fechas (intersección)
@@ -177,36 +203,31 @@ def calculate_betas(price_df, market_prices):
     stock_returns = stock_returns.loc[common_dates]
     market_returns = market_returns.loc[common_dates]
 
-    # Calcular beta para cada acción
-    betas = {}
-    market_var = market_returns.var()
+    # Asegurar que el mercado sea una sola serie
+    if isinstance(market_returns, pd.DataFrame):
+        if market_returns.shape[1] != 1:
+            raise ValueError(f"market_returns tiene {market_returns.shape[1]} columnas")
+        market_returns = market_returns.iloc[:, 0]
 
-    # Asegurar que market_var sea escalar
-    if isinstance(market_var, pd.Series):
-        if len(market_var) == 1:
-            market_var = float(market_var.iloc[0])
-        else:
-            raise ValueError(f"market_var es una Series con {len(market_var)} elementos")
+    if model is not None and _same_market(model.market_returns, market_returns):
+        # El modelo ya las calculó (o las calcula ahora una sola vez) sobre estas fechas
+        betas = model.betas
     else:
-        market_var = float(market_var)
-
-    for ticker in stock_returns.columns:
-        covariance = stock_returns[ticker].cov(market_returns)
+        betas = market_betas(stock_returns, market_returns)
+    for ticker, beta in betas.items():
+        print(f"DEBUG CAPM - Beta de {ticker}: {beta:.3f}")
 
-        # Asegurar que covariance sea escalar
-        if isinstance(covariance, pd.Series):
-            if len(covariance) == 1:
-                covariance = float(covariance.iloc[0])
-            else:
-                raise ValueError(f"covariance es una Series con {len(covariance)} elementos")
-        else:
-            covariance = float(covariance)
+    return betas
 
-        beta = covariance / market_var
-        betas[ticker] = float(beta)
-        print(f"DEBUG CAPM - Beta de {ticker}: {beta:.3f}")
 
-    return pd.Series(betas)
+def _same_market(model_market, market_returns):
+    """True si el modelo se construyó con estos mismos retornos de mercado (en sus fechas)."""
+    if model_market is None:
+        return False
+    if isinstance(model_market, pd.DataFrame):
+        model_market = model_market.iloc[:, 0]
+    aligned = model_market.reindex(market_returns.index).to_numpy(dtype=float)
+    return np.array_equal(aligned, market_returns.to_numpy(dtype=float))
 
 
 def calculate_capm_returns(betas, risk_free_rate, market_return):
@@ -227,7 +248,7 @@ def calculate_capm_returns(betas, risk_free_rate, market_return):
     return expected_returns
 
 
-def get_capm_expected_returns(price_df, risk_free_rate, period="5y"):
+def get_capm_expected_returns(price_df, risk_free_rate, period="5y", model=None, market_prices=None):
     """
     Función principal que calcula retornos esperados CAPM.
 
@@ -235,6 +256,9 @@ def get_capm_expected_returns(price_df, risk_free_rate, period="5y"):
         price_df: DataFrame con precios de las acciones
         risk_free_rate: Tasa libre de riesgo (anualizada)
         period: Periodo histórico para cálculos
+        model: MarketModel opcional con los retornos ya calculados
+        market_prices: Series opcional con el índice de mercado ya descargado
+                       (p.ej. por markowitz.fetch); si no, se descarga aquí
 
     Returns:
         dict con:
@@ -248,11 +272,12 @@ def get_capm_expected_returns(price_df, risk_free_rate, period="5y"):
     print("DEBUG CAPM - Iniciando cálculo de retornos esperados CAPM")
     print(f"DEBUG CAPM - Risk-free rate: {risk_free_rate:.4f} ({risk_free_rate*100:.2f}%)")
     print(f"DEBUG CAPM - Periodo: {period}")
-    print(f"DEBUG CAPM - Candidatos de mercado: {_market_candidates(tickers_list)}")
+    print(f"DEBUG CAPM - Candidatos de mercado: {market_candidates(tickers_list)}")
     print("=" * 60)
 
     # Obtener datos del mercado (con fallback automático por sufijo)
-    market_prices = get_market_data(period=period, tickers=tickers_list)
+    if market_prices is None:
+        market_prices = get_market_data(period=period, tickers=tickers_list)
     market_ticker = market_prices.name or "market"
 
     # Calcular retorno del mercado (promedio histórico anualizado)
@@ -271,7 +296,7 @@ def get_capm_expected_returns(price_df, risk_free_rate, period="5y"):
     print(f"DEBUG CAPM - Retorno anual del mercado ({market_ticker}): {market_return_annual:.4f} ({market_return_annual*100:.2f}%)")
 
     # Calcular betas
-    betas = calculate_betas(price_df, market_prices)
+    betas = calculate_betas(price_df, market_prices, model=model)
 
     # Calcular retornos esperados CAPM
     expected_returns = calculate_capm_returns(betas, risk_free_rate, market_return_annual)
@@ -0,0 +1,173 @@
+"""
+Transporte columnar y compacto de los datos de gráficos.
+
+La nube Monte Carlo viaja como columnas float32 little-endian codificadas en
+base64 ({"dtype", "length", "columns": {nombre: base64}}) en vez de una lista
+de dicts: 12 bytes por portafolio, sin pasar por el sanitizador recursivo y
+sin incrustarse en el HTML. La página de resultados guarda las columnas en
+un ChartStore y el navegador las pide a /api/charts/<token> al mostrar el
+gráfico, en JSON (base64) o binario crudo. Esa petición puede llegar a otro
+worker de gunicorn que el que generó la página: por eso el ChartStore
+también guarda cada payload en un directorio compartido (CHART_STORE_DIR).
+
+numpy se importa al codificar: ChartStore y to_binary se usan al crear la
+app y servir /api/charts, que no deben cargar el stack numérico (ver
+markowitz.warmup).
+"""
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# float32 little-endian
+CHART_DTYPE = "<f4"
+
+
+def encode_columns(columns):
+    """
+    Codifica arrays numéricos del mismo largo como columnas float32 en base64.
+
+    Args:
+        columns: dict nombre -> array 1D (el orden se conserva).
+    """
+    import numpy as np
+
+    arrays = {name: np.ascontiguousarray(values, dtype=CHART_DTYPE) for name, values in columns.items()}
+    lengths = {array.size for array in arrays.values()}
+    if len(lengths) > 1:
+        raise ValueError("Todas las columnas deben tener el mismo largo.")
+    return {
+        "dtype": "float32",
+        "length": lengths.pop() if lengths else 0,
+        "columns": {name: base64.b64encode(array.tobytes()).decode("ascii") for name, array in arrays.items()},
+    }
+
+
+def decode_columns(payload):
+    """Inverso de encode_columns: dict nombre -> array float32."""
+    import numpy as np
+
+    return {
+        name: np.frombuffer(base64.b64decode(data), dtype=CHART_DTYPE)
+        for name, data in payload["columns"].items()
+    }
+
+
+def to_binary(payload):
+    """Columnas concatenadas en orden, como bytes float32 little-endian."""
+    return b"".join(base64.b64decode(data) for data in payload["columns"].values())
+
+
+class ChartStore:
+    """
+    Columnas de gráficos por token durante `retention` segundos.
+    Guarda como máximo `max_entries` (descarta las más antiguas).
+
+    Con `directory` cada payload se escribe además como <token>.json en esa
+    carpeta, de modo que cualquier proceso que la comparta (los workers de
+    gunicorn de una máquina) puede servirlo; la memoria evita releerlo en el
+    proceso que lo generó.
+    """
+
+    def __init__(self, retention=900, max_entries=500, directory=None):
+        self.retention = retention
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, payload):
+        """Guarda un payload de encode_columns y devuelve su token."""
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._purge_expired()
+            self._entries[token] = (time.time(), payload)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.directory:
+            try:
+                self._write_disk(token, payload)
+            except OSError as exc:
+                print(f"Warning: no se pudo guardar el gráfico en disco: {exc}")
+        return token
+
+    def get(self, token):
+        """Payload guardado, o None si no existe o ya expiró."""
+        with self._lock:
+            self._purge_expired()
+            entry = self._entries.get(token)
+        if entry is not None:
+            return entry[1]
+        if self.directory and _is_token(token):
+            return self._read_disk(token)
+        return None
+
+    def _path(self, token):
+        return os.path.join(self.directory, f"{token}.json")
+
+    def _read_disk(self, token):
+        try:
+            stored_at = os.path.getmtime(self._path(token))
+            if stored_at < time.time() - self.retention:
+                return None
+            with open(self._path(token), encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, token, payload):
+        # Diferido: store arrastra numpy/pandas y este módulo se importa al arrancar la app
+        from markowitz.store import atomic_write
+
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self._path(token), json.dumps(payload).encode("utf-8"))
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Borra los archivos vencidos y los más antiguos sobre max_entries."""
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    files.append((entry.stat().st_mtime, entry.path))
+        files.sort(reverse=True)
+        cutoff = time.time() - self.retention
+        for i, (stored_at, path) in enumerate(files):
+            if i >= self.max_entries or stored_at < cutoff:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.retention
+        while self._entries:
+            token, (stored_at, _) = next(iter(self._entries.items()))
+            if stored_at >= cutoff:
+                break
+            del self._entries[token]
+
+
+def create_chart_store():
+    """
+    ChartStore configurado con CHART_RETENTION, CHART_MAX_ENTRIES y
+    CHART_STORE_DIR (por defecto en el directorio temporal del sistema,
+    compartido por los workers; vacío lo deja solo en memoria).
+    """
+    directory = os.getenv("CHART_STORE_DIR")
+    if directory is None:
+        directory = os.path.join(tempfile.gettempdir(), "markowitz_charts")
+    return ChartStore(
+        retention=float(os.getenv("CHART_RETENTION", "900")),
+        max_entries=int(os.getenv("CHART_MAX_ENTRIES", "500")),
+        directory=directory or None,
+    )
+
+
+def _is_token(token):
+    """Solo tokens de uuid4().hex llegan al disco (evita rutas arbitrarias)."""
+    return len(token) == 32 and all(c in "0123456789abcdef" for c in token)
@@ -0,0 +1,181 @@
+"""
+Estimadores de la matriz de covarianza de retornos diarios.
+
+- "sample": covarianza muestral (la de siempre).
+- "ledoit_wolf": contracción de Ledoit-Wolf hacia una identidad escalada;
+  bien condicionada incluso cuando hay casi tantos activos como días.
+- "ewma": media móvil exponencial (RiskMetrics), pondera más lo reciente.
+- "single_index": modelo de un factor (mercado) a partir de las betas:
+  Σ = β β' σ²_m + diag(σ²_ε). Se guarda como FactorCovariance, de modo que
+  varianzas y gradientes cuestan O(n·k) en vez de O(n²).
+
+Todos reciben un DataFrame de retornos diarios y devuelven la covarianza
+diaria como array (n x n) o como FactorCovariance.
+"""
+import numpy as np
+import pandas as pd
+
+ESTIMATORS = ("sample", "ledoit_wolf", "ewma", "single_index")
+
+# Factor de decaimiento diario de RiskMetrics
+EWMA_DECAY = 0.94
+
+
+class FactorCovariance:
+    """
+    Covarianza de baja dimensión más diagonal: B F B' + diag(d).
+
+    loadings: B (n x k), factor_cov: F (k x k), specific: d (n,).
+    Soporta `cov @ w` y `w @ cov` (vector o matriz de pesos) sin formar la
+    matriz densa, así que el optimizador y Monte Carlo la usan tal cual.
+    """
+
+    # Que numpy delegue `array @ cov` y `escalar * cov` en los métodos de la clase
+    __array_ufunc__ = None
+
+    def __init__(self, loadings, factor_cov, specific):
+        loadings = np.asarray(loadings, dtype=float)
+        if loadings.ndim == 1:
+            loadings = loadings[:, None]
+        self.loadings = loadings
+        self.factor_cov = np.atleast_2d(np.asarray(factor_cov, dtype=float))
+        self.specific = np.asarray(specific, dtype=float)
+
+    @property
+    def shape(self):
+        n = self.specific.size
+        return (n, n)
+
+    @property
+    def n_factors(self):
+        return self.loadings.shape[1]
+
+    def __matmul__(self, other):
+        other = np.asarray(other, dtype=float)
+        if other.ndim == 1:
+            return self.loadings @ (self.factor_cov @ (self.loadings.T @ other)) + self.specific * other
+        return self.loadings @ (self.factor_cov @ (self.loadings.T @ other)) + self.specific[:, None] * other
+
+    def __rmatmul__(self, other):
+        # La matriz es simétrica: w @ Σ = (Σ @ w')'
+        other = np.asarray(other, dtype=float)
+        if other.ndim == 1:
+            return self @ other
+        return (self @ other.T).T
+
+    def __mul__(self, scalar):
+        return FactorCovariance(self.loadings, self.factor_cov * scalar, self.specific * scalar)
+
+    __rmul__ = __mul__
+
+    def diagonal(self):
+        return np.einsum("ij,jk,ik->i", self.loadings, self.factor_cov, self.loadings) + self.specific
+
+    def dense(self):
+        """Matriz n x n equivalente (solo para los motores que la necesitan)."""
+        return self.loadings @ self.factor_cov @ self.loadings.T + np.diag(self.specific)
+
+
+def estimate_covariance(returns, method="sample", market_returns=None, betas=None):
+    """
+    Covarianza diaria de `returns` con el estimador indicado.
+
+    method: nombre en ESTIMATORS o una función returns -> covarianza.
+    market_returns: Series de retornos del mercado (solo "single_index").
+    betas: betas ya calculadas contra ese mercado (solo "single_index").
+    """
+    if callable(method):
+        return method(returns)
+    if method == "sample":
+        return sample_covariance(returns)
+    if method == "ledoit_wolf":
+        return ledoit_wolf_covariance(returns)[0]
+    if method == "ewma":
+        return ewma_covariance(returns)
+    if method == "single_index":
+        if market_returns is None:
+            raise ValueError("El estimador single_index requiere los retornos del mercado.")
+        return single_index_covariance(returns, market_returns, betas=betas)
+    raise ValueError(f"Estimador de covarianza no soportado: {method}. Opciones: {', '.join(ESTIMATORS)}")
+
+
+def sample_covariance(returns):
+    values = _values(returns)
+    return np.atleast_2d(np.cov(values, rowvar=False, ddof=1))
+
+
+def ledoit_wolf_covariance(returns):
+    """
+    Contracción de Ledoit-Wolf (2004) hacia m·I, con m la varianza promedio.
+    Devuelve (covarianza, intensidad de contracción en [0, 1]).
+    """
+    values = _values(returns)
+    n_obs, n_assets = values.shape
+    centered = values - values.mean(axis=0)
+    sample = centered.T @ centered / n_obs
+
+    target = np.trace(sample) / n_assets
+    distance = (np.sum(sample ** 2) - 2 * target * np.trace(sample) + n_assets * target ** 2) / n_assets
+    # Σ_t ||x_t x_t' - S||² = Σ_t ||x_t||⁴ - T ||S||²
+    row_norms = np.sum(centered ** 2, axis=1)
+    dispersion = (np.sum(row_norms ** 2) / n_obs - np.sum(sample ** 2)) / (n_obs * n_assets)
+    shrinkage = 0.0 if distance <= 0 else float(min(max(dispersion / distance, 0.0), 1.0))
+
+    cov = (1 - shrinkage) * sample
+    cov[np.diag_indices(n_assets)] += shrinkage * target
+    return cov, shrinkage
+
+
+def ewma_covariance(returns, decay=EWMA_DECAY):
+    """Covarianza con pesos exponenciales decay^(T-1-t), normalizados."""
+    if not 0 < decay < 1:
+        raise ValueError("decay debe estar entre 0 y 1.")
+    values = _values(returns)
+    n_obs = values.shape[0]
+    weights = decay ** np.arange(n_obs - 1, -1, -1, dtype=float)
+    weights /= weights.sum()
+    centered = values - weights @ values
+    return (centered * weights[:, None]).T @ centered
+
+
+def single_index_covariance(returns, market_returns, betas=None):
+    """
+    Modelo de índice único: Σ = β β' σ²_m + diag(σ²_i - β_i² σ²_m).
+
+    betas: Series opcional (p.ej. MarketModel.betas); si no se entrega se
+    estiman sobre las fechas comunes con el mercado.
+    """
+    values, market = _common_values(returns, market_returns)
+    market_centered = market - market.mean()
+    market_var = float(market_centered @ market_centered) / (len(market) - 1)
+    if betas is None:
+        betas = (values - values.mean(axis=0)).T @ market_centered / (len(market) - 1) / market_var
+    else:
+        betas = np.asarray(pd.Series(betas).reindex(returns.columns), dtype=float)
+
+    total_var = values.var(axis=0, ddof=1)
+    specific = np.maximum(total_var - betas ** 2 * market_var, 1e-12 * max(float(total_var.mean()), 1e-12))
+    return FactorCovariance(betas, [[market_var]], specific)
+
+
+def market_betas(returns, market_returns):
+    """Betas (Series por ticker) de `returns` contra el mercado en las fechas comunes."""
+    values, market = _common_values(returns, market_returns)
+    market_centered = market - market.mean()
+    market_var = float(market_centered @ market_centered) / (len(market) - 1)
+    covariances = (values - values.mean(axis=0)).T @ market_centered / (len(market) - 1)
+    return pd.Series(covariances / market_var, index=returns.columns, dtype=float)
+
+
+def _common_values(returns, market_returns):
+    """Retornos de las acciones y del mercado (arrays) en las fechas comunes."""
+    if isinstance(market_returns, pd.DataFrame):
+        market_returns = market_returns.iloc[:, 0]
+    common = returns.index.intersection(market_returns.index)
+    if len(common) < 2:
+        raise ValueError("Muy pocas fechas comunes entre acciones y mercado.")
+    return returns.loc[common].to_numpy(dtype=float), market_returns.loc[common].to_numpy(dtype=float)
+
+
+def _values(returns):
+    return returns.to_numpy(dtype=float) if isinstance(returns, pd.DataFrame) else np.asarray(returns, dtype=float)
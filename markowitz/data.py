@@ -1,57 +1,74 @@
 import pandas as pd
-import yfinance as yf
 
+from markowitz import metrics
+from markowitz.singleflight import coalesced
+from markowitz.sources import get_source
+from markowitz.store import get_default_store, merge_series, period_start
 
-def get_price_data(tickers, period="5y"):
+
+def get_price_data(tickers, period="5y", interval="1d", use_store=True):
     """
     Descarga precios ajustados para los tickers indicados.
     Siempre usa intervalo diario para cálculos precisos.
     Devuelve DataFrame con columnas en el mismo orden de `tickers`.
+
+    Con datos diarios lee primero el almacén local (ver markowitz.store) y solo
+    pide a Yahoo los días faltantes; si Yahoo no responde se sirve lo guardado.
+    Las descargas van a la fuente activa (Yahoo o una grabación, ver
+    markowitz.sources).
+    Las llamadas concurrentes con los mismos argumentos comparten una sola
+    descarga en get_price_panel (ver markowitz.singleflight).
+    """
+    data = get_price_panel(tickers, period=period, interval=interval, use_store=use_store)
+    return clean_price_panel(data, tickers)
+
+
+@metrics.timed("download_prices")
+@coalesced("price_panel", share=pd.DataFrame.copy)
+def get_price_panel(tickers, period="5y", interval="1d", use_store=True):
+    """
+    Igual que get_price_data pero sin limpiar: una columna por ticker que
+    llegó, con NaN donde no hubo cotización. Sirve para descargar una sola
+    vez la unión de varias canastas y limpiar cada una por separado.
+    Las llamadas concurrentes con los mismos argumentos se coalescen aquí,
+    así que cubren también a get_price_data y a los lotes.
     """
     if not tickers:
         raise ValueError("No se proporcionaron tickers.")
 
-    data = yf.download(
-        tickers=tickers,
-        period=period,
-        interval="1d",  # Siempre diario para cálculos precisos
-        group_by="ticker",
-        auto_adjust=False,
-        progress=False,
-    )
-
-    # DEBUG: información detallada del DataFrame
-    print("=" * 60)
-    print(f"DEBUG - Tickers solicitados: {tickers}")
-    print(f"DEBUG - Tipo de data: {type(data)}")
-    print(f"DEBUG - Shape: {data.shape}")
-    print(f"DEBUG - Tipo de columns: {type(data.columns)}")
-    print(f"DEBUG - Columns: {data.columns.tolist()}")
-    if isinstance(data.columns, pd.MultiIndex):
-        print(f"DEBUG - MultiIndex levels: {data.columns.levels}")
-        print(f"DEBUG - MultiIndex names: {data.columns.names}")
-    print(f"DEBUG - Primeras filas:\n{data.head(2)}")
-    print("=" * 60)
-
-    # yfinance devuelve MultiIndex cuando hay múltiples tickers
-    if isinstance(data.columns, pd.MultiIndex):
-        print("DEBUG - Detectado MultiIndex, extrayendo 'Adj Close'...")
-        if "Adj Close" in data.columns.get_level_values(0):
-            data = data["Adj Close"]
-            print(f"DEBUG - Columnas después de extraer (nivel 0): {data.columns.tolist()}")
-        elif "Adj Close" in data.columns.get_level_values(1):
-            data = data.xs("Adj Close", level=1, axis=1)
-            print(f"DEBUG - Columnas después de extraer (nivel 1): {data.columns.tolist()}")
-        else:
-            raise ValueError(f"No se encontró 'Adj Close' en MultiIndex. Niveles: {data.columns.levels}")
-    else:
-        print("DEBUG - No es MultiIndex, buscando columna 'Adj Close'...")
-        if "Adj Close" in data.columns:
-            data = data[["Adj Close"]].rename(columns={"Adj Close": tickers[0]})
-            print(f"DEBUG - Columna renombrada a: {tickers[0]}")
-        else:
-            raise ValueError(f"No se encontró 'Adj Close'. Columnas disponibles: {data.columns.tolist()}")
+    store = get_default_store() if use_store else None
+    if store is not None and interval == "1d":
+        return load_through_store(store, tickers, period, download_adj_close)
+    return download_adj_close(tickers, period=period, interval=interval)
 
+
+def stored_last_date(tickers, period="5y"):
+    """
+    Última fecha común que get_price_data serviría desde el almacén local
+    sin descargar nada, o None si falta el almacén o algún ticker no está
+    guardado, no cubre `period` o está desactualizado.
+    """
+    store = get_default_store()
+    if store is None:
+        return None
+    start = period_start(period, today=get_source().reference_date())
+    last_dates = []
+    for ticker in tickers:
+        if store.needs_backfill(ticker, start) or not store.is_fresh(ticker):
+            return None
+        stored = store.load(ticker)
+        if stored is None or stored.empty:
+            return None
+        last_dates.append(stored.index[-1])
+    return min(last_dates) if last_dates else None
+
+
+def clean_price_panel(data, tickers):
+    """
+    Valida y limpia el panel de precios descargado: verifica que todos los
+    tickers tengan datos, descarta filas incompletas y ordena las columnas
+    según `tickers`.
+    """
     # Detectar tickers que Yahoo no devolvió o que vinieron totalmente vacíos
     missing = [t for t in tickers if t not in data.columns or data[t].isna().all()]
     if missing:
@@ -80,3 +97,87 @@ def get_price_data(tickers, period="5y"):
         raise ValueError("Muy pocos datos históricos disponibles para optimizar.")
 
     return data
+
+
+def download_adj_close(tickers, interval="1d", **kwargs):
+    """
+    Descarga de la fuente activa (ver markowitz.sources) 'Adj Close' como
+    DataFrame con una columna por ticker. kwargs: period o start.
+    """
+    return get_source().history(tickers, field="Adj Close", interval=interval, **kwargs)
+
+
+def load_through_store(store, tickers, period, fetch):
+    """
+    Devuelve un DataFrame de precios (una columna por ticker) leyendo primero
+    del almacén local.
+
+    - Tickers sin datos guardados, o cuyo histórico no cubre `period`, se
+      descargan completos en una sola llamada.
+    - Tickers con datos desactualizados piden solo los días desde la última
+      fecha guardada (incluida, para detectar reajustes por dividendos).
+    - Si la actualización incremental falla (p.ej. sin red), se sirve lo guardado.
+
+    fetch(tickers, period=... | start=...) debe devolver un DataFrame con una
+    columna por ticker. El periodo se cuenta desde la fecha de referencia de
+    la fuente activa (hoy, o la última fecha de una grabación).
+    """
+    start = period_start(period, today=get_source().reference_date())
+    frames = {}
+    to_download = []
+    to_update = {}
+
+    for ticker in tickers:
+        stored = store.load(ticker)
+        if stored is None or stored.empty or store.needs_backfill(ticker, start):
+            to_download.append(ticker)
+        elif store.is_fresh(ticker):
+            frames[ticker] = stored
+        else:
+            to_update[ticker] = stored
+
+    if to_download:
+        downloaded = _strip_tz(fetch(to_download, period=period))
+        for ticker in to_download:
+            if ticker not in downloaded.columns:
+                continue
+            series = downloaded[ticker].dropna()
+            if series.empty:
+                continue
+            store.save(ticker, series, covered_from=start)
+            frames[ticker] = series
+
+    if to_update:
+        since = min(series.index[-1] for series in to_update.values())
+        try:
+            fresh = _strip_tz(fetch(list(to_update), start=since.strftime("%Y-%m-%d")))
+        except Exception as e:  # noqa: BLE001
+            print(f"Warning: no se pudo actualizar el almacén de precios, usando datos guardados: {e}")
+            metrics.increment("markowitz_download_failures_total", source="price_store")
+            metrics.increment("markowitz_fallbacks_total", kind="price_store_offline")
+            frames.update(to_update)
+        else:
+            for ticker, stored in to_update.items():
+                merged = stored
+                if ticker in fresh.columns:
+                    merged = merge_series(stored, fresh[ticker])
+                store.save(ticker, merged, covered_from=store.meta(ticker).get("covered_from"))
+                frames[ticker] = merged
+
+    if not frames:
+        return pd.DataFrame()
+    # SharedPriceStore entrega sus columnas con NaN en los feriados
+    data = pd.DataFrame(frames).dropna(how="all")
+    if start is not None:
+        data = data.loc[data.index >= start]
+    return data
+
+
+def _strip_tz(data):
+    """Quita la zona horaria del índice para poder alinear con lo guardado."""
+    if isinstance(data.index, pd.DatetimeIndex) and data.index.tz is not None:
+        data = data.copy()
+        data.index = data.index.tz_localize(None)
+    return data
+
+
@@ -0,0 +1,181 @@
+"""
+Densidad de la nube Monte Carlo.
+
+Con millones de portafolios la nube no se puede graficar punto a punto.
+CloudDensity la agrega bloque a bloque en una grilla (volatilidad x retorno)
+con el número de portafolios y el mayor Sharpe de cada celda, y guarda la
+envolvente superior: el portafolio de mayor retorno en cada columna de
+volatilidad. Lo que se entrega pesa unos pocos KB sin importar cuántos
+portafolios se simularon.
+
+Los rangos de la grilla salen de los primeros DENSITY_RANGE_SAMPLE
+portafolios (con un margen de DENSITY_PADDING), sin importar en cuántos
+bloques lleguen: los bloques se guardan hasta juntar esa muestra, así que la
+grilla es la misma con bloques de 4 000 filas (500 activos con el
+presupuesto de montecarlo.DEFAULT_CHUNK_BYTES) que de 100 000. Los puntos
+posteriores que caen fuera se cuentan en la celda del borde y en `clipped`;
+con una muestra de 100 000 eso prácticamente no ocurre.
+"""
+import os
+
+import numpy as np
+
+from markowitz.charts import encode_columns
+
+# Celdas por eje (volatilidad y retorno)
+DENSITY_BINS = int(os.getenv("DENSITY_BINS", "32"))
+
+# Margen relativo alrededor del rango de la muestra inicial
+DENSITY_PADDING = 0.05
+
+# Portafolios con los que se fijan los rangos de la grilla
+DENSITY_RANGE_SAMPLE = int(os.getenv("DENSITY_RANGE_SAMPLE", "100000"))
+
+
+class CloudDensity:
+    """
+    Acumulador de la nube (volatilidad, retorno, Sharpe) en una grilla fija.
+
+    Atributos:
+        vol_bins, return_bins: celdas por eje
+        vol_range, return_range: (mínimo, máximo) de la grilla, definidos
+                                 con los primeros `range_sample` portafolios
+        counts: portafolios por celda (vol_bins x return_bins, aplanado)
+        max_sharpe: mayor Sharpe por celda (-inf en celdas vacías)
+        n_portfolios: portafolios agregados
+        clipped: portafolios fuera de la grilla, contados en el borde
+    """
+
+    def __init__(self, bins=DENSITY_BINS, padding=DENSITY_PADDING, range_sample=DENSITY_RANGE_SAMPLE):
+        self.vol_bins, self.return_bins = (bins, bins) if np.isscalar(bins) else bins
+        if self.vol_bins < 1 or self.return_bins < 1:
+            raise ValueError("bins debe ser un entero positivo.")
+        if range_sample < 1:
+            raise ValueError("range_sample debe ser un entero positivo.")
+        self.padding = padding
+        self.range_sample = range_sample
+        self._vol_range = None
+        self._return_range = None
+        self._counts = np.zeros(self.vol_bins * self.return_bins, dtype=np.int64)
+        self._max_sharpe = np.full(self.vol_bins * self.return_bins, -np.inf)
+        self._envelope_returns = np.full(self.vol_bins, -np.inf)
+        self._envelope_vols = np.full(self.vol_bins, np.nan)
+        self._clipped = 0
+        self._pending = []      # bloques recibidos antes de fijar la grilla
+        self._pending_size = 0
+        self.n_portfolios = 0
+
+    # Leer la grilla la fija con lo recibido hasta ahora aunque no se haya
+    # juntado la muestra completa
+    @property
+    def vol_range(self):
+        self._settle()
+        return self._vol_range
+
+    @property
+    def return_range(self):
+        self._settle()
+        return self._return_range
+
+    @property
+    def counts(self):
+        self._settle()
+        return self._counts
+
+    @property
+    def max_sharpe(self):
+        self._settle()
+        return self._max_sharpe
+
+    @property
+    def clipped(self):
+        self._settle()
+        return self._clipped
+
+    def add(self, volatilities, returns, sharpes):
+        """Agrega un bloque de portafolios."""
+        volatilities = np.asarray(volatilities, dtype=float)
+        returns = np.asarray(returns, dtype=float)
+        sharpes = np.asarray(sharpes, dtype=float)
+        if volatilities.size == 0:
+            return
+        self.n_portfolios += volatilities.size
+        if self._vol_range is not None:
+            self._aggregate(volatilities, returns, sharpes)
+            return
+        self._pending.append((volatilities, returns, sharpes))
+        self._pending_size += volatilities.size
+        if self._pending_size >= self.range_sample:
+            self._settle()
+
+    def _settle(self):
+        """Fija la grilla con los primeros range_sample portafolios y agrega los bloques guardados."""
+        if not self._pending:
+            return
+        volatilities, returns, sharpes = (np.concatenate(column) for column in zip(*self._pending))
+        self._pending, self._pending_size = [], 0
+        self._vol_range = self._padded_range(volatilities[:self.range_sample])
+        self._return_range = self._padded_range(returns[:self.range_sample])
+        self._aggregate(volatilities, returns, sharpes)
+
+    def _aggregate(self, volatilities, returns, sharpes):
+        cols, clipped_cols = _bin(volatilities, self._vol_range, self.vol_bins)
+        rows, clipped_rows = _bin(returns, self._return_range, self.return_bins)
+        self._clipped += int(np.count_nonzero(clipped_cols | clipped_rows))
+
+        cells = cols * self.return_bins + rows
+        self._counts += np.bincount(cells, minlength=self._counts.size)
+        np.maximum.at(self._max_sharpe, cells, sharpes)
+
+        # Envolvente: el mayor retorno de cada columna en este bloque y,
+        # si supera al acumulado, la volatilidad de ese portafolio
+        block_best = np.full(self.vol_bins, -np.inf)
+        np.maximum.at(block_best, cols, returns)
+        is_best = returns == block_best[cols]
+        improved = is_best & (returns > self._envelope_returns[cols])
+        self._envelope_returns[cols[improved]] = returns[improved]
+        self._envelope_vols[cols[improved]] = volatilities[improved]
+
+    def envelope(self):
+        """Envolvente superior: (volatilidades, retornos) por columna no vacía."""
+        self._settle()
+        filled = np.isfinite(self._envelope_returns)
+        return self._envelope_vols[filled], self._envelope_returns[filled]
+
+    def to_dict(self):
+        """
+        Vista compacta para el template y la API.
+
+        Las celdas no vacías viajan como columnas float32 (ver
+        markowitz.charts): `cell` es col * return_bins + fila, donde col es
+        la celda de volatilidad y fila la de retorno.
+        """
+        filled = np.flatnonzero(self.counts)
+        envelope_vols, envelope_returns = self.envelope()
+        return {
+            "bins": [self.vol_bins, self.return_bins],
+            "vol_range": list(self.vol_range or (0.0, 0.0)),
+            "return_range": list(self.return_range or (0.0, 0.0)),
+            "n_portfolios": self.n_portfolios,
+            "clipped": self.clipped,
+            "max_count": int(self.counts.max()),
+            "cells": encode_columns({
+                "cell": filled,
+                "count": self.counts[filled],
+                "max_sharpe": self.max_sharpe[filled],
+            }),
+            "envelope": {"volatility": envelope_vols.tolist(), "return": envelope_returns.tolist()},
+        }
+
+    def _padded_range(self, values):
+        low, high = float(values.min()), float(values.max())
+        margin = (high - low) * self.padding or abs(high) * self.padding or 1e-6
+        return (low - margin, high + margin)
+
+
+def _bin(values, value_range, n_bins):
+    """Índice de celda de cada valor (acotado a la grilla) y máscara de recortados."""
+    low, high = value_range
+    scaled = np.floor((values - low) / (high - low) * n_bins)
+    clipped = (scaled < 0) | (scaled >= n_bins)
+    return np.clip(scaled, 0, n_bins - 1).astype(np.intp), clipped
@@ -0,0 +1,125 @@
+"""
+Etapa de descarga concurrente del pipeline de optimización.
+
+La tasa libre de riesgo (^TNX), los precios de los activos y el índice de
+mercado son descargas independientes. Aquí se lanzan a la vez en un pool
+de hilos acotado, de modo que la latencia total es la de la descarga más
+lenta y no la suma de todas.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from markowitz import metrics
+from markowitz.capm import market_candidates, get_market_data
+from markowitz.data import get_price_data, get_price_panel
+from markowitz.risk_free_rate import FALLBACK_RISK_FREE_RATE, SOURCE_FALLBACK, get_risk_free_rate_info
+
+# Segundos máximos de espera por descarga
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "30"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FETCH_WORKERS", "8")),
+    thread_name_prefix="fetch",
+)
+
+
+def fetch_market_inputs(tickers, period="5y", timeout=FETCH_TIMEOUT):
+    """
+    Descarga en paralelo todo lo que necesita una optimización.
+
+    Args:
+        tickers: Lista de tickers de los activos.
+        period: Periodo histórico (formato yfinance).
+        timeout: Segundos máximos de espera por cada descarga.
+
+    Returns:
+        dict con:
+            - risk_free_rate: float (fallback 4% si no responde a tiempo)
+            - risk_free_rate_source: "live", "cached" o "fallback"
+            - prices: DataFrame de precios (ver get_price_data)
+            - market_prices: Series del índice de mercado (ver get_market_data)
+
+    Raises:
+        ValueError: si los precios o el índice de mercado fallan o no
+                    responden dentro de `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+    rate_future = _executor.submit(get_risk_free_rate_info)
+    prices_future = _executor.submit(get_price_data, tickers, period=period)
+    market_future = _executor.submit(
+        get_market_data, period=period, tickers=tickers, timeout=timeout,
+    )
+
+    prices = _result(prices_future, deadline, "precios de los activos")
+    market_prices = _result(market_future, deadline, "índice de mercado")
+    rate_info = _rate_or_fallback(rate_future, deadline)
+
+    return {
+        "risk_free_rate": rate_info["rate"],
+        "risk_free_rate_source": rate_info["source"],
+        "prices": prices,
+        "market_prices": market_prices,
+    }
+
+
+def fetch_batch_inputs(baskets, period="5y", timeout=FETCH_TIMEOUT):
+    """
+    Descargas de varias canastas a la vez: la unión de sus tickers en una
+    sola llamada (sin limpiar, ver get_price_panel) y un índice de mercado
+    por cada combinación distinta de candidatos (normalmente uno solo).
+
+    Returns:
+        dict con risk_free_rate, risk_free_rate_source, prices (panel de la
+        unión) y market_prices (lista con la Series de cada canasta, o el
+        ValueError si su índice no se pudo descargar).
+    """
+    union = list(dict.fromkeys(t for basket in baskets for t in basket))
+    groups = {}
+    for basket in baskets:
+        groups.setdefault(tuple(market_candidates(basket)), basket)
+
+    deadline = time.monotonic() + timeout
+    rate_future = _executor.submit(get_risk_free_rate_info)
+    prices_future = _executor.submit(get_price_panel, union, period=period)
+    market_futures = {
+        key: _executor.submit(get_market_data, period=period, tickers=basket, timeout=timeout)
+        for key, basket in groups.items()
+    }
+
+    prices = _result(prices_future, deadline, "precios de los activos")
+    markets = {}
+    for key, future in market_futures.items():
+        try:
+            markets[key] = _result(future, deadline, "índice de mercado")
+        except ValueError as e:
+            # Solo fallan las canastas de ese mercado, no el lote completo
+            markets[key] = e
+    rate_info = _rate_or_fallback(rate_future, deadline)
+
+    return {
+        "risk_free_rate": rate_info["rate"],
+        "risk_free_rate_source": rate_info["source"],
+        "prices": prices,
+        "market_prices": [markets[tuple(market_candidates(basket))] for basket in baskets],
+    }
+
+
+def _rate_or_fallback(future, deadline):
+    try:
+        return _result(future, deadline, "tasa libre de riesgo")
+    except ValueError as e:
+        print(f"Warning: {e}; usando tasa libre de riesgo = {FALLBACK_RISK_FREE_RATE}")
+        metrics.increment("markowitz_fallbacks_total", kind="risk_free_rate")
+        return {"rate": FALLBACK_RISK_FREE_RATE, "source": SOURCE_FALLBACK}
+
+
+def _result(future, deadline, label):
+    """Espera el resultado hasta `deadline`; los timeouts se informan como ValueError."""
+    remaining = max(deadline - time.monotonic(), 0.0)
+    try:
+        return future.result(timeout=remaining)
+    except FuturesTimeoutError:
+        future.cancel()
+        raise ValueError(f"La descarga de {label} no respondió a tiempo.") from None
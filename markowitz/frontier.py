@@ -0,0 +1,232 @@
+"""
+Frontera eficiente exacta con el algoritmo de línea crítica (CLA) de Markowitz.
+
+Para portafolios sin cortos y totalmente invertidos (w >= 0, sum(w) = 1),
+los pesos de mínima varianza son lineales por tramos en el retorno objetivo.
+CLA recorre los tramos en una sola pasada: entre dos "puntos de quiebre"
+el conjunto de activos con peso positivo no cambia y los pesos se obtienen
+interpolando linealmente, así que la frontera completa cuesta del orden de
+una optimización sin importar cuántos puntos se dibujen.
+
+Se resuelve min 1/2 w'Σw - λ μ'w con λ bajando desde infinito (portafolio de
+máximo retorno) hasta 0 (mínima varianza global).
+"""
+import numpy as np
+
+# Tolerancia relativa para decidir si dos eventos ocurren en el mismo λ
+_EVENT_TOL = 1e-12
+
+
+class CriticalLineError(ValueError):
+    """El problema es degenerado para CLA (empates en μ, covarianza singular)."""
+
+
+def critical_line(mu, cov):
+    """
+    Puntos de quiebre de la rama eficiente (retorno decreciente).
+
+    Args:
+        mu: array (n,) de retornos esperados.
+        cov: array (n, n) de covarianzas (misma escala temporal que se desee
+             para la varianza de salida).
+
+    Returns:
+        lista de arrays de pesos (n,), desde el portafolio de máximo retorno
+        hasta el de mínima varianza global.
+    """
+    mu = np.asarray(mu, dtype=float)
+    cov = np.asarray(cov, dtype=float)
+    n = mu.size
+
+    top = int(np.argmax(mu))
+    if np.sum(np.isclose(mu, mu[top], rtol=1e-12, atol=1e-14)) > 1:
+        raise CriticalLineError("Hay activos empatados en el retorno máximo.")
+
+    free = _FreeSet(cov, top)
+    weights = np.zeros(n)
+    weights[top] = 1.0
+    turning_points = [weights]
+    lam = np.inf
+    last_in, last_out = top, None
+
+    for _ in range(4 * n + 10):
+        a, b, p, q = _segment(mu, cov, free)
+
+        best_lam, best_asset, entering = 0.0, None, False
+
+        # Activos libres que llegan a peso 0 al bajar λ
+        leaving = b > 0
+        if last_in is not None:
+            leaving &= free.indices != last_in
+        if leaving.any():
+            candidates = np.full(b.size, -np.inf)
+            candidates[leaving] = -a[leaving] / b[leaving]
+            candidates[~_below(candidates, lam)] = -np.inf
+            pos = int(np.argmax(candidates))
+            if candidates[pos] > best_lam:
+                best_lam, best_asset = candidates[pos], int(free.indices[pos])
+
+        # Activos en cero cuyo multiplicador se anula (entran al portafolio)
+        joining = ~free.mask & (q > 0)
+        if last_out is not None:
+            joining[last_out] = False
+        if joining.any():
+            candidates = np.full(n, -np.inf)
+            candidates[joining] = -p[joining] / q[joining]
+            candidates[~_below(candidates, lam)] = -np.inf
+            i = int(np.argmax(candidates))
+            if candidates[i] > best_lam:
+                best_lam, best_asset, entering = candidates[i], i, True
+
+        lam = best_lam
+        weights = np.zeros(n)
+        weights[free.indices] = np.maximum(a + lam * b, 0.0)
+        weights /= weights.sum()
+        turning_points.append(weights)
+
+        if best_asset is None:
+            # λ = 0: mínima varianza global con el conjunto libre actual
+            return turning_points
+
+        if entering:
+            free.add(best_asset)
+            last_in, last_out = best_asset, None
+        else:
+            free.remove(best_asset)
+            last_in, last_out = None, best_asset
+        if not free.indices.size:
+            raise CriticalLineError("El conjunto de activos libres quedó vacío.")
+
+    raise CriticalLineError("CLA no convergió.")
+
+
+class _FreeSet:
+    """
+    Conjunto de activos libres de CLA: índices en orden de entrada, máscara
+    booleana (n,) y la inversa de la submatriz de covarianza.
+
+    Cada punto de quiebre agrega o quita un solo activo, así que la inversa
+    se actualiza en O(m²) (complemento de Schur al agregar, Sherman-Morrison
+    al quitar) en vez de resolver el sistema desde cero en O(m³). Cada
+    `refresh_every` cambios se recalcula completa para no acumular error.
+    """
+
+    refresh_every = 64
+
+    def __init__(self, cov, first):
+        self.cov = cov
+        self.indices = np.array([first])
+        self.mask = np.zeros(cov.shape[0], dtype=bool)
+        self.mask[first] = True
+        self._changes = 0
+        self._refresh()
+
+    def add(self, i):
+        cross = self.cov[self.indices, i]
+        u = self.inverse @ cross
+        schur = self.cov[i, i] - cross @ u
+        if schur <= 0:
+            raise CriticalLineError("Covarianza singular en el conjunto libre.")
+        m = self.indices.size
+        inverse = np.empty((m + 1, m + 1))
+        inverse[:m, :m] = self.inverse + np.outer(u, u) / schur
+        inverse[:m, m] = inverse[m, :m] = -u / schur
+        inverse[m, m] = 1.0 / schur
+        self.inverse = inverse
+        self.indices = np.append(self.indices, i)
+        self.mask[i] = True
+        self._changed()
+
+    def remove(self, i):
+        pos = int(np.flatnonzero(self.indices == i)[0])
+        keep = np.arange(self.indices.size) != pos
+        column = self.inverse[keep, pos]
+        self.inverse = self.inverse[np.ix_(keep, keep)] - np.outer(column, column) / self.inverse[pos, pos]
+        self.indices = self.indices[keep]
+        self.mask[i] = False
+        self._changed()
+
+    def _changed(self):
+        self._changes += 1
+        if self._changes % self.refresh_every == 0 and self.indices.size:
+            self._refresh()
+
+    def _refresh(self):
+        try:
+            self.inverse = np.linalg.inv(self.cov[np.ix_(self.indices, self.indices)])
+        except np.linalg.LinAlgError as exc:
+            raise CriticalLineError("Covarianza singular en el conjunto libre.") from exc
+
+
+def efficient_frontier_weights(mu, cov, target_returns):
+    """
+    Pesos de mínima varianza para cada retorno objetivo en [min μ, max μ].
+
+    Objetivos por sobre el retorno de mínima varianza global usan la rama
+    eficiente; los inferiores usan la rama ineficiente, que es la rama
+    eficiente del problema con -μ.
+
+    Returns:
+        array (len(target_returns), n) de pesos.
+    """
+    mu = np.asarray(mu, dtype=float)
+    upper = critical_line(mu, cov)
+    lower = critical_line(-mu, cov)
+
+    targets = np.asarray(target_returns, dtype=float)
+    out = np.empty((targets.size, mu.size))
+    for k, target in enumerate(targets):
+        if target >= float(upper[-1] @ mu):
+            out[k] = _interpolate(upper, mu, target)
+        else:
+            out[k] = _interpolate(lower, -mu, -target)
+    return out
+
+
+def _segment(mu, cov, free):
+    """
+    Coeficientes del tramo actual: w_F(λ) = a + λ b y, para cada activo,
+    multiplicador de la cota w_i >= 0: g_i(λ) = p_i + λ q_i.
+    free es el _FreeSet actual (trae la inversa de su submatriz).
+    """
+    x_one = free.inverse.sum(axis=1)
+    x_mu = free.inverse @ mu[free.indices]
+    sum_one = x_one.sum()
+    sum_mu = x_mu.sum()
+    if sum_one <= 0:
+        raise CriticalLineError("Covarianza no definida positiva en el conjunto libre.")
+
+    a = x_one / sum_one
+    b = x_mu - (sum_mu / sum_one) * x_one
+
+    # Σ[:, F] @ [a, b] como producto con la matriz completa: evita copiar la
+    # submatriz (n, m) en cada punto de quiebre
+    padded = np.zeros((mu.size, 2))
+    padded[free.indices, 0] = a
+    padded[free.indices, 1] = b
+    cross = cov @ padded
+    p = cross[:, 0] - 1.0 / sum_one
+    q = cross[:, 1] - mu + sum_mu / sum_one
+    return a, b, p, q
+
+
+def _below(candidate, lam):
+    """True si `candidate` (escalar o array) está estrictamente bajo λ (con tolerancia relativa)."""
+    if np.isinf(lam):
+        return np.isfinite(candidate)
+    return candidate < lam - _EVENT_TOL * max(1.0, abs(lam))
+
+
+def _interpolate(turning_points, mu, target):
+    """Interpola linealmente entre los puntos de quiebre que encierran `target`."""
+    returns = [float(w @ mu) for w in turning_points]
+    # Los retornos decrecen a lo largo de los puntos de quiebre
+    for hi, lo in zip(range(len(returns) - 1), range(1, len(returns))):
+        if returns[lo] <= target <= returns[hi]:
+            span = returns[hi] - returns[lo]
+            if span <= 0:
+                return turning_points[hi]
+            t = (target - returns[lo]) / span
+            return turning_points[lo] + t * (turning_points[hi] - turning_points[lo])
+    # Fuera de rango por redondeo: usar el extremo más cercano
+    return turning_points[0] if target > returns[0] else turning_points[-1]
@@ -0,0 +1,104 @@
+"""
+Ejecución asíncrona de optimizaciones en un pool de hilos del proceso.
+
+La API JSON encola una optimización y responde de inmediato con un id de
+trabajo; el cliente consulta el estado hasta que el resultado está listo.
+Así los workers web no quedan bloqueados durante descargas y optimizaciones
+lentas. Los resultados terminados se conservan durante `retention` segundos.
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+
+
+class JobQueueFull(RuntimeError):
+    """Hay demasiados trabajos pendientes; el cliente debe reintentar luego."""
+
+
+class JobManager:
+    """
+    Pool acotado de workers con registro de trabajos en memoria.
+
+    Args:
+        max_workers: Optimizaciones que corren a la vez.
+        max_pending: Trabajos encolados o en curso antes de rechazar nuevos.
+        retention: Segundos que se conserva un trabajo terminado.
+    """
+
+    def __init__(self, max_workers=2, max_pending=50, retention=900):
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """Encola fn(*args, **kwargs) y devuelve el id del trabajo."""
+        self._purge_expired()
+        with self._lock:
+            pending = sum(
+                1 for job in self._jobs.values()
+                if job["status"] in (STATUS_QUEUED, STATUS_RUNNING)
+            )
+            if pending >= self.max_pending:
+                raise JobQueueFull("Demasiadas optimizaciones en curso, intenta de nuevo en unos segundos.")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": STATUS_QUEUED,
+                "submitted_at": time.time(),
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+        self._executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def get(self, job_id):
+        """Copia del registro del trabajo, o None si no existe o ya expiró."""
+        self._purge_expired()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _run(self, job_id, fn, args, kwargs):
+        self._update(job_id, status=STATUS_RUNNING)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:  # noqa: BLE001
+            traceback.print_exc()
+            self._update(job_id, status=STATUS_ERROR, error=str(exc), finished_at=time.time())
+        else:
+            self._update(job_id, status=STATUS_DONE, result=result, finished_at=time.time())
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["finished_at"] is not None and job["finished_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+def create_job_manager():
+    """JobManager configurado con JOB_WORKERS, JOB_MAX_PENDING y JOB_RETENTION."""
+    return JobManager(
+        max_workers=int(os.getenv("JOB_WORKERS", "2")),
+        max_pending=int(os.getenv("JOB_MAX_PENDING", "50")),
+        retention=float(os.getenv("JOB_RETENTION", "900")),
+    )
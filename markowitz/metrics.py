@@ -0,0 +1,165 @@
+"""
+Instrumentación liviana: tramos de tiempo por etapa, contadores y exportación
+en formato Prometheus.
+
+- `span("etapa")` mide un bloque; la duración se acumula en un histograma
+  global y, si hay una solicitud activa en el contexto, se agrega a la lista
+  que termina en el header Server-Timing.
+- `increment(nombre, **labels)` cuenta eventos (descargas fallidas, fallbacks).
+- `set_gauge(nombre, valor, **labels)` publica un valor instantáneo (p.ej.
+  bytes ocupados por un caché).
+- `render_prometheus()` produce el texto para el endpoint /metrics.
+
+Se desactiva con METRICS_ENABLED=0; en ese caso span() solo evalúa un booleano.
+"""
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites superiores (segundos) de los buckets del histograma de latencias
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_METRIC = "markowitz_stage_duration_seconds"
+
+_enabled = os.getenv("METRICS_ENABLED", "1") == "1"
+_lock = threading.Lock()
+_histograms = {}   # etapa -> {"buckets": [...], "sum": float, "count": int}
+_counters = {}     # (nombre, labels ordenados) -> int
+_gauges = {}       # (nombre, labels ordenados) -> float
+_request_spans = contextvars.ContextVar("markowitz_request_spans", default=None)
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    """Activa o desactiva la instrumentación en caliente (útil en tests)."""
+    global _enabled
+    _enabled = bool(value)
+
+
+@contextmanager
+def span(name):
+    """Mide el bloque y lo registra como etapa `name`."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorador equivalente a envolver la función en span(name)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe(name, seconds):
+    """Registra una duración para la etapa `name`."""
+    if not _enabled:
+        return
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+def increment(name, amount=1, **labels):
+    """Suma `amount` al contador `name` con las etiquetas dadas."""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    """Fija el valor actual del gauge `name` con las etiquetas dadas."""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _gauges[key] = value
+
+
+def start_request():
+    """Comienza a recolectar tramos para la solicitud del contexto actual."""
+    if not _enabled:
+        return None
+    return _request_spans.set([])
+
+
+def finish_request(token):
+    """Termina la recolección y devuelve la lista de (etapa, segundos)."""
+    if token is None:
+        return []
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    return spans
+
+
+def server_timing_header(spans):
+    """Header Server-Timing: `etapa;dur=ms` separados por coma (duraciones sumadas por etapa)."""
+    totals = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+def render_prometheus():
+    """Métricas acumuladas en formato de texto de Prometheus."""
+    with _lock:
+        histograms = {name: dict(h, buckets=list(h["buckets"])) for name, h in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    if histograms:
+        lines.append(f"# HELP {STAGE_METRIC} Duración de cada etapa del pipeline.")
+        lines.append(f"# TYPE {STAGE_METRIC} histogram")
+        for name in sorted(histograms):
+            hist = histograms[name]
+            for bound, count in zip(BUCKETS, hist["buckets"]):
+                lines.append(f'{STAGE_METRIC}_bucket{{stage="{name}",le="{bound}"}} {count}')
+            lines.append(f'{STAGE_METRIC}_bucket{{stage="{name}",le="+Inf"}} {hist["count"]}')
+            lines.append(f'{STAGE_METRIC}_sum{{stage="{name}"}} {hist["sum"]:.6f}')
+            lines.append(f'{STAGE_METRIC}_count{{stage="{name}"}} {hist["count"]}')
+
+    for kind, values in (("counter", counters), ("gauge", gauges)):
+        declared = set()
+        for (name, labels), value in sorted(values.items()):
+            if name not in declared:
+                lines.append(f"# TYPE {name} {kind}")
+                declared.add(name)
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Borra histogramas, contadores y gauges."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
@@ -0,0 +1,177 @@
+"""
+Modelo de mercado compartido: retornos, medias y covarianzas calculados una vez.
+
+El optimizador, la frontera eficiente, la simulación Monte Carlo y CAPM
+parten de los mismos retornos diarios. MarketModel los calcula una sola vez
+por solicitud para que cada etapa reutilice las mismas matrices.
+"""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from markowitz.covariance import FactorCovariance, estimate_covariance, market_betas
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class MarketModel:
+    """
+    Estadísticos de un panel de retornos diarios (columnas = tickers).
+
+    Atributos (arrays numpy de solo lectura, en el orden de `tickers`):
+        returns: DataFrame de retornos diarios (no modificar)
+        mean_returns: retorno medio diario
+        annual_mean_returns: retorno medio anualizado
+        cov_daily: matriz de covarianza diaria
+        cov_annual: matriz de covarianza anualizada
+        cholesky: factor triangular inferior L con L @ L.T = cov_annual
+        individual_volatilities: volatilidad anual de cada activo
+        cov_factor: FactorCovariance anualizada si el estimador es de
+                    factores (None en otro caso)
+        market_returns: Series de retornos del mercado (None si no se entregó)
+        betas: Series de betas contra ese mercado, calculada al primer uso;
+               la comparten el estimador "single_index" y CAPM
+
+    La covarianza sale del estimador `covariance` (ver markowitz.covariance).
+    Con estimadores de factores las matrices densas y Cholesky se forman
+    recién cuando un motor las pide; `cov_operator` evita formarlas.
+    """
+
+    def __init__(self, returns, covariance="sample", market_returns=None):
+        if returns.shape[1] == 0:
+            raise ValueError("Se requiere al menos un activo para construir el modelo.")
+        if returns.shape[0] < 2:
+            raise ValueError("Se requieren al menos 2 observaciones de retornos.")
+
+        values = returns.to_numpy(dtype=float)
+        self.tickers = list(returns.columns)
+        self.returns = returns
+        self.market_returns = market_returns
+        betas = self.betas if covariance == "single_index" and market_returns is not None else None
+        estimate = estimate_covariance(returns, covariance, market_returns=market_returns, betas=betas)
+
+        self.covariance = covariance if isinstance(covariance, str) else getattr(covariance, "__name__", "custom")
+        self.mean_returns = _readonly(values.mean(axis=0))
+        self.annual_mean_returns = _readonly(self.mean_returns * TRADING_DAYS_PER_YEAR)
+        if isinstance(estimate, FactorCovariance):
+            self.cov_factor = estimate * TRADING_DAYS_PER_YEAR
+            daily_variances = estimate.diagonal()
+        else:
+            self.cov_factor = None
+            self.cov_daily = _readonly(np.atleast_2d(estimate))
+            daily_variances = np.diag(self.cov_daily)
+        self.individual_volatilities = _readonly(np.sqrt(daily_variances * TRADING_DAYS_PER_YEAR))
+
+    @classmethod
+    def from_prices(cls, price_df, covariance="sample", market_prices=None):
+        """
+        Construye el modelo a partir de precios (calcula pct_change una vez).
+        market_prices: Series del índice de mercado (estimador "single_index").
+        """
+        market_returns = None if market_prices is None else market_prices.pct_change().dropna()
+        return cls(price_df.pct_change().dropna(), covariance=covariance, market_returns=market_returns)
+
+    def subset(self, tickers):
+        """
+        Modelo restringido a `tickers`, reutilizando medias y covarianzas ya
+        calculadas (submatrices) en vez de recalcularlas. Solo equivale a
+        construir el modelo desde cero si los retornos cubren las mismas
+        fechas y el estimador no depende del resto del universo.
+        """
+        position = {ticker: i for i, ticker in enumerate(self.tickers)}
+        missing = [t for t in tickers if t not in position]
+        if missing:
+            raise ValueError(f"Tickers fuera del modelo: {', '.join(missing)}")
+        idx = np.array([position[t] for t in tickers], dtype=int)
+
+        sub = object.__new__(MarketModel)
+        sub.tickers = list(tickers)
+        sub.returns = self.returns[sub.tickers]
+        sub.market_returns = self.market_returns
+        if "betas" in self.__dict__:
+            sub.betas = self.betas[sub.tickers]
+        sub.covariance = self.covariance
+        sub.mean_returns = _readonly(self.mean_returns[idx])
+        sub.annual_mean_returns = _readonly(self.annual_mean_returns[idx])
+        if self.cov_factor is not None:
+            sub.cov_factor = FactorCovariance(
+                self.cov_factor.loadings[idx], self.cov_factor.factor_cov, self.cov_factor.specific[idx],
+            )
+        else:
+            sub.cov_factor = None
+            sub.cov_daily = _readonly(self.cov_daily[np.ix_(idx, idx)])
+        sub.individual_volatilities = _readonly(self.individual_volatilities[idx])
+        return sub
+
+    @cached_property
+    def betas(self):
+        if self.market_returns is None:
+            return None
+        return market_betas(self.returns, self.market_returns)
+
+    @cached_property
+    def cov_daily(self):
+        # Solo se llega aquí con estimadores de factores
+        return _readonly(self.cov_factor.dense() / TRADING_DAYS_PER_YEAR)
+
+    @cached_property
+    def cov_annual(self):
+        return _readonly(self.cov_daily * TRADING_DAYS_PER_YEAR)
+
+    @cached_property
+    def cholesky(self):
+        return _readonly(_stable_cholesky(self.cov_annual))
+
+    @property
+    def cov_operator(self):
+        """Covarianza anual para productos `cov @ w`: FactorCovariance o la matriz densa."""
+        return self.cov_factor if self.cov_factor is not None else self.cov_annual
+
+    @property
+    def n_assets(self):
+        return len(self.tickers)
+
+    def expected_returns(self, expected_returns_annual=None):
+        """
+        Vector de retornos esperados anualizados como array numpy.
+        Usa `expected_returns_annual` (p.ej. CAPM) si se entrega; si es una
+        Series se alinea por ticker. Si no, usa los promedios históricos.
+        """
+        if expected_returns_annual is None:
+            return self.annual_mean_returns
+        if isinstance(expected_returns_annual, pd.Series):
+            expected_returns_annual = expected_returns_annual.reindex(self.tickers)
+            if expected_returns_annual.isna().any():
+                missing = expected_returns_annual[expected_returns_annual.isna()].index.tolist()
+                raise ValueError(f"Faltan retornos esperados para: {', '.join(missing)}")
+        mu = np.asarray(expected_returns_annual, dtype=float)
+        if mu.shape != (self.n_assets,):
+            raise ValueError(
+                f"Se esperaban {self.n_assets} retornos esperados, se recibieron {mu.size}."
+            )
+        return mu
+
+
+def _stable_cholesky(matrix):
+    """
+    Cholesky de una covarianza. Si es semidefinida (activos colineales o
+    pocas observaciones), agrega un pequeño término diagonal.
+    """
+    try:
+        return np.linalg.cholesky(matrix)
+    except np.linalg.LinAlgError:
+        n = matrix.shape[0]
+        jitter = 1e-10 * max(float(np.trace(matrix)) / n, 1e-12)
+        for _ in range(10):
+            try:
+                return np.linalg.cholesky(matrix + jitter * np.eye(n))
+            except np.linalg.LinAlgError:
+                jitter *= 10
+        raise
+
+
+def _readonly(array):
+    array = np.ascontiguousarray(array, dtype=float)
+    array.setflags(write=False)
+    return array
@@ -4,15 +4,26 @@ Genera portafolios con pesos aleatorios para visualizar la nube de riesgo-retorn
 """
 import numpy as np
 
-TRADING_DAYS_PER_YEAR = 252
+from markowitz.model import MarketModel
 
+# Memoria de trabajo por bloque. Cada portafolio ocupa 2 * n_assets floats
+# (pesos y pesos @ Σ), así que el bloque tiene DEFAULT_CHUNK_BYTES / (16 n)
+# filas: la memoria no crece con n_portfolios ni con el número de activos.
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
 
-def run_monte_carlo(price_df, n_portfolios=5000, risk_free_rate=0.0,
-                    expected_returns_annual=None, seed=42):
+
+def run_monte_carlo(price_df=None, n_portfolios=5000, risk_free_rate=0.0,
+                    expected_returns_annual=None, seed=42,
+                    chunk_size=None, as_dicts=True, model=None,
+                    covariance="sample", density=None, keep_points=True):
     """
     Genera n_portfolios portafolios con pesos aleatorios y calcula
     su retorno esperado, volatilidad y Sharpe ratio.
 
+    La simulación es vectorizada: los pesos se generan por bloques de
+    `chunk_size` filas y cada bloque se evalúa con una sola operación
+    matricial, por lo que la memoria de trabajo no crece con n_portfolios.
+
     Args:
         price_df: DataFrame con precios históricos (columnas = tickers).
         n_portfolios: Número de portafolios aleatorios a generar.
@@ -21,59 +32,119 @@ def run_monte_carlo(price_df, n_portfolios=5000, risk_free_rate=0.0,
                                  anualizados (CAPM). Si no se proporciona,
                                  usa promedios históricos.
         seed: Semilla para reproducibilidad.
+        chunk_size: Portafolios evaluados por bloque (por defecto los que
+                    caben en DEFAULT_CHUNK_BYTES).
+        as_dicts: Si es True, agrega la vista `portfolios` (lista de dicts)
+                  que consumen los templates. Con millones de portafolios
+                  conviene desactivarla y usar los arrays columnares.
+        model: MarketModel opcional ya calculado; si se entrega, price_df
+               no se usa.
+        covariance: Estimador de covarianza (ver markowitz.covariance) para
+                    construir el modelo. Con modelos de factores cada bloque
+                    cuesta O(chunk_size·n·k) en vez de O(chunk_size·n²).
+        density: CloudDensity opcional (ver markowitz.density) que recibe
+                 cada bloque; permite agregar millones de portafolios.
+        keep_points: Si es False no se guardan los arrays por portafolio
+                     (memoria constante); requiere as_dicts=False.
 
     Returns:
         dict con:
+            - volatilities, returns, sharpes: arrays numpy (float64)
+                                              (solo si keep_points=True)
             - portfolios: lista de dicts {volatility, return, sharpe}
+                          (solo si as_dicts=True)
             - best_sharpe: dict del portafolio con mayor Sharpe
             - min_vol: dict del portafolio con menor volatilidad
+            - density: el CloudDensity recibido, ya con todos los bloques
+                       (solo si se entregó density)
     """
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError("chunk_size debe ser un entero positivo.")
+    if as_dicts and not keep_points:
+        raise ValueError("as_dicts requiere keep_points=True.")
+
     rng = np.random.default_rng(seed)
 
-    returns = price_df.pct_change().dropna()
-    cov_matrix = returns.cov().values  # matriz numpy para rendimiento
-    n_assets = len(price_df.columns)
+    if model is None:
+        model = MarketModel.from_prices(price_df, covariance=covariance)
+    n_assets = model.n_assets
+    mean_returns = model.expected_returns(expected_returns_annual)
+    annual_cov = model.cov_operator
+    if chunk_size is None:
+        chunk_size = max(1, DEFAULT_CHUNK_BYTES // (16 * n_assets))
 
-    if expected_returns_annual is not None:
-        mean_returns = np.array(expected_returns_annual, dtype=float)
-    else:
-        mean_returns = returns.mean().values * TRADING_DAYS_PER_YEAR
+    if keep_points:
+        all_returns = np.empty(n_portfolios)
+        all_vols = np.empty(n_portfolios)
+        all_sharpes = np.empty(n_portfolios)
+    best_sharpe = min_vol = None
 
-    annual_cov = cov_matrix * TRADING_DAYS_PER_YEAR
+    for start in range(0, n_portfolios, chunk_size):
+        stop = min(start + chunk_size, n_portfolios)
 
-    # Pre-allocar arrays para rendimiento
-    all_returns = np.empty(n_portfolios)
-    all_vols = np.empty(n_portfolios)
-    all_sharpes = np.empty(n_portfolios)
+        # Dirichlet(1, ..., 1) equivale a normalizar exponenciales estándar,
+        # lo que evita el muestreo gamma genérico de rng.dirichlet.
+        weights = rng.standard_exponential((stop - start, n_assets))
+        weights /= weights.sum(axis=1, keepdims=True)
 
-    for i in range(n_portfolios):
-        # Generar pesos aleatorios que sumen 1 (distribución Dirichlet)
-        weights = rng.dirichlet(np.ones(n_assets))
+        port_returns = weights @ mean_returns
+        port_vars = np.einsum("ij,ij->i", weights @ annual_cov, weights)
+        port_vols = np.sqrt(np.maximum(port_vars, 0.0))
 
-        port_return = float(np.dot(weights, mean_returns))
-        port_vol = float(np.sqrt(np.dot(weights.T, np.dot(annual_cov, weights))))
-        sharpe = (port_return - risk_free_rate) / port_vol if port_vol > 0 else 0.0
+        sharpes = np.zeros_like(port_vols)
+        positive = port_vols > 0
+        sharpes[positive] = (port_returns[positive] - risk_free_rate) / port_vols[positive]
 
-        all_returns[i] = port_return
-        all_vols[i] = port_vol
-        all_sharpes[i] = sharpe
+        if keep_points:
+            all_returns[start:stop] = port_returns
+            all_vols[start:stop] = port_vols
+            all_sharpes[start:stop] = sharpes
+        if density is not None:
+            density.add(port_vols, port_returns, sharpes)
 
-    # Construir lista de portafolios (convertir a floats nativos de Python)
-    portfolios = []
-    for i in range(n_portfolios):
-        portfolios.append({
-            "volatility": float(all_vols[i]),
-            "return": float(all_returns[i]),
-            "sharpe": float(all_sharpes[i]),
-        })
+        # Mejor Sharpe y mínima volatilidad (el primer máximo gana, como argmax)
+        idx = int(np.argmax(sharpes))
+        if best_sharpe is None or sharpes[idx] > best_sharpe["sharpe"]:
+            best_sharpe = _portfolio_point(port_vols, port_returns, sharpes, idx)
+        idx = int(np.argmin(port_vols))
+        if min_vol is None or port_vols[idx] < min_vol["volatility"]:
+            min_vol = _portfolio_point(port_vols, port_returns, sharpes, idx)
+
+    result = {
+        "best_sharpe": best_sharpe,
+        "min_vol": min_vol,
+        "n_portfolios": n_portfolios,
+    }
+    if keep_points:
+        result["volatilities"] = all_vols
+        result["returns"] = all_returns
+        result["sharpes"] = all_sharpes
+    if density is not None:
+        result["density"] = density
+    if as_dicts:
+        result["portfolios"] = portfolios_as_dicts(all_vols, all_returns, all_sharpes)
+    return result
 
-    # Mejor Sharpe y mínima volatilidad
-    best_sharpe_idx = int(np.argmax(all_sharpes))
-    min_vol_idx = int(np.argmin(all_vols))
 
+def portfolios_as_dicts(volatilities, returns, sharpes):
+    """
+    Vista de la nube como lista de dicts {volatility, return, sharpe}
+    con floats nativos de Python (formato que consumen los templates).
+    """
+    return [
+        {"volatility": vol, "return": ret, "sharpe": sharpe}
+        for vol, ret, sharpe in zip(
+            np.asarray(volatilities).tolist(),
+            np.asarray(returns).tolist(),
+            np.asarray(sharpes).tolist(),
+        )
+    ]
+
+
+def _portfolio_point(volatilities, returns, sharpes, idx):
+    """Dict con floats nativos para el portafolio en la posición idx."""
     return {
-        "portfolios": portfolios,
-        "best_sharpe": portfolios[best_sharpe_idx],
-        "min_vol": portfolios[min_vol_idx],
-        "n_portfolios": n_portfolios,
+        "volatility": float(volatilities[idx]),
+        "return": float(returns[idx]),
+        "sharpe": float(sharpes[idx]),
     }
@@ -1,161 +1,263 @@
 import numpy as np
+import pandas as pd
 from scipy.optimize import minimize
 
-# Días de trading por año para anualización
-TRADING_DAYS_PER_YEAR = 252
+from markowitz import metrics
+from markowitz.frontier import CriticalLineError, efficient_frontier_weights
+from markowitz.model import TRADING_DAYS_PER_YEAR, MarketModel
+from markowitz.qp import max_sharpe_weights, min_variance_weights
 
+# TRADING_DAYS_PER_YEAR vive en markowitz.model; se sigue exportando desde aquí
+__all__ = [
+    "OBJECTIVES",
+    "QP_MIN_ASSETS",
+    "TRADING_DAYS_PER_YEAR",
+    "compute_efficient_frontier",
+    "neg_sharpe_and_grad",
+    "optimize_portfolio",
+    "optimize_slsqp",
+    "portfolio_variance_and_grad",
+]
 
-def compute_efficient_frontier(price_df, n_points=50, risk_free_rate=0.0, expected_returns_annual=None):
+OBJECTIVES = ("max_sharpe", "min_variance")
+
+# Con solver="auto", desde esta cantidad de activos se usa el solver QP de
+# markowitz.qp en vez de SLSQP (que escala mal pasado el centenar de activos)
+QP_MIN_ASSETS = 100
+
+
+def compute_efficient_frontier(price_df=None, n_points=50, risk_free_rate=0.0, expected_returns_annual=None,
+                               model=None, method="cla", return_weights=False, use_gradients=True,
+                               covariance="sample"):
     """
     Calcula la frontera eficiente generando portafolios de mínima varianza
     para diferentes niveles de retorno objetivo.
     Todos los resultados están anualizados.
     expected_returns_annual: Series opcional con retornos esperados anualizados (CAPM).
+    model: MarketModel opcional ya calculado; si se entrega, price_df no se usa.
+    method: "cla" (línea crítica, frontera exacta en una pasada) o "slsqp"
+            (una optimización por punto, con arranque en caliente). Si CLA
+            encuentra un caso degenerado se usa SLSQP automáticamente.
+    return_weights: si es True agrega `frontier_weights` (lista de listas).
+    use_gradients: SLSQP usa gradientes analíticos; False vuelve a
+                   diferencias finitas.
+    covariance: estimador de covarianza (ver markowitz.covariance) usado al
+                construir el modelo desde price_df.
     Devuelve dict con arrays de volatilidades, retornos, y activos individuales.
     """
-    returns = price_df.pct_change().dropna()
-    cov_matrix = returns.cov()      # Covarianza diaria
-    tickers = list(price_df.columns)
-    n_assets = len(tickers)
+    if method not in ("cla", "slsqp"):
+        raise ValueError(f"Método de frontera no soportado: {method}")
+
+    if model is None:
+        model = MarketModel.from_prices(price_df, covariance=covariance)
+    tickers = model.tickers
+    n_assets = model.n_assets
 
     # Usar retornos esperados CAPM si se proporcionan, sino usar promedios históricos
-    if expected_returns_annual is not None:
-        annual_mean_returns = expected_returns_annual
-    else:
-        mean_returns = returns.mean()
-        annual_mean_returns = mean_returns * TRADING_DAYS_PER_YEAR
+    annual_mean_returns = model.expected_returns(expected_returns_annual)
 
     if n_assets < 2:
         raise ValueError("Se requieren al menos 2 activos válidos.")
 
-    def portfolio_volatility_daily(weights):
-        return float(np.sqrt(np.dot(weights.T, np.dot(cov_matrix, weights))))
-
-    def portfolio_return_annual(weights):
-        return float(np.dot(weights, annual_mean_returns))
-
-    bounds = tuple((0.0, 1.0) for _ in range(n_assets))
-    x0 = np.array([1.0 / n_assets] * n_assets)
-
     # Encontrar retorno mínimo y máximo alcanzable (anual)
     min_ret = float(annual_mean_returns.min())
     max_ret = float(annual_mean_returns.max())
 
     # Generar puntos de la frontera eficiente
     target_returns = np.linspace(min_ret, max_ret, n_points)
+
+    solved = None
+    if method == "cla":
+        try:
+            solved = [(float(t), w) for t, w in zip(
+                target_returns,
+                efficient_frontier_weights(annual_mean_returns, model.cov_annual, target_returns),
+            )]
+        except CriticalLineError as e:
+            print(f"Warning: CLA no aplicable ({e}); usando SLSQP para la frontera")
+            metrics.increment("markowitz_fallbacks_total", kind="frontier_slsqp")
+    if solved is None:
+        solved = _frontier_slsqp(annual_mean_returns, model.cov_operator, target_returns, use_gradients)
+
     frontier_vols = []
     frontier_rets = []
-
-    for target in target_returns:
-        constraints = [
-            {"type": "eq", "fun": lambda w: np.sum(w) - 1},
-            {"type": "eq", "fun": lambda w, t=target: portfolio_return_annual(w) - t},
-        ]
-        result = minimize(
-            portfolio_volatility_daily,
-            x0,
-            method="SLSQP",
-            bounds=bounds,
-            constraints=constraints,
-            options={"disp": False, "maxiter": 500},
-        )
-        if result.success:
-            # Anualizar volatilidad: vol_anual = vol_diaria * sqrt(252)
-            annual_vol = portfolio_volatility_daily(result.x) * np.sqrt(TRADING_DAYS_PER_YEAR)
-            frontier_vols.append(float(annual_vol))
-            frontier_rets.append(float(target))
+    frontier_weights = []
+    for target, weights in solved:
+        annual_vol = np.sqrt(max(float(weights @ (model.cov_operator @ weights)), 0.0))
+        frontier_vols.append(float(annual_vol))
+        frontier_rets.append(float(target))
+        frontier_weights.append(weights.tolist())
 
     # Calcular posición de cada activo individual (anualizado)
     individual_assets = []
     for i, ticker in enumerate(tickers):
-        annual_ret = float(annual_mean_returns.iloc[i])
-        daily_vol = float(np.sqrt(cov_matrix.iloc[i, i]))
-        annual_vol = float(daily_vol * np.sqrt(TRADING_DAYS_PER_YEAR))
+        annual_ret = float(annual_mean_returns[i])
+        annual_vol = float(model.individual_volatilities[i])
         individual_assets.append({
             "ticker": ticker,
             "return": annual_ret,
             "volatility": annual_vol,
         })
 
-    return {
+    frontier = {
         "frontier_volatilities": frontier_vols,
         "frontier_returns": frontier_rets,
         "individual_assets": individual_assets,
     }
+    if return_weights:
+        frontier["frontier_weights"] = frontier_weights
+    return frontier
+
+
+def _frontier_slsqp(annual_mean_returns, annual_cov, target_returns, use_gradients=True):
+    """
+    Frontera con una optimización SLSQP por retorno objetivo.
+    Los objetivos se recorren en orden y cada punto arranca desde la solución
+    del anterior, que queda muy cerca del nuevo óptimo.
+    Devuelve lista de (retorno objetivo, pesos) para los puntos que convergen.
+    """
+    n_assets = annual_mean_returns.size
+    bounds = tuple((0.0, 1.0) for _ in range(n_assets))
+    x0 = np.full(n_assets, 1.0 / n_assets)
+    objective, jac = _with_gradient(portfolio_variance_and_grad, use_gradients, annual_cov)
+
+    solved = []
+    for target in np.sort(target_returns):
+        constraints = [
+            _budget_constraint(n_assets, use_gradients),
+            _return_constraint(annual_mean_returns, target, use_gradients),
+        ]
+        result = minimize(
+            objective,
+            x0,
+            jac=jac,
+            method="SLSQP",
+            bounds=bounds,
+            constraints=constraints,
+            options={"disp": False, "maxiter": 500},
+        )
+        if result.success:
+            solved.append((float(target), result.x))
+            x0 = result.x
+    return solved
+
+
+def neg_sharpe_and_grad(weights, mean_returns, cov, risk_free_rate=0.0):
+    """
+    Sharpe negativo y su gradiente respecto a los pesos.
+    Con r = μ'w - rf y σ = sqrt(w'Σw):  ∇(-r/σ) = -μ/σ + r Σw / σ³
+    """
+    cov_w = cov @ weights
+    variance = float(weights @ cov_w)
+    if variance <= 0:
+        return np.inf, np.zeros_like(weights)
+    vol = np.sqrt(variance)
+    excess = float(weights @ mean_returns) - risk_free_rate
+    value = -excess / vol
+    grad = -mean_returns / vol + excess * cov_w / (vol * variance)
+    return value, grad
+
+
+def portfolio_variance_and_grad(weights, cov):
+    """Varianza w'Σw y su gradiente 2Σw."""
+    cov_w = cov @ weights
+    return float(weights @ cov_w), 2.0 * cov_w
 
 
-def optimize_portfolio(price_df, risk_free_rate=0.0, expected_returns_annual=None):
+def _with_gradient(fun_and_grad, use_gradients, *args):
+    """
+    Adapta una función (valor, gradiente) a minimize: con gradientes usa
+    jac=True; sin ellos devuelve solo el valor y deja que SciPy derive.
+    """
+    if use_gradients:
+        return (lambda w: fun_and_grad(w, *args)), True
+    return (lambda w: fun_and_grad(w, *args)[0]), None
+
+
+def _budget_constraint(n_assets, use_gradients=True):
+    """Restricción sum(w) = 1 (jacobiano constante: vector de unos)."""
+    constraint = {"type": "eq", "fun": lambda w: np.sum(w) - 1}
+    if use_gradients:
+        ones = np.ones(n_assets)
+        constraint["jac"] = lambda w: ones
+    return constraint
+
+
+def _return_constraint(mean_returns, target, use_gradients=True):
+    """Restricción μ'w = target (jacobiano constante: μ)."""
+    constraint = {"type": "eq", "fun": lambda w: float(w @ mean_returns) - target}
+    if use_gradients:
+        constraint["jac"] = lambda w: mean_returns
+    return constraint
+
+
+def optimize_portfolio(price_df=None, risk_free_rate=0.0, expected_returns_annual=None, model=None,
+                       use_gradients=True, objective="max_sharpe", solver="auto", covariance="sample"):
     """
     Optimiza el portafolio maximizando el ratio de Sharpe.
     Calcula con retornos diarios y anualiza los resultados (horizonte 1 año).
     risk_free_rate debe estar en términos anuales.
     expected_returns_annual: Series opcional con retornos esperados anualizados (CAPM).
                              Si no se proporciona, usa promedios históricos.
+    model: MarketModel opcional ya calculado; si se entrega, price_df no se usa.
+    use_gradients: SLSQP usa el gradiente analítico del Sharpe; False vuelve
+                   a diferencias finitas.
+    objective: "max_sharpe" o "min_variance" (long-only, totalmente invertido).
+    solver: "slsqp", "qp" (ADMM + conjunto activo, para cientos o miles de
+            activos) o "auto" (qp desde QP_MIN_ASSETS activos).
+    covariance: estimador de covarianza (ver markowitz.covariance) usado al
+                construir el modelo desde price_df. Con modelos de factores
+                SLSQP evalúa varianzas y gradientes en O(n·k).
     Devuelve dict con pesos, retorno esperado, volatilidad y sharpe (todos anualizados).
     """
-    returns = price_df.pct_change().dropna()
-    cov_matrix = returns.cov()      # Covarianza diaria
-    tickers = list(price_df.columns)
-    n_assets = len(tickers)
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Objetivo no soportado: {objective}")
+    if solver not in ("auto", "slsqp", "qp"):
+        raise ValueError(f"Solver no soportado: {solver}")
+
+    if model is None:
+        model = MarketModel.from_prices(price_df, covariance=covariance)
+    tickers = model.tickers
+    n_assets = model.n_assets
 
     if n_assets < 2:
         raise ValueError("Se requieren al menos 2 activos válidos para optimizar.")
 
     # Usar retornos esperados CAPM si se proporcionan, sino usar promedios históricos
-    if expected_returns_annual is not None:
-        # Retornos ya están anualizados
-        annual_mean_returns = expected_returns_annual
-    else:
-        # Calcular promedios históricos y anualizar
-        mean_returns = returns.mean()
-        annual_mean_returns = mean_returns * TRADING_DAYS_PER_YEAR
+    annual_mean_returns = model.expected_returns(expected_returns_annual)
 
-    # Anualizar covarianza
-    annual_cov_matrix = cov_matrix * TRADING_DAYS_PER_YEAR
+    # Covarianza anualizada (densa o de factores)
+    annual_cov_matrix = model.cov_operator
 
     def portfolio_performance_annual(weights):
         port_return = float(np.dot(weights, annual_mean_returns))
-        port_vol = float(np.sqrt(np.dot(weights.T, np.dot(annual_cov_matrix, weights))))
+        port_vol = float(np.sqrt(weights @ (annual_cov_matrix @ weights)))
         return port_return, port_vol
 
-    def neg_sharpe_ratio(weights):
-        port_return, port_vol = portfolio_performance_annual(weights)
-        if port_vol == 0:
-            return np.inf
-        return -(port_return - risk_free_rate) / port_vol
-
-    bounds = tuple((0.0, 1.0) for _ in range(n_assets))
-    constraints = ({"type": "eq", "fun": lambda w: np.sum(w) - 1},)
-    x0 = np.array([1.0 / n_assets] * n_assets)
+    if solver == "auto":
+        solver = "qp" if n_assets >= QP_MIN_ASSETS else "slsqp"
 
-    result = minimize(
-        neg_sharpe_ratio,
-        x0,
-        method="SLSQP",
-        bounds=bounds,
-        constraints=constraints,
-        options={"disp": False, "maxiter": 500},
-    )
-
-    if not result.success:
-        raise ValueError(f"Falló la optimización: {result.message}")
+    if solver == "qp":
+        if objective == "max_sharpe":
+            weights = max_sharpe_weights(annual_mean_returns, model.cov_annual, risk_free_rate)
+        else:
+            weights = min_variance_weights(model.cov_annual)
+    else:
+        weights = optimize_slsqp(annual_mean_returns, annual_cov_matrix, risk_free_rate,
+                                  objective, use_gradients)
 
-    weights = result.x
     port_return, port_vol = portfolio_performance_annual(weights)
     sharpe = (port_return - risk_free_rate) / port_vol if port_vol else float("nan")
 
     # Contribuciones anualizadas
-    contrib_return = weights * annual_mean_returns
-    marginal_var = annual_cov_matrix.dot(weights)
-    contrib_var = weights * marginal_var
+    contrib_return = pd.Series(weights * annual_mean_returns, index=tickers)
+    marginal_var = annual_cov_matrix @ weights
+    contrib_var = pd.Series(weights * marginal_var, index=tickers)
 
-    # Calcular volatilidad anual de cada activo individual
-    # volatilidad_anual = sqrt(varianza_diaria) * sqrt(252)
-    individual_volatilities = {}
-    for i, ticker in enumerate(tickers):
-        daily_vol = float(np.sqrt(cov_matrix.iloc[i, i]))
-        annual_vol = daily_vol * np.sqrt(TRADING_DAYS_PER_YEAR)
-        individual_volatilities[ticker] = float(annual_vol)
+    # Volatilidad anual de cada activo individual (precalculada en el modelo)
+    individual_volatilities = {
+        ticker: float(vol) for ticker, vol in zip(tickers, model.individual_volatilities)
+    }
 
     return {
         "tickers": tickers,
@@ -167,3 +269,37 @@ def optimize_portfolio(price_df, risk_free_rate=0.0, expected_returns_annual=Non
         "contrib_var": contrib_var,          # Anualizado
         "individual_volatilities": individual_volatilities,  # Volatilidad anual de cada activo
     }
+
+
+def optimize_slsqp(annual_mean_returns, annual_cov, risk_free_rate, objective, use_gradients=True, x0=None):
+    """
+    Pesos óptimos con SLSQP partiendo de x0 (por defecto el portafolio
+    equiponderado). Arrancar desde la solución de un problema vecino, como
+    el rebalanceo anterior de un backtest, ahorra la mayoría de iteraciones.
+    """
+    n_assets = annual_mean_returns.size
+    if objective == "max_sharpe":
+        fun, jac = _with_gradient(
+            neg_sharpe_and_grad, use_gradients, annual_mean_returns, annual_cov, risk_free_rate,
+        )
+    else:
+        fun, jac = _with_gradient(portfolio_variance_and_grad, use_gradients, annual_cov)
+
+    bounds = tuple((0.0, 1.0) for _ in range(n_assets))
+    constraints = (_budget_constraint(n_assets, use_gradients),)
+    if x0 is None:
+        x0 = np.array([1.0 / n_assets] * n_assets)
+
+    result = minimize(
+        fun,
+        x0,
+        jac=jac,
+        method="SLSQP",
+        bounds=bounds,
+        constraints=constraints,
+        options={"disp": False, "maxiter": 500},
+    )
+
+    if not result.success:
+        raise ValueError(f"Falló la optimización: {result.message}")
+    return result.x
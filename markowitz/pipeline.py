@@ -0,0 +1,327 @@
+"""
+Pipeline completo de optimización: descarga, CAPM, optimización, frontera
+eficiente, simulación Monte Carlo y VaR/CVaR del portafolio óptimo.
+
+Lo usan tanto el formulario HTML como la API JSON; devuelve un dict con
+tipos Python nativos, listo para el template o para serializar a JSON.
+"""
+import copy
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from markowitz import black_litterman, metrics
+from markowitz.capm import get_capm_expected_returns, market_candidates
+from markowitz.charts import encode_columns
+from markowitz.covariance import ESTIMATORS
+from markowitz.data import stored_last_date
+from markowitz.density import CloudDensity
+from markowitz.fetch import fetch_market_inputs
+from markowitz.model import MarketModel
+from markowitz.montecarlo import run_monte_carlo
+from markowitz.optimizer import compute_efficient_frontier, optimize_portfolio
+from markowitz.result_cache import create_result_cache, result_key
+from markowitz.risk import value_at_risk
+from markowitz.risk_free_rate import SOURCE_CACHED, peek_risk_free_rate_info
+from markowitz.singleflight import coalesced
+from markowitz.tickers import validate_tickers
+
+# Estimador de covarianza por defecto (ver markowitz.covariance)
+DEFAULT_COVARIANCE = os.getenv("COVARIANCE_ESTIMATOR", "sample")
+
+FRONTIER_POINTS = 200
+MONTE_CARLO_PORTFOLIOS = int(os.getenv("MONTE_CARLO_PORTFOLIOS", "5000"))
+
+# Sobre este número de portafolios el gráfico usa solo la densidad agregada
+MONTE_CARLO_SCATTER_MAX = int(os.getenv("MONTE_CARLO_SCATTER_MAX", "20000"))
+
+# VaR / CVaR diario del portafolio óptimo
+RISK_CONFIDENCE = float(os.getenv("RISK_CONFIDENCE", "0.95"))
+RISK_SCENARIOS = int(os.getenv("RISK_SCENARIOS", "100000"))
+
+
+# Resultados completos memoizados (ver markowitz.result_cache)
+result_cache = create_result_cache()
+
+
+@coalesced("optimization", share=copy.deepcopy)
+def run_optimization(tickers, period="5y", covariance=None, views=None):
+    """
+    Ejecuta el pipeline completo para una canasta de tickers.
+    covariance: estimador de covarianza (por defecto COVARIANCE_ESTIMATOR).
+    views: vistas del inversor (ver black_litterman.parse_views). Si se
+           entregan, los retornos esperados son los de Black-Litterman con
+           el CAPM como prior; el prior se cachea, así que repetir la
+           optimización con otras vistas solo resuelve el sistema de vistas.
+
+    El resultado se memoiza por tickers, periodo, tasa redondeada y fecha
+    del último dato (ver markowitz.result_cache). Si el almacén local ya
+    tiene al día los tickers y el índice de mercado, y la tasa está en
+    caché, la clave se arma antes de descargar y un acierto no toca la red;
+    si no, se busca después de la descarga. Las
+    llamadas concurrentes idénticas se resuelven con una sola ejecución
+    (ver markowitz.singleflight) y cada una recibe su copia.
+
+    Returns:
+        dict con rows (una fila por activo), expected_return, volatility,
+        sharpe, frontier, montecarlo (best_sharpe, min_vol, n_portfolios, la
+        densidad agregada en `density` y, si la nube es pequeña, los puntos
+        en `columns`, ver markowitz.density y markowitz.charts), risk (VaR/CVaR diario, ver
+        markowitz.risk), risk_free_rate, risk_free_rate_source, market_return
+        y, con vistas, black_litterman (τ y cada vista con su retorno
+        a priori y a posteriori); todos los valores son tipos Python nativos.
+
+    Raises:
+        ValueError: si la descarga o alguna etapa numérica falla.
+    """
+    validate_tickers(tickers)
+    covariance = covariance or DEFAULT_COVARIANCE
+    if covariance not in ESTIMATORS:
+        raise ValueError(f"Estimador de covarianza no soportado: {covariance}")
+
+    # Con todo al día en el almacén y la tasa en caché, un acierto evita la descarga
+    stored_key = _stored_result_key(tickers, period, covariance, views)
+    if stored_key is not None:
+        cached = result_cache.get(stored_key)
+        if cached is not None:
+            cached["risk_free_rate_source"] = SOURCE_CACHED
+            return _in_ticker_order(cached, tickers)
+
+    # Tasa libre de riesgo (Treasury 10Y), precios e índice de mercado en paralelo
+    with metrics.span("fetch"):
+        inputs = fetch_market_inputs(tickers, period=period)
+    risk_free_rate = inputs["risk_free_rate"]
+    prices = inputs["prices"]
+
+    key = _result_key(tickers, period, risk_free_rate, prices.index[-1], inputs["market_prices"].name,
+                      covariance, views)
+    cached = result_cache.get(key) if key != stored_key else None
+    if cached is not None:
+        cached["risk_free_rate_source"] = inputs["risk_free_rate_source"]
+        return _in_ticker_order(cached, tickers)
+
+    result = _run_analysis(inputs, tickers, period, covariance, views)
+    result_cache.put(key, result)
+    return result
+
+
+def _result_key(tickers, period, risk_free_rate, last_date, market, covariance, views):
+    return result_key(
+        tickers, period, risk_free_rate, last_date,
+        covariance=covariance,
+        market=market,
+        views=json.dumps(views, sort_keys=True) if views else None,
+        montecarlo=(MONTE_CARLO_PORTFOLIOS, MONTE_CARLO_SCATTER_MAX),
+        risk=(RISK_CONFIDENCE, RISK_SCENARIOS),
+    )
+
+
+def _stored_result_key(tickers, period, covariance, views):
+    """
+    Clave que tendría el resultado si fetch_market_inputs sirviera todo del
+    almacén y de la tasa en caché, o None si haría falta descargar algo.
+    Asume el primer candidato de índice de mercado: si la descarga terminara
+    usando otro, la clave no coincide y solo se pierde el acierto.
+    """
+    rate_info = peek_risk_free_rate_info(revalidate=False)
+    if rate_info["source"] != SOURCE_CACHED:
+        return None
+    market = market_candidates(tickers)[0]
+    last_date = stored_last_date(tickers, period=period)
+    if last_date is None or stored_last_date([market], period=period) is None:
+        return None
+    return _result_key(tickers, period, rate_info["rate"], last_date, market, covariance, views)
+
+
+def _run_analysis(inputs, tickers, period, covariance, views):
+    """Modelo y analyze_basket sobre las descargas de fetch_market_inputs."""
+    risk_free_rate = inputs["risk_free_rate"]
+    prices = inputs["prices"]
+
+    if views:
+        # Modelo y CAPM salen del prior cacheado (se calculan solo si no está)
+        with metrics.span("model"):
+            prior = black_litterman.get_prior(prices, inputs["market_prices"], risk_free_rate,
+                                              period=period, covariance=covariance)
+        return analyze_basket(prices, prior.model, inputs["market_prices"], risk_free_rate,
+                              inputs["risk_free_rate_source"], period=period, prior=prior, views=views)
+
+    # Retornos y covarianzas se calculan una sola vez para todas las etapas
+    with metrics.span("model"):
+        model = MarketModel.from_prices(prices, covariance=covariance,
+                                        market_prices=inputs["market_prices"])
+
+    return analyze_basket(prices, model, inputs["market_prices"], risk_free_rate,
+                          inputs["risk_free_rate_source"], period=period)
+
+
+def analyze_basket(prices, model, market_prices, risk_free_rate, risk_free_rate_source, period="5y",
+                   prior=None, views=None):
+    """
+    CAPM, optimización, frontera, Monte Carlo y VaR sobre datos ya descargados.
+    prior: black_litterman.EquilibriumPrior con el CAPM ya calculado.
+    views: vistas de Black-Litterman que reemplazan los retornos CAPM.
+    Devuelve el mismo dict que run_optimization.
+    """
+    # Calcular retornos esperados usando CAPM
+    if prior is not None and prior.capm is not None:
+        capm_data = prior.capm
+    else:
+        with metrics.span("capm"):
+            capm_data = get_capm_expected_returns(
+                prices, risk_free_rate, period=period, model=model,
+                market_prices=market_prices,
+            )
+    expected_returns = capm_data['expected_returns']
+    betas = capm_data['betas']
+    market_return = capm_data['market_return']
+
+    posterior = None
+    if views:
+        with metrics.span("black_litterman"):
+            if prior is None:
+                prior = black_litterman.equilibrium_prior(model, risk_free_rate, capm=capm_data)
+            posterior = prior.posterior(views)
+        expected_returns = posterior["expected_returns"]
+
+    # Optimizar portafolio usando retornos CAPM
+    with metrics.span("optimize"):
+        opt = optimize_portfolio(risk_free_rate=risk_free_rate, expected_returns_annual=expected_returns, model=model)
+    with metrics.span("frontier"):
+        frontier = compute_efficient_frontier(n_points=FRONTIER_POINTS, risk_free_rate=risk_free_rate,
+                                              expected_returns_annual=expected_returns, model=model)
+
+    # Simulación de portafolios aleatorios
+    scatter = MONTE_CARLO_PORTFOLIOS <= MONTE_CARLO_SCATTER_MAX
+    with metrics.span("montecarlo"):
+        mc = run_monte_carlo(n_portfolios=MONTE_CARLO_PORTFOLIOS, risk_free_rate=risk_free_rate,
+                             expected_returns_annual=expected_returns, model=model, as_dicts=False,
+                             density=CloudDensity(), keep_points=scatter)
+    # La densidad agregada (pocos KB) va siempre; la nube punto a punto solo
+    # si es pequeña, en columnas float32 (ver markowitz.charts)
+    mc_view = {key: mc[key] for key in ("best_sharpe", "min_vol", "n_portfolios")}
+    mc_view["density"] = mc["density"].to_dict()
+    if scatter:
+        mc_view["columns"] = encode_columns({
+            "volatility": mc["volatilities"], "return": mc["returns"], "sharpe": mc["sharpes"],
+        })
+
+    with metrics.span("risk"):
+        risk = value_at_risk(opt["weights"], confidence=RISK_CONFIDENCE, expected_returns_annual=expected_returns,
+                             model=model, n_scenarios=RISK_SCENARIOS)
+
+    rows = []
+    for i, ticker in enumerate(opt["tickers"]):
+        rows.append(
+            {
+                "ticker": ticker,
+                "weight": to_float(opt["weights"][i]),
+                "contrib_return": to_float(opt["contrib_return"].iloc[i]),
+                "contrib_var": to_float(opt["contrib_var"].iloc[i]),
+                "beta": to_float(betas[ticker]),
+                "volatility": to_float(opt["individual_volatilities"][ticker]),  # Volatilidad anual del activo
+                "expected_return_capm": to_float(capm_data['expected_returns'][ticker]),
+            }
+        )
+        if posterior is not None:
+            rows[-1]["expected_return_bl"] = to_float(expected_returns[ticker])
+
+    result = {
+        "rows": rows,
+        "expected_return": to_float(opt["expected_return"]),
+        "volatility": to_float(opt["volatility"]),
+        "sharpe": to_float(opt["sharpe"]),
+        "frontier": frontier,
+        "montecarlo": mc_view,
+        "risk": risk,
+        "risk_free_rate": to_float(risk_free_rate),
+        "risk_free_rate_source": risk_free_rate_source,
+        "market_return": to_float(market_return),
+    }
+    if posterior is not None:
+        result["black_litterman"] = {"tau": prior.tau, "views": posterior["views"]}
+
+    # Sanitizar recursivamente TODOS los valores para asegurar tipos Python nativos
+    with metrics.span("sanitize"):
+        return sanitize_for_template(result)
+
+
+def _in_ticker_order(result, tickers):
+    """
+    Ordena las filas por activo según `tickers`: la clave del caché no
+    distingue el orden en que se pidieron.
+    """
+    position = {ticker: i for i, ticker in enumerate(tickers)}
+    result["rows"].sort(key=lambda row: position.get(row["ticker"], len(position)))
+    result["frontier"]["individual_assets"].sort(key=lambda asset: position.get(asset["ticker"], len(position)))
+    return result
+
+
+def to_float(value):
+    """
+    Convierte un valor (escalar, Series, numpy array) a float Python.
+    Maneja Series de pandas, numpy arrays, y escalares.
+    """
+    if isinstance(value, pd.Series):
+        # Si es una Series con un solo valor, extraerlo
+        if len(value) == 1:
+            return float(value.iloc[0])
+        else:
+            raise ValueError(f"Se esperaba un valor escalar, pero se recibió una Series con {len(value)} elementos")
+    elif isinstance(value, np.ndarray):
+        # Si es un array numpy con un solo valor
+        if value.size == 1:
+            return float(value.item())
+        else:
+            raise ValueError(f"Se esperaba un valor escalar, pero se recibió un array con {value.size} elementos")
+    elif isinstance(value, np.generic):
+        # Si es un tipo numpy genérico (np.float64, np.int64, etc.)
+        return float(value.item())
+    else:
+        # Es un escalar, convertir a float
+        return float(value)
+
+
+_NATIVE_TYPES = (float, int, str, bool, type(None))
+
+
+def sanitize_for_template(obj):
+    """
+    Recursively converts all pandas/numpy types to Python natives.
+    Ensures template can safely render all values.
+    """
+    # Fast path: most leaves (e.g. the Monte Carlo cloud) are already native
+    if type(obj) in _NATIVE_TYPES:
+        return obj
+    if isinstance(obj, dict):
+        return {key: sanitize_for_template(value) for key, value in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [sanitize_for_template(item) for item in obj]
+    elif isinstance(obj, (pd.Series, pd.DataFrame)):
+        raise ValueError(f"Found pandas {type(obj).__name__} that should have been converted")
+    elif isinstance(obj, np.ndarray):
+        if obj.size == 1:
+            return float(obj.item())
+        elif obj.dtype.kind in "biuf":
+            # Numeric arrays convert in one C-level pass, no per-element recursion
+            return obj.tolist()
+        else:
+            return [sanitize_for_template(item) for item in obj]
+    elif isinstance(obj, np.generic):
+        # Convert numpy scalar types to Python natives
+        return obj.item()
+    elif isinstance(obj, (np.integer, np.floating)):
+        return float(obj)
+    elif isinstance(obj, str):
+        return obj
+    elif isinstance(obj, (int, float, bool, type(None))):
+        return obj
+    else:
+        # For any other type, try to convert to float
+        try:
+            return float(obj)
+        except (TypeError, ValueError):
+            # If conversion fails, return as-is and let validation catch it
+            return obj
@@ -0,0 +1,207 @@
+"""
+Solver de programas cuadráticos para universos grandes (cientos a miles de activos).
+
+Resuelve problemas de la forma
+
+    min ½ x'Px   s.a.  a'x = b,  x >= 0
+
+que cubren los dos casos long-only totalmente invertidos del optimizador:
+
+    - mínima varianza:  P = Σ, a = 1, b = 1
+    - máximo Sharpe:    P = Σ, a = μ - rf, b = 1 y luego w = x / sum(x)
+                        (reformulación de Tobin/Cornuejols-Tütüncü)
+
+Usa ADMM con una única factorización de Cholesky (memoria O(n²), cada
+iteración O(n²)) y termina con un pulido de conjunto activo que resuelve el
+sistema KKT sobre los activos con peso positivo, de modo que la solución final
+cumple las restricciones a precisión de máquina.
+"""
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+
+
+class QPError(ValueError):
+    """El problema no tiene solución factible o el solver no convergió."""
+
+
+def solve_qp(P, a, b=1.0, tol=1e-7, max_iter=5000, polish=True, polish_every=25, x0=None):
+    """
+    Minimiza ½ x'Px sujeto a a'x = b y x >= 0.
+
+    ADMM solo necesita identificar qué activos quedan con peso positivo: cada
+    `polish_every` iteraciones se intenta el pulido de conjunto activo y, si
+    el resultado cumple las condiciones KKT, es el óptimo exacto y se termina.
+
+    Args:
+        P: matriz simétrica semidefinida positiva (n x n)
+        a: vector de la restricción de igualdad
+        b: lado derecho de la igualdad
+        tol: tolerancia de los residuos primal y dual (relativa a la escala de P)
+        max_iter: iteraciones máximas de ADMM
+        polish: refinar con conjunto activo
+        polish_every: iteraciones de ADMM entre intentos de pulido
+        x0: solución aproximada para arrancar en caliente (p.ej. la de un
+            problema vecino); si su conjunto activo ya es el óptimo, el
+            pulido termina sin iterar ADMM
+
+    Returns:
+        array x con la solución.
+
+    Raises:
+        QPError: si ningún x >= 0 cumple a'x = b.
+    """
+    P = np.asarray(P, dtype=float)
+    a = np.asarray(a, dtype=float)
+    if (b > 0 and not (a > 0).any()) or (b < 0 and not (a < 0).any()):
+        raise QPError("La restricción de igualdad no tiene solución con pesos no negativos.")
+
+    if x0 is not None:
+        x0 = np.maximum(np.asarray(x0, dtype=float), 0.0)
+        if polish:
+            polished = _polish(P, a, b, x0, tol)
+            if polished is not None:
+                return polished
+
+    x = None
+    for x, converged in _admm(P, a, b, tol, max_iter, check_every=polish_every, x0=x0):
+        if polish:
+            polished = _polish(P, a, b, x, tol)
+            if polished is not None:
+                return polished
+        if converged:
+            break
+    return np.maximum(x, 0.0)
+
+
+def min_variance_weights(cov, **kwargs):
+    """Pesos long-only de mínima varianza (suman 1). x0 (opcional) son pesos previos."""
+    cov = np.asarray(cov, dtype=float)
+    weights = solve_qp(cov, np.ones(cov.shape[0]), 1.0, **kwargs)
+    return weights / weights.sum()
+
+
+def max_sharpe_weights(mean_returns, cov, risk_free_rate=0.0, **kwargs):
+    """
+    Pesos long-only de máximo Sharpe (suman 1).
+    x0 (opcional) son pesos previos; se reescalan a la variable y de Tobin.
+
+    Si ningún activo rinde sobre la tasa libre de riesgo la reformulación de
+    Tobin no tiene solución, pero el máximo sigue existiendo: con todos los
+    excesos <= 0 el Sharpe de una mezcla nunca supera al mejor Sharpe
+    individual (la volatilidad es subaditiva), así que el óptimo es el activo
+    de mejor Sharpe solo. Es lo mismo a lo que llega SLSQP con pocos activos.
+    """
+    excess = np.asarray(mean_returns, dtype=float) - risk_free_rate
+    if not (excess > 0).any():
+        volatilities = np.sqrt(np.maximum(np.diag(np.asarray(cov, dtype=float)), 1e-300))
+        weights = np.zeros(excess.size)
+        weights[np.argmax(excess / volatilities)] = 1.0
+        return weights
+    x0 = kwargs.pop("x0", None)
+    if x0 is not None:
+        x0 = np.asarray(x0, dtype=float)
+        scale = float(excess @ x0)
+        kwargs["x0"] = x0 / scale if scale > 0 else None
+    y = solve_qp(cov, excess, 1.0, **kwargs)
+    return y / y.sum()
+
+
+def _admm(P, a, b, tol, max_iter, check_every=25, x0=None):
+    """
+    ADMM (forma OSQP) con z = [x; a'x] y restricciones 0 <= z[:n], z[n] = b.
+    La restricción de igualdad usa un rho mayor, como recomienda OSQP.
+
+    Generador: entrega (iterado, convergió) cada `check_every` iteraciones,
+    al converger y al agotar max_iter.
+    """
+    n = a.size
+    scale = max(float(np.mean(np.diag(P))), 1e-12)
+    sigma = 1e-6 * scale
+    rho = 0.1 * scale
+    a_norm2 = float(a @ a) or 1.0
+    rho_eq = 1e3 * rho * n / a_norm2
+
+    # (P + σI + ρI + ρ_eq a a') x = rhs, factorizada una sola vez
+    kkt = P + (sigma + rho) * np.eye(n) + rho_eq * np.outer(a, a)
+    factor = cho_factor(kkt, lower=True, check_finite=False)
+
+    if x0 is not None:
+        x = np.maximum(x0, 0.0)
+    else:
+        x = np.maximum(np.full(n, b / a_norm2) * a if b else np.zeros(n), 0.0)
+    z_box = x.copy()
+    z_eq = b
+    y_box = np.zeros(n)
+    y_eq = 0.0
+    alpha = 1.6
+
+    eps = tol * scale
+    for iteration in range(1, max_iter + 1):
+        rhs = sigma * x + rho * z_box - y_box + a * (rho_eq * z_eq - y_eq)
+        x_tilde = cho_solve(factor, rhs, check_finite=False)
+        ax_tilde = float(a @ x_tilde)
+
+        x = alpha * x_tilde + (1 - alpha) * x
+        relaxed_box = alpha * x_tilde + (1 - alpha) * z_box
+        relaxed_eq = alpha * ax_tilde + (1 - alpha) * z_eq
+
+        z_box_prev = z_box
+        z_box = np.maximum(relaxed_box + y_box / rho, 0.0)
+        y_box = y_box + rho * (relaxed_box - z_box)
+        y_eq = y_eq + rho_eq * (relaxed_eq - b)
+        z_eq = b
+
+        primal = max(float(np.max(np.abs(x - z_box), initial=0.0)), abs(float(a @ x) - b))
+        dual = rho * float(np.max(np.abs(z_box - z_box_prev), initial=0.0))
+        if primal < eps and dual < eps:
+            yield z_box, True
+            return
+        if iteration % check_every == 0 or iteration == max_iter:
+            yield z_box, iteration == max_iter
+
+
+def _polish(P, a, b, x, tol, max_iter=None):
+    """
+    Conjunto activo a partir de la solución aproximada: resuelve el KKT
+    restringido a los activos libres y agrega o quita activos hasta cumplir
+    las condiciones de optimalidad. Devuelve None si no converge.
+    """
+    n = a.size
+    threshold = tol * max(float(np.max(x, initial=0.0)), 1e-12) * 10
+    free = x > threshold
+    if not free.any():
+        free[int(np.argmax(x))] = True
+    max_iter = max_iter or 2 * n + 10
+
+    for _ in range(max_iter):
+        idx = np.flatnonzero(free)
+        k = idx.size
+        system = np.zeros((k + 1, k + 1))
+        system[:k, :k] = P[np.ix_(idx, idx)]
+        system[:k, k] = -a[idx]
+        system[k, :k] = a[idx]
+        rhs = np.zeros(k + 1)
+        rhs[k] = b
+        try:
+            solution = np.linalg.solve(system, rhs)
+        except np.linalg.LinAlgError:
+            solution = np.linalg.lstsq(system, rhs, rcond=None)[0]
+        x_free, nu = solution[:k], solution[k]
+
+        if (x_free < 0).any():
+            # Quitar el activo más negativo y volver a resolver
+            free[idx[int(np.argmin(x_free))]] = False
+            if not free.any():
+                return None
+            continue
+
+        candidate = np.zeros(n)
+        candidate[idx] = x_free
+        multipliers = P @ candidate - nu * a
+        multipliers[idx] = 0.0
+        worst = int(np.argmin(multipliers))
+        scale = max(float(np.max(np.abs(np.diag(P)))), 1e-12)
+        if multipliers[worst] >= -tol * scale:
+            return candidate
+        free[worst] = True
+    return None
@@ -0,0 +1,225 @@
+"""
+Memoización del resultado completo del pipeline.
+
+La misma canasta y periodo se piden muchas veces al día. El resultado de
+run_optimization se guarda bajo una clave con los tickers normalizados
+(como conjunto), el periodo, la tasa libre de riesgo redondeada, la fecha
+del último dato y las opciones que cambian el resultado. Cuando llegan datos
+nuevos cambia la fecha y con ella la clave: las entradas viejas ya no se
+consultan y salen por LRU.
+
+- Memoria: resultados serializados con pickle en un LRU acotado por bytes
+  (RESULT_CACHE_MAX_BYTES); cada acierto entrega una copia nueva, así que
+  quien lo recibe puede modificarlo.
+- Disco (opcional, RESULT_CACHE_DIR): un archivo por clave, escrito en un
+  temporal y publicado con os.replace, compartido entre procesos y
+  reinicios. Se acota con RESULT_CACHE_DISK_MAX_BYTES borrando los archivos
+  usados hace más tiempo.
+
+Aciertos y fallos se cuentan en markowitz_result_cache_requests_total; los
+bytes y entradas en memoria y la tasa de aciertos de stats() se publican en
+markowitz_result_cache_bytes, markowitz_result_cache_entries y
+markowitz_result_cache_hit_ratio (ver /metrics).
+"""
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from markowitz import metrics
+from markowitz.store import atomic_write
+
+# Decimales de la tasa libre de riesgo en la clave (4 = 1 punto base)
+RATE_DECIMALS = 4
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_DISK_MAX_BYTES = 512 * 1024 * 1024
+
+REQUESTS_METRIC = "markowitz_result_cache_requests_total"
+BYTES_METRIC = "markowitz_result_cache_bytes"
+ENTRIES_METRIC = "markowitz_result_cache_entries"
+HIT_RATIO_METRIC = "markowitz_result_cache_hit_ratio"
+
+
+def result_key(tickers, period, risk_free_rate, last_date, **options):
+    """
+    Clave de un resultado. `options` son los demás parámetros que lo
+    cambian (estimador, vistas, tamaño de la simulación...) y deben tener
+    una representación estable con repr().
+    """
+    return (
+        tuple(sorted({str(ticker).strip().upper() for ticker in tickers})),
+        period,
+        round(float(risk_free_rate), RATE_DECIMALS),
+        str(pd.Timestamp(last_date).date()),
+        tuple(sorted(options.items())),
+    )
+
+
+class ResultCache:
+    """
+    LRU de resultados acotado por bytes, con un nivel opcional en disco.
+
+    Args:
+        max_bytes: tope de bytes serializados en memoria (0 desactiva la memoria).
+        directory: carpeta del nivel en disco (None lo desactiva).
+        disk_max_bytes: tope de bytes en disco.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None, disk_max_bytes=DEFAULT_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()   # digest -> bytes de pickle
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Copia del resultado guardado para `key`, o None."""
+        digest = _digest(key)
+        with self._lock:
+            blob = self._entries.get(digest)
+            if blob is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                self._publish()
+        if blob is not None:
+            metrics.increment(REQUESTS_METRIC, result="hit", tier="memory")
+            return pickle.loads(blob)
+
+        result = None
+        if self.directory:
+            blob = self._read_disk(digest)
+            result = _loads(blob) if blob is not None else None
+        if result is None:
+            with self._lock:
+                self.misses += 1
+                self._publish()
+            metrics.increment(REQUESTS_METRIC, result="miss")
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._store(digest, blob)
+        metrics.increment(REQUESTS_METRIC, result="hit", tier="disk")
+        return result
+
+    def put(self, key, result):
+        """Guarda `result` (debe poder serializarse con pickle)."""
+        digest = _digest(key)
+        blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._store(digest, blob)
+        if self.directory:
+            try:
+                self._write_disk(digest, blob)
+            except OSError as exc:
+                print(f"Warning: no se pudo guardar el resultado en disco: {exc}")
+
+    def clear(self):
+        """Vacía la memoria y reinicia las estadísticas (el disco no se toca)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.disk_hits = self.misses = 0
+            self._publish()
+
+    def stats(self):
+        """Aciertos (memoria y disco), fallos, tasa de aciertos, entradas y bytes en memoria."""
+        with self._lock:
+            return self._stats()
+
+    def _stats(self):
+        requests = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / requests if requests else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _publish(self):
+        """Publica bytes, entradas y tasa de aciertos como gauges (con el lock tomado)."""
+        stats = self._stats()
+        metrics.set_gauge(BYTES_METRIC, stats["bytes"])
+        metrics.set_gauge(ENTRIES_METRIC, stats["entries"])
+        metrics.set_gauge(HIT_RATIO_METRIC, stats["hit_rate"])
+
+    def _store(self, digest, blob):
+        """Agrega a la memoria y expulsa por LRU hasta respetar max_bytes (con el lock tomado)."""
+        previous = self._entries.pop(digest, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        if len(blob) <= self.max_bytes:
+            self._entries[digest] = blob
+            self._bytes += len(blob)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+        self._publish()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f"{digest}.pkl")
+
+    def _read_disk(self, digest):
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as fh:
+                blob = fh.read()
+            os.utime(path)  # el mtime marca el último uso para el recorte
+        except OSError:
+            return None
+        return blob
+
+    def _write_disk(self, digest, blob):
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self._path(digest), blob)
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Borra los archivos usados hace más tiempo hasta respetar disk_max_bytes."""
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".pkl"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+def create_result_cache():
+    """ResultCache configurado con RESULT_CACHE_MAX_BYTES, RESULT_CACHE_DIR y RESULT_CACHE_DISK_MAX_BYTES."""
+    return ResultCache(
+        max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+        directory=os.getenv("RESULT_CACHE_DIR") or None,
+        disk_max_bytes=int(os.getenv("RESULT_CACHE_DISK_MAX_BYTES", str(DEFAULT_DISK_MAX_BYTES))),
+    )
+
+
+def _loads(blob):
+    """Resultado de un archivo en disco, o None si no se puede leer (p.ej. de otra versión)."""
+    try:
+        return pickle.loads(blob)
+    except Exception as exc:  # noqa: BLE001
+        print(f"Warning: resultado en disco ilegible, se recalcula: {exc}")
+        return None
+
+
+def _digest(key):
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
@@ -0,0 +1,219 @@
+"""
+Value at Risk (VaR) y Conditional VaR (CVaR) de portafolios.
+
+Tres métodos sobre el mismo MarketModel:
+
+- "parametric": retornos normales con la media y covarianza del modelo.
+- "historical": cuantil empírico de los retornos realizados del portafolio
+  (sumas de `horizon_days` días consecutivos).
+- "monte_carlo": escenarios normales generados con el factor de Cholesky de
+  la covarianza anual, por bloques de `chunk_size` escenarios. Cada bloque
+  se evalúa para todos los vectores de pesos con un único producto matricial
+  y se acumula en un histograma fijo por portafolio, así que la memoria no
+  crece con el número de escenarios (10 millones caben sin problema).
+
+VaR y CVaR se expresan como pérdidas positivas (fracción del valor del
+portafolio) a `confidence` y en un horizonte de `horizon_days` días hábiles.
+`weights` puede ser un vector (un portafolio) o una matriz m x n (p.ej. los
+pesos de la frontera eficiente); en el segundo caso se devuelven arrays.
+"""
+import numpy as np
+from scipy.stats import norm
+
+from markowitz.model import TRADING_DAYS_PER_YEAR, MarketModel
+
+METHODS = ("parametric", "historical", "monte_carlo")
+
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_SCENARIOS = 100_000
+
+# Memoria de trabajo por bloque. Cada escenario ocupa n_assets + n_portfolios
+# floats (shocks y retornos), así que el bloque tiene
+# DEFAULT_CHUNK_BYTES / (8 (n + m)) escenarios sin importar el universo.
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+
+# El histograma de cada portafolio cubre la cola izquierda desde μ - 10σ
+# hasta el punto con probabilidad TAIL_SPAN veces la de la cola pedida
+# (p.ej. 20% para VaR al 95%), con TAIL_BINS intervalos; lo que cae bajo
+# μ - 10σ se acumula en el primer intervalo
+TAIL_BINS = 4096
+TAIL_SIGMAS = 10.0
+TAIL_SPAN = 4.0
+
+
+def value_at_risk(weights, price_df=None, confidence=DEFAULT_CONFIDENCE, horizon_days=1, methods=METHODS,
+                  expected_returns_annual=None, model=None, n_scenarios=DEFAULT_SCENARIOS,
+                  chunk_size=None, seed=42, covariance="sample"):
+    """
+    VaR y CVaR de uno o varios portafolios con los métodos pedidos.
+
+    Args:
+        weights: pesos (n,) o (m, n) en el orden de los tickers del modelo.
+        price_df: DataFrame de precios; no se usa si se entrega `model`.
+        confidence: nivel de confianza, entre 0.5 y 1 (p.ej. 0.95 o 0.99).
+        horizon_days: horizonte en días hábiles.
+        methods: subconjunto de METHODS.
+        expected_returns_annual: retornos esperados anuales (p.ej. CAPM) para
+                                 los métodos paramétrico y Monte Carlo; el
+                                 histórico usa siempre los retornos realizados.
+        model: MarketModel ya calculado.
+        n_scenarios, chunk_size, seed: ver monte_carlo_var.
+        covariance: estimador de covarianza al construir el modelo.
+
+    Returns:
+        dict con confidence, horizon_days y, por método, {"var", "cvar"}.
+    """
+    _check_confidence(confidence)
+    unknown = set(methods) - set(METHODS)
+    if unknown:
+        raise ValueError(f"Métodos de VaR no soportados: {', '.join(sorted(unknown))}")
+    if model is None:
+        model = MarketModel.from_prices(price_df, covariance=covariance)
+
+    result = {"confidence": confidence, "horizon_days": horizon_days}
+    if "parametric" in methods:
+        result["parametric"] = parametric_var(weights, model, confidence, horizon_days, expected_returns_annual)
+    if "historical" in methods:
+        result["historical"] = historical_var(weights, model, confidence, horizon_days)
+    if "monte_carlo" in methods:
+        result["monte_carlo"] = monte_carlo_var(
+            weights, model, confidence, horizon_days, expected_returns_annual,
+            n_scenarios=n_scenarios, chunk_size=chunk_size, seed=seed,
+        )
+    return result
+
+
+def parametric_var(weights, model, confidence=DEFAULT_CONFIDENCE, horizon_days=1, expected_returns_annual=None):
+    """VaR y CVaR normales: μ_p - z σ_p y μ_p - σ_p φ(z) / (1 - confidence)."""
+    _check_confidence(confidence)
+    matrix, single = _as_matrix(weights, model.n_assets)
+    scale = horizon_days / TRADING_DAYS_PER_YEAR
+    means = matrix @ model.expected_returns(expected_returns_annual) * scale
+    variances = np.einsum("ij,ij->i", matrix @ model.cov_operator, matrix) * scale
+    vols = np.sqrt(np.maximum(variances, 0.0))
+
+    z = norm.ppf(confidence)
+    var = -(means - z * vols)
+    cvar = -(means - vols * norm.pdf(z) / (1 - confidence))
+    return _pack(var, cvar, single)
+
+
+def historical_var(weights, model, confidence=DEFAULT_CONFIDENCE, horizon_days=1):
+    """Cuantil y media de la cola de los retornos históricos del portafolio."""
+    _check_confidence(confidence)
+    matrix, single = _as_matrix(weights, model.n_assets)
+    daily = model.returns.to_numpy(dtype=float) @ matrix.T
+    if horizon_days > 1:
+        if horizon_days >= daily.shape[0]:
+            raise ValueError("El horizonte supera el largo del histórico.")
+        cumulative = np.vstack([np.zeros(daily.shape[1]), np.cumsum(daily, axis=0)])
+        daily = cumulative[horizon_days:] - cumulative[:-horizon_days]
+
+    quantiles = np.quantile(daily, 1 - confidence, axis=0)
+    in_tail = daily <= quantiles
+    tail_means = (daily * in_tail).sum(axis=0) / in_tail.sum(axis=0)
+    return _pack(-quantiles, -tail_means, single)
+
+
+def monte_carlo_var(weights, model, confidence=DEFAULT_CONFIDENCE, horizon_days=1, expected_returns_annual=None,
+                    n_scenarios=DEFAULT_SCENARIOS, chunk_size=None, seed=42):
+    """
+    VaR y CVaR con escenarios normales r = μ_h + L_h z, L_h = Cholesky de Σ_h.
+
+    Por bloque (chunk_size escenarios, por defecto los que caben en
+    DEFAULT_CHUNK_BYTES) se calcula (W L_h) Z (m x chunk) y se suma al histograma
+    de la cola de cada portafolio; el cuantil y la media de la cola salen del
+    histograma interpolando dentro del intervalo que cruza el nivel pedido.
+    """
+    _check_confidence(confidence)
+    if n_scenarios < 1 or (chunk_size is not None and chunk_size < 1):
+        raise ValueError("n_scenarios y chunk_size deben ser enteros positivos.")
+    matrix, single = _as_matrix(weights, model.n_assets)
+    if chunk_size is None:
+        chunk_size = max(1, DEFAULT_CHUNK_BYTES // (8 * (model.n_assets + matrix.shape[0])))
+    scale = horizon_days / TRADING_DAYS_PER_YEAR
+
+    means = matrix @ model.expected_returns(expected_returns_annual) * scale
+    loadings = matrix @ model.cholesky * np.sqrt(scale)      # m x n
+    vols = np.sqrt(np.sum(loadings ** 2, axis=1))
+
+    tail = _TailHistogram(means, vols, 1 - confidence)
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_scenarios, chunk_size):
+        size = min(chunk_size, n_scenarios - start)
+        shocks = rng.standard_normal((model.n_assets, size))
+        tail.add(loadings @ shocks + means[:, None])
+
+    quantiles, tail_means = tail.quantile_and_tail_mean(1 - confidence)
+    return _pack(-quantiles, -tail_means, single)
+
+
+class _TailHistogram:
+    """
+    Conteos y sumas por intervalo de la cola izquierda de m distribuciones.
+
+    Solo se clasifican los valores bajo `upper` (μ - cut·σ, con probabilidad
+    TAIL_SPAN veces la de la cola pedida); el resto solo suma al total, de
+    modo que cada bloque procesa una fracción pequeña de los escenarios.
+    Con sumas exactas por intervalo, la media de la cola solo aproxima
+    dentro del intervalo que contiene el cuantil.
+    """
+
+    def __init__(self, means, vols, level, bins=TAIL_BINS, sigmas=TAIL_SIGMAS):
+        vols = np.maximum(vols, 1e-12)
+        cut = -norm.ppf(min(TAIL_SPAN * level, 0.5))
+        self.bins = bins
+        self.low = means - sigmas * vols
+        self.upper = means - cut * vols
+        self.inv_step = bins / ((sigmas - cut) * vols)
+        self.counts = np.zeros((means.size, bins))
+        self.sums = np.zeros((means.size, bins))
+        self.n_obs = 0
+
+    def add(self, values):
+        """values: array (m x escenarios)."""
+        rows, cols = np.nonzero(values < self.upper[:, None])
+        tail = values[rows, cols]
+        index = ((tail - self.low[rows]) * self.inv_step[rows]).astype(np.int64)
+        np.clip(index, 0, self.bins - 1, out=index)
+        flat = rows * self.bins + index
+        size = self.counts.size
+        self.counts += np.bincount(flat, minlength=size).reshape(self.counts.shape)
+        self.sums += np.bincount(flat, weights=tail, minlength=size).reshape(self.sums.shape)
+        self.n_obs += values.shape[1]
+
+    def quantile_and_tail_mean(self, level):
+        target = level * self.n_obs
+        cumulative = np.cumsum(self.counts, axis=1)
+        rows = np.arange(self.counts.shape[0])
+        # Si la cola no alcanza el nivel (muy pocos escenarios) se usa el último intervalo
+        crossing = np.where(cumulative[:, -1] >= target, np.argmax(cumulative >= target, axis=1), self.bins - 1)
+
+        in_bin = self.counts[rows, crossing]
+        below = cumulative[rows, crossing] - in_bin
+        fraction = np.clip((target - below) / np.maximum(in_bin, 1.0), 0.0, 1.0)
+        quantiles = self.low + (crossing + fraction) / self.inv_step
+
+        sums_below = np.cumsum(self.sums, axis=1)[rows, crossing] - self.sums[rows, crossing]
+        tail_sums = sums_below + fraction * self.sums[rows, crossing]
+        return quantiles, tail_sums / max(target, 1.0)
+
+
+def _as_matrix(weights, n_assets):
+    matrix = np.asarray(weights, dtype=float)
+    single = matrix.ndim == 1
+    matrix = np.atleast_2d(matrix)
+    if matrix.ndim != 2 or matrix.shape[1] != n_assets:
+        raise ValueError(f"Se esperaban pesos con {n_assets} activos.")
+    return matrix, single
+
+
+def _pack(var, cvar, single):
+    if single:
+        return {"var": float(var[0]), "cvar": float(cvar[0])}
+    return {"var": var, "cvar": cvar}
+
+
+def _check_confidence(confidence):
+    if not 0.5 < confidence < 1:
+        raise ValueError("El nivel de confianza debe estar entre 0.5 y 1.")
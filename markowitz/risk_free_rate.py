@@ -1,7 +1,37 @@
 """
 Módulo para obtener la tasa libre de riesgo del bono del tesoro a 10 años.
+
+La tasa cambia una vez al día, así que se guarda en un caché del proceso con
+TTL configurable (RISK_FREE_RATE_TTL, segundos). Cuando el valor vence se
+sigue sirviendo el último conocido mientras un hilo en segundo plano lo
+refresca (stale-while-revalidate); solo la primera llamada espera a Yahoo.
 """
-import yfinance as yf
+import os
+import threading
+import time
+from datetime import datetime
+
+from markowitz import metrics
+from markowitz.singleflight import coalesced
+
+# Segundos durante los que la tasa se considera vigente
+RISK_FREE_RATE_TTL = float(os.getenv("RISK_FREE_RATE_TTL", "3600"))
+
+# Estimación conservadora si Yahoo no responde
+FALLBACK_RISK_FREE_RATE = 0.04
+
+# Origen del valor devuelto
+SOURCE_LIVE = "live"
+SOURCE_CACHED = "cached"
+SOURCE_FALLBACK = "fallback"
+
+_lock = threading.Lock()
+_cache = {
+    "rate": None,         # último valor obtenido de Yahoo
+    "fetched_at": None,   # datetime de ese valor
+    "checked_at": None,   # time.monotonic() del último intento (exitoso o no)
+    "refreshing": False,
+}
 
 
 def get_10year_treasury_rate():
@@ -9,26 +39,125 @@ def get_10year_treasury_rate():
     Obtiene la tasa del bono del tesoro a 10 años usando yfinance (^TNX).
     ^TNX es el ticker para el Treasury Yield 10 Years en Yahoo Finance.
     Retorna la tasa anualizada como decimal (ej: 0.04 para 4%).
-    Si no puede obtener datos, retorna 0.0.
+    Si no puede obtener datos, retorna 0.04.
     """
-    try:
-        # ^TNX es el ticker de Yahoo Finance para el Treasury 10Y
-        # Devuelve el yield en porcentaje
-        treasury = yf.Ticker("^TNX")
+    return get_risk_free_rate_info()["rate"]
+
+
+def get_risk_free_rate_info(ttl=None):
+    """
+    Tasa libre de riesgo junto con su origen.
+
+    Returns:
+        dict con:
+            - rate: tasa anualizada como decimal
+            - source: "live" (recién descargada), "cached" (del caché, aunque
+                      esté refrescándose) o "fallback" (4% estimado)
+            - fetched_at: datetime de la descarga (None si es fallback)
+    """
+    ttl = RISK_FREE_RATE_TTL if ttl is None else ttl
+
+    with _lock:
+        checked_at = _cache["checked_at"]
+        if checked_at is None:
+            first_call = True
+        else:
+            first_call = False
+            expired = time.monotonic() - checked_at >= ttl
+            if expired and not _cache["refreshing"]:
+                _cache["refreshing"] = True
+                _start_refresh()
+            return _snapshot(SOURCE_CACHED)
+
+    if first_call:
+        # Primera llamada del proceso: no hay valor previo que servir
+        _refresh()
+        return _snapshot(SOURCE_LIVE)
+
+
+def peek_risk_free_rate_info(ttl=None, revalidate=True):
+    """
+    Como get_risk_free_rate_info pero sin esperar nunca la descarga: el
+    último valor guardado (source "cached") o el 4% estimado (source
+    "fallback") si todavía no hay uno. Si el valor venció o falta, lanza la
+    misma revalidación en segundo plano, así que las visitas siguientes ven
+    la tasa al día. Para la página inicial, que no debe esperar a Yahoo en
+    un arranque en frío. Con revalidate=False solo lee el caché.
+    """
+    ttl = RISK_FREE_RATE_TTL if ttl is None else ttl
+
+    with _lock:
+        checked_at = _cache["checked_at"]
+        stale = checked_at is None or time.monotonic() - checked_at >= ttl
+        if revalidate and stale and not _cache["refreshing"]:
+            _cache["refreshing"] = True
+            _start_refresh()
+        if _cache["rate"] is None:
+            return {"rate": FALLBACK_RISK_FREE_RATE, "source": SOURCE_FALLBACK, "fetched_at": None}
+        return {"rate": _cache["rate"], "source": SOURCE_CACHED, "fetched_at": _cache["fetched_at"]}
+
 
-        # Obtener datos del último día de trading
-        hist = treasury.history(period="5d")
+def clear_risk_free_rate_cache():
+    """Olvida el valor guardado (la próxima llamada vuelve a descargar)."""
+    with _lock:
+        _cache.update(rate=None, fetched_at=None, checked_at=None, refreshing=False)
 
-        if hist.empty:
-            raise ValueError("No se obtuvieron datos del Treasury")
 
-        # Obtener el último precio de cierre (que es el yield en %)
-        latest_yield = hist['Close'].iloc[-1]
+def _snapshot(source):
+    rate = _cache["rate"]
+    if rate is None:
+        metrics.increment("markowitz_fallbacks_total", kind="risk_free_rate")
+        return {"rate": FALLBACK_RISK_FREE_RATE, "source": SOURCE_FALLBACK, "fetched_at": None}
+    return {"rate": rate, "source": source, "fetched_at": _cache["fetched_at"]}
 
-        # Convertir de porcentaje a decimal (ej: 4.5 -> 0.045)
-        return float(latest_yield / 100.0)
 
+def _start_refresh():
+    """Lanza _refresh en un hilo (con _lock tomado y refreshing ya marcado)."""
+    threading.Thread(target=_refresh, name="risk-free-rate", daemon=True).start()
+
+
+def _refresh():
+    """Descarga la tasa y actualiza el caché; ante error conserva el último valor."""
+    try:
+        rate = _fetch_treasury_rate()
     except Exception as e:
         print(f"Warning: No se pudo obtener tasa del tesoro: {e}")
-        print("Usando tasa libre de riesgo = 0.04 (4% estimado)")
-        return 0.04  # Fallback a 4% como estimación conservadora
+        metrics.increment("markowitz_download_failures_total", source="risk_free_rate")
+        if _cache["rate"] is None:
+            print(f"Usando tasa libre de riesgo = {FALLBACK_RISK_FREE_RATE} (4% estimado)")
+        with _lock:
+            _cache.update(checked_at=time.monotonic(), refreshing=False)
+        return
+
+    with _lock:
+        _cache.update(
+            rate=rate,
+            fetched_at=datetime.now(),
+            checked_at=time.monotonic(),
+            refreshing=False,
+        )
+
+
+@metrics.timed("download_risk_free_rate")
+@coalesced("risk_free_rate")
+def _fetch_treasury_rate():
+    """
+    Último cierre de ^TNX convertido de porcentaje a decimal. Si varios hilos
+    lo piden a la vez (p.ej. la primera llamada de cada uno), se descarga una vez.
+    """
+    # Importación diferida: la página inicial consulta este módulo sin
+    # cargar pandas ni yfinance (ver markowitz.warmup)
+    from markowitz.sources import get_source
+
+    # ^TNX es el ticker de Yahoo Finance para el Treasury 10Y
+    # Devuelve el yield en porcentaje
+    hist = get_source().history(["^TNX"], field="Close", period="5d")
+
+    if "^TNX" not in hist.columns or hist["^TNX"].dropna().empty:
+        raise ValueError("No se obtuvieron datos del Treasury")
+
+    # Obtener el último precio de cierre del último día de trading (que es el yield en %)
+    latest_yield = hist["^TNX"].dropna().iloc[-1]
+
+    # Convertir de porcentaje a decimal (ej: 4.5 -> 0.045)
+    return float(latest_yield / 100.0)
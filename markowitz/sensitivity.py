@@ -0,0 +1,278 @@
+"""
+Análisis de sensibilidad de la cartera óptima.
+
+Evalúa pesos óptimos, Sharpe y frontera eficiente sobre una grilla de
+(periodo histórico x modelo de retornos x tasa libre de riesgo):
+
+- Se descarga una sola vez el histórico del periodo más largo; los demás
+  periodos son cortes de ese panel.
+- Cada periodo construye un único MarketModel (y sus betas), que comparten
+  todos los puntos de la grilla de ese periodo.
+- Las tasas se recorren en orden y cada optimización arranca desde los
+  pesos de la tasa anterior, que quedan muy cerca del nuevo óptimo.
+- Los periodos son independientes y se reparten en un pool de procesos
+  compartido, creado una vez por proceso con "forkserver" (o "spawn"): la app
+  corre en un servidor con hilos y hacer fork ahí puede dejar locks tomados
+  en el hijo.
+
+El resultado son arrays densos (periodo x modelo x tasa [x activo]) listos
+para heatmaps; con as_lists=True se entregan como listas con None en los
+puntos que fallaron.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from markowitz import metrics
+from markowitz.capm import calculate_betas, calculate_capm_returns
+from markowitz.covariance import ESTIMATORS
+from markowitz.data import clean_price_panel
+from markowitz.fetch import fetch_batch_inputs
+from markowitz.model import TRADING_DAYS_PER_YEAR, MarketModel
+from markowitz.optimizer import compute_efficient_frontier, optimize_slsqp
+from markowitz.pipeline import DEFAULT_COVARIANCE
+from markowitz.store import period_start
+from markowitz.tickers import validate_tickers
+
+RETURN_MODELS = ("capm", "historical")
+DEFAULT_PERIODS = ("1y", "2y", "3y", "5y", "10y")
+
+# Tasas por defecto: la tasa actual ± 2 puntos en pasos de 50 pb
+DEFAULT_RATE_OFFSETS = np.arange(-0.02, 0.0201, 0.005)
+
+MAX_SENSITIVITY_RATES = 50
+SENSITIVITY_FRONTIER_POINTS = 25
+SENSITIVITY_WORKERS = int(os.getenv("SENSITIVITY_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def validate_sweep(periods, risk_free_rates=None, return_models=RETURN_MODELS):
+    """Lanza ValueError si la grilla pedida no es válida."""
+    if not periods:
+        raise ValueError("Debes indicar al menos un periodo.")
+    for period in periods:
+        if not isinstance(period, str) or period in ("max", "ytd"):
+            raise ValueError(f"Periodo no soportado: {period}")
+        period_start(period)
+    if risk_free_rates is not None:
+        if not 0 < len(risk_free_rates) <= MAX_SENSITIVITY_RATES:
+            raise ValueError(f"Se admiten entre 1 y {MAX_SENSITIVITY_RATES} tasas libres de riesgo.")
+        if not all(isinstance(rate, (int, float)) and not isinstance(rate, bool) for rate in risk_free_rates):
+            raise ValueError("Las tasas libres de riesgo deben ser números.")
+    unknown = [m for m in return_models if m not in RETURN_MODELS]
+    if not return_models or unknown:
+        raise ValueError(f"Modelos de retorno soportados: {', '.join(RETURN_MODELS)}")
+
+
+def run_sensitivity(tickers, periods=DEFAULT_PERIODS, risk_free_rates=None, return_models=RETURN_MODELS,
+                    covariance=None, frontier_points=SENSITIVITY_FRONTIER_POINTS,
+                    max_workers=SENSITIVITY_WORKERS, as_lists=False):
+    """
+    Barrido de sensibilidad con una sola descarga.
+
+    Args:
+        tickers: lista de tickers.
+        periods: periodos históricos (formato yfinance, p.ej. "1y".."10y").
+        risk_free_rates: tasas anuales; por defecto la actual ± 2 puntos.
+        return_models: subconjunto de RETURN_MODELS.
+        covariance: estimador de covarianza (por defecto COVARIANCE_ESTIMATOR).
+        frontier_points: puntos de la frontera por cada punto de la grilla.
+        max_workers: procesos para repartir los periodos (1 = en el proceso actual).
+        as_lists: devolver listas (JSON) en vez de arrays numpy.
+
+    Returns:
+        dict con los ejes (tickers, periods, return_models, risk_free_rates),
+        weights (P x M x R x activos), sharpe, expected_return, volatility
+        (P x M x R), frontier_volatilities, frontier_returns (P x M x R x
+        puntos), observations (días por periodo), errors (por periodo),
+        risk_free_rate y risk_free_rate_source. Los puntos que fallan son NaN.
+    """
+    validate_tickers(tickers)
+    periods = list(periods)
+    return_models = list(return_models)
+    validate_sweep(periods, risk_free_rates, return_models)
+    covariance = covariance or DEFAULT_COVARIANCE
+    if covariance not in ESTIMATORS:
+        raise ValueError(f"Estimador de covarianza no soportado: {covariance}")
+
+    # Una sola descarga: el periodo que empieza antes
+    longest = min(periods, key=period_start)
+    with metrics.span("fetch"):
+        inputs = fetch_batch_inputs([tickers], period=longest)
+    panel = inputs["prices"].reindex(columns=tickers)
+    market_prices = inputs["market_prices"][0]
+    if isinstance(market_prices, Exception):
+        if "capm" in return_models:
+            raise market_prices
+        market_prices = None
+
+    if risk_free_rates is None:
+        rates = np.maximum(inputs["risk_free_rate"] + DEFAULT_RATE_OFFSETS, 0.0)
+        rates = np.unique(np.round(rates, 6))
+    else:
+        rates = np.sort(np.asarray(risk_free_rates, dtype=float))
+
+    shape = (len(periods), len(return_models), rates.size)
+    result = {
+        "tickers": list(tickers),
+        "periods": periods,
+        "return_models": return_models,
+        "risk_free_rates": rates,
+        "axes": ["period", "return_model", "risk_free_rate", "asset"],
+        "weights": np.full(shape + (len(tickers),), np.nan),
+        "sharpe": np.full(shape, np.nan),
+        "expected_return": np.full(shape, np.nan),
+        "volatility": np.full(shape, np.nan),
+        "frontier_volatilities": np.full(shape + (frontier_points,), np.nan),
+        "frontier_returns": np.full(shape + (frontier_points,), np.nan),
+        "observations": {},
+        "errors": {},
+        "risk_free_rate": inputs["risk_free_rate"],
+        "risk_free_rate_source": inputs["risk_free_rate_source"],
+    }
+
+    tasks = {}
+    last_date = panel.index[-1]
+    for i, period in enumerate(periods):
+        start = period_start(period, today=last_date)
+        try:
+            prices = clean_price_panel(panel.loc[start:], tickers)
+        except ValueError as exc:
+            result["errors"][period] = str(exc)
+            continue
+        if list(prices.columns) != list(tickers):
+            result["errors"][period] = "Faltan precios de algún ticker en este periodo."
+            continue
+        market = market_prices.loc[start:] if market_prices is not None else None
+        tasks[i] = (prices, market, rates, return_models, covariance, frontier_points)
+
+    with metrics.span("sensitivity"):
+        for i, outcome in _run_tasks(tasks, max_workers):
+            if isinstance(outcome, Exception):
+                result["errors"][periods[i]] = str(outcome) or type(outcome).__name__
+                continue
+            for key in ("weights", "sharpe", "expected_return", "volatility",
+                        "frontier_volatilities", "frontier_returns"):
+                result[key][i] = outcome[key]
+            result["observations"][periods[i]] = outcome["observations"]
+
+    if as_lists:
+        return _to_lists(result)
+    return result
+
+
+def sweep_period(prices, market_prices, rates, return_models, covariance="sample",
+                 frontier_points=SENSITIVITY_FRONTIER_POINTS):
+    """
+    Grilla de un periodo: un MarketModel y unas betas para todos los puntos;
+    para cada modelo de retornos las tasas se recorren en orden con arranque
+    en caliente. Devuelve arrays (M x R [x activos | x puntos]).
+    """
+    model = MarketModel.from_prices(prices, covariance=covariance, market_prices=market_prices)
+    shape = (len(return_models), len(rates))
+    out = {
+        "weights": np.full(shape + (model.n_assets,), np.nan),
+        "sharpe": np.full(shape, np.nan),
+        "expected_return": np.full(shape, np.nan),
+        "volatility": np.full(shape, np.nan),
+        "frontier_volatilities": np.full(shape + (frontier_points,), np.nan),
+        "frontier_returns": np.full(shape + (frontier_points,), np.nan),
+        "observations": int(model.returns.shape[0]),
+    }
+
+    if "capm" in return_models:
+        betas = calculate_betas(prices, market_prices, model=model)
+        market_return = float(market_prices.pct_change().dropna().mean() * TRADING_DAYS_PER_YEAR)
+
+    cov = model.cov_operator
+    for m, return_model in enumerate(return_models):
+        previous = None
+        frontier = None
+        for r, rate in enumerate(rates):
+            if return_model == "capm":
+                mean = model.expected_returns(calculate_capm_returns(betas, rate, market_return))
+            else:
+                mean = model.annual_mean_returns
+            try:
+                weights = optimize_slsqp(mean, cov, rate, "max_sharpe", x0=previous)
+            except ValueError as exc:
+                print(f"Warning: sensibilidad sin solución para rf={rate:.4f} ({return_model}): {exc}")
+                continue
+            previous = weights
+
+            ret = float(weights @ mean)
+            vol = float(np.sqrt(max(weights @ (cov @ weights), 0.0)))
+            out["weights"][m, r] = weights
+            out["expected_return"][m, r] = ret
+            out["volatility"][m, r] = vol
+            out["sharpe"][m, r] = (ret - rate) / vol if vol else np.nan
+
+            # Con medias históricas la frontera no depende de la tasa
+            if frontier is None or return_model == "capm":
+                frontier = compute_efficient_frontier(model=model, n_points=frontier_points,
+                                                      expected_returns_annual=mean)
+            points = len(frontier["frontier_volatilities"])
+            out["frontier_volatilities"][m, r, :points] = frontier["frontier_volatilities"]
+            out["frontier_returns"][m, r, :points] = frontier["frontier_returns"]
+    return out
+
+
+def _run_tasks(tasks, max_workers):
+    """Ejecuta sweep_period por periodo; entrega (índice, resultado o excepción)."""
+    if max_workers <= 1 or len(tasks) <= 1:
+        for i, args in tasks.items():
+            yield i, _safe_sweep(args)
+        return
+    pool = _get_pool(max_workers)
+    try:
+        futures = {i: pool.submit(_safe_sweep, args) for i, args in tasks.items()}
+        for i, future in futures.items():
+            yield i, future.result()
+    except BrokenProcessPool:
+        # Un worker murió (p.ej. sin memoria): el próximo barrido crea otro pool
+        _discard_pool(max_workers, pool)
+        raise
+
+
+_pools = {}   # max_workers -> ProcessPoolExecutor
+_pools_lock = threading.Lock()
+
+
+def _get_pool(max_workers):
+    """Pool de procesos compartido por tamaño; se crea la primera vez que se usa."""
+    with _pools_lock:
+        pool = _pools.get(max_workers)
+        if pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+            _pools[max_workers] = pool
+        return pool
+
+
+def _discard_pool(max_workers, pool):
+    with _pools_lock:
+        if _pools.get(max_workers) is pool:
+            del _pools[max_workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _safe_sweep(args):
+    # Cualquier falla de un periodo (p.ej. LinAlgError con una covarianza
+    # singular) queda en errors sin perder los periodos que sí terminaron
+    try:
+        return sweep_period(*args)
+    except Exception as exc:  # noqa: BLE001
+        return exc
+
+
+def _to_lists(result):
+    converted = {}
+    for key, value in result.items():
+        if isinstance(value, np.ndarray):
+            value = np.where(np.isnan(value), None, value.astype(object)).tolist()
+        converted[key] = value
+    return converted
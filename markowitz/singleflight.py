@@ -0,0 +1,128 @@
+"""
+Coalescencia de llamadas idénticas en vuelo (single-flight).
+
+Cuando varios hilos piden lo mismo a la vez (la misma canasta al abrir el
+mercado), solo el primero ejecuta la función; los demás esperan y reciben
+su resultado, o la misma excepción. Nada queda guardado después: una
+llamada posterior a que termine la primera vuelve a ejecutar (el cacheo de
+resultados vive en otras capas).
+
+Las llamadas que se sumaron a otra se cuentan en
+markowitz_coalesced_calls_total{operation=...} (ver /metrics).
+"""
+import functools
+import inspect
+import threading
+
+from markowitz import metrics
+
+COALESCED_METRIC = "markowitz_coalesced_calls_total"
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Grupo de llamadas deduplicadas por clave.
+
+    Args:
+        name: nombre de la operación (etiqueta de la métrica).
+        share: función aplicada al resultado antes de entregarlo a cada
+               llamada que esperó (p.ej. una copia si quien lo recibe puede
+               modificarlo); también se aplica al de quien ejecutó. Por
+               defecto todos reciben el mismo objeto.
+    """
+
+    def __init__(self, name, share=None):
+        self.name = name
+        self.share = share
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """Ejecuta fn(*args, **kwargs), o espera a la llamada en vuelo con la misma clave."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            metrics.increment(COALESCED_METRIC, operation=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return self.share(call.result) if self.share else call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        # Con share, también quien ejecutó recibe su copia: el original queda
+        # intacto para los que esperan aunque el primero modifique la suya
+        return self.share(call.result) if self.share else call.result
+
+    def stats(self):
+        """Llamadas ejecutadas, coalescidas y en vuelo."""
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+def coalesced(name, key=None, share=None):
+    """
+    Decorador: las llamadas concurrentes con los mismos argumentos se
+    resuelven con una sola ejecución.
+
+    key: función con la misma firma que la decorada que devuelve la clave;
+         por defecto todos los argumentos (con sus valores por defecto y
+         listas convertidas a tuplas).
+    share: ver SingleFlight.
+
+    La función decorada expone el grupo en `.singleflight`.
+    """
+    def decorator(fn):
+        group = SingleFlight(name, share=share)
+        signature = inspect.signature(fn)
+
+        def default_key(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return tuple((param, _freeze(value)) for param, value in bound.arguments.items())
+
+        make_key = key or default_key
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return group.do(make_key(*args, **kwargs), fn, *args, **kwargs)
+
+        wrapper.singleflight = group
+        return wrapper
+    return decorator
+
+
+def _freeze(value):
+    """Versión hashable de listas, tuplas, conjuntos y dicts."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
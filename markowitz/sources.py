@@ -0,0 +1,286 @@
+"""
+Fuentes de precios.
+
+Toda descarga (precios de la canasta, índice de mercado y ^TNX para la tasa
+libre de riesgo) pasa por la fuente activa, get_source():
+
+- YahooSource: yfinance (por defecto).
+- ReplaySource: reproduce paneles grabados en CSV o Parquet, sin red y con
+  latencia artificial opcional. Sirve para pruebas de carga y benchmarks.
+- RecordingSource: envuelve otra fuente y graba cada respuesta en el
+  directorio para reproducirla después con ReplaySource.
+
+Se elige con PRICE_SOURCE=yahoo|replay|record, el directorio de paneles con
+PRICE_SOURCE_DIR, la latencia (segundos por llamada) con PRICE_SOURCE_LATENCY
+y el formato en que se graba con PRICE_SOURCE_FORMAT=csv|parquet.
+
+Un panel es un archivo por campo e intervalo (p.ej. adj_close_1d.csv) con
+una fila por fecha y una columna por ticker.
+"""
+import os
+import threading
+import time
+
+import pandas as pd
+import yfinance as yf
+
+from markowitz.store import atomic_write, period_start
+
+FORMATS = ("parquet", "csv")
+
+
+class PriceSource:
+    """
+    Interfaz de una fuente de precios.
+
+    history(tickers, field, interval, period=... | start=...) devuelve un
+    DataFrame con una columna por ticker que llegó (las que no existen se
+    omiten, como hace Yahoo) y un DatetimeIndex de fechas.
+    field es "Adj Close" o "Close"; si no hay "Adj Close" se usa "Close".
+    """
+
+    name = "base"
+
+    def history(self, tickers, field="Adj Close", interval="1d", period=None, start=None):
+        raise NotImplementedError
+
+    def reference_date(self):
+        """
+        Fecha desde la que se cuentan los periodos ("1y", "5d"...): None
+        para hoy. El almacén de precios recorta sus ventanas desde esta
+        misma fecha, para coincidir con lo que entrega la fuente.
+        """
+        return None
+
+
+class YahooSource(PriceSource):
+    """Descarga con yf.download."""
+
+    name = "yahoo"
+
+    def history(self, tickers, field="Adj Close", interval="1d", period=None, start=None):
+        kwargs = {"start": start} if start is not None else {"period": period}
+        data = yf.download(
+            tickers=list(tickers),
+            interval=interval,
+            group_by="ticker",
+            auto_adjust=False,
+            progress=False,
+            **kwargs,
+        )
+        return extract_field(data, tickers, field)
+
+
+def extract_field(data, tickers, field="Adj Close"):
+    """
+    Extrae `field` del DataFrame que devuelve yf.download como un DataFrame
+    con una columna por ticker. Maneja columnas planas (un ticker) y
+    MultiIndex en cualquier orientación; sin "Adj Close" usa "Close".
+    """
+    candidates = [field] + (["Close"] if field == "Adj Close" else [])
+
+    # yfinance devuelve MultiIndex cuando hay múltiples tickers
+    if isinstance(data.columns, pd.MultiIndex):
+        for name in candidates:
+            if name in data.columns.get_level_values(0):
+                data = data[name]
+                break
+            if name in data.columns.get_level_values(1):
+                data = data.xs(name, level=1, axis=1)
+                break
+        else:
+            raise ValueError(f"No se encontró '{field}' en MultiIndex. Niveles: {data.columns.levels}")
+        if isinstance(data, pd.Series):
+            data = data.to_frame(tickers[0])
+    else:
+        name = next((name for name in candidates if name in data.columns), None)
+        if name is None:
+            raise ValueError(f"No se encontró '{field}'. Columnas disponibles: {data.columns.tolist()}")
+        data = data[[name]].rename(columns={name: tickers[0]})
+
+    if name != field:
+        print(f"Warning: Yahoo no entregó '{field}' para {', '.join(tickers)}; se usa '{name}'")
+    return data
+
+
+class ReplaySource(PriceSource):
+    """
+    Reproduce paneles grabados en `directory`.
+
+    Los periodos ("1y", "5d"...) se cuentan desde la última fecha del panel
+    (reference_date), no desde hoy, para que una grabación vieja siga
+    sirviendo las mismas ventanas; el almacén de precios recorta desde esa
+    misma fecha.
+
+    Args:
+        directory: carpeta con los paneles.
+        latency: segundos de espera artificial por llamada.
+    """
+
+    name = "replay"
+
+    def __init__(self, directory, latency=0.0):
+        self.directory = directory
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._panels = {}   # ruta -> (mtime_ns, DataFrame)
+
+    def history(self, tickers, field="Adj Close", interval="1d", period=None, start=None):
+        if self.latency:
+            time.sleep(self.latency)
+        panel = self.panel(field, interval)
+        if field == "Adj Close" and panel.empty:
+            panel = self.panel("Close", interval)
+        columns = [ticker for ticker in tickers if ticker in panel.columns]
+        data = panel.loc[:, columns]
+        if data.empty:
+            return data
+        if start is not None:
+            data = data.loc[data.index >= pd.Timestamp(start)]
+        else:
+            first = period_start(period, today=data.index[-1])
+            if first is not None:
+                data = data.loc[data.index >= first]
+        return data.dropna(how="all")
+
+    def reference_date(self):
+        """Última fecha grabada de los precios diarios (None si no hay grabación)."""
+        panel = self.panel("Adj Close", "1d")
+        if panel.empty:
+            panel = self.panel("Close", "1d")
+        return None if panel.empty else panel.index[-1]
+
+    def panel(self, field="Adj Close", interval="1d"):
+        """Panel completo grabado para `field` e `interval` (vacío si no hay)."""
+        path = _find_panel(self.directory, field, interval)
+        if path is None:
+            return pd.DataFrame()
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._panels.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        panel = read_panel(path)
+        with self._lock:
+            self._panels[path] = (mtime, panel)
+        return panel
+
+
+class RecordingSource(PriceSource):
+    """
+    Pasa cada llamada a `source` y agrega la respuesta al panel de
+    `directory`, de modo que ReplaySource pueda reproducirla. Las fechas que
+    ya estaban grabadas se reemplazan por las nuevas.
+
+    Args:
+        source: fuente real (por defecto YahooSource).
+        directory: carpeta de los paneles.
+        fmt: "csv" o "parquet" (este último requiere pyarrow).
+    """
+
+    name = "record"
+
+    def __init__(self, directory, source=None, fmt="csv"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato de panel no soportado: {fmt}")
+        self.directory = directory
+        self.source = source or YahooSource()
+        self.fmt = fmt
+        self._lock = threading.Lock()
+
+    def reference_date(self):
+        return self.source.reference_date()
+
+    def history(self, tickers, field="Adj Close", interval="1d", period=None, start=None):
+        data = self.source.history(tickers, field=field, interval=interval, period=period, start=start)
+        if not data.empty:
+            self.record(data, field, interval)
+        return data
+
+    def record(self, data, field="Adj Close", interval="1d"):
+        """Agrega `data` (una columna por ticker) al panel de `field` e `interval`."""
+        if isinstance(data.index, pd.DatetimeIndex) and data.index.tz is not None:
+            data = data.copy()
+            data.index = data.index.tz_localize(None)
+        with self._lock:
+            path = _find_panel(self.directory, field, interval)
+            panel = read_panel(path) if path is not None else pd.DataFrame()
+            panel = data.combine_first(panel).sort_index()
+            os.makedirs(self.directory, exist_ok=True)
+            target = os.path.join(self.directory, f"{_slug(field)}_{interval}.{self.fmt}")
+            write_panel(panel, target)
+            if path is not None and path != target:
+                os.remove(path)
+
+
+def read_panel(path):
+    """Panel guardado en CSV o Parquet (índice de fechas, una columna por ticker)."""
+    if path.endswith(".parquet"):
+        panel = pd.read_parquet(path)
+    else:
+        panel = pd.read_csv(path, index_col=0, parse_dates=True)
+    panel.index = pd.DatetimeIndex(panel.index)
+    return panel.astype(float)
+
+
+def write_panel(panel, path):
+    """Escribe el panel de forma atómica (ver store.atomic_write), en Parquet o CSV según la extensión."""
+    if path.endswith(".parquet"):
+        atomic_write(path, panel.to_parquet)
+    else:
+        atomic_write(path, lambda fh: panel.to_csv(fh, encoding="utf-8"))
+
+
+def _slug(field):
+    return field.lower().replace(" ", "_")
+
+
+def _find_panel(directory, field, interval):
+    for fmt in FORMATS:
+        path = os.path.join(directory, f"{_slug(field)}_{interval}.{fmt}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+_override = None
+_sources = {}
+_sources_lock = threading.Lock()
+
+
+def set_source(source):
+    """
+    Fija la fuente activa (None vuelve a la configurada por entorno).
+    Devuelve la anterior para poder restaurarla.
+    """
+    global _override
+    previous, _override = _override, source
+    return previous
+
+
+def get_source():
+    """
+    Fuente activa: la fijada con set_source o la que indican PRICE_SOURCE,
+    PRICE_SOURCE_DIR, PRICE_SOURCE_LATENCY y PRICE_SOURCE_FORMAT (una
+    instancia por configuración, para conservar los paneles ya leídos).
+    """
+    if _override is not None:
+        return _override
+    kind = os.getenv("PRICE_SOURCE", "yahoo")
+    directory = os.getenv("PRICE_SOURCE_DIR", "price_replays")
+    latency = float(os.getenv("PRICE_SOURCE_LATENCY", "0"))
+    fmt = os.getenv("PRICE_SOURCE_FORMAT", "csv")
+    config = (kind, directory, latency, fmt)
+    with _sources_lock:
+        source = _sources.get(config)
+        if source is None:
+            if kind == "yahoo":
+                source = YahooSource()
+            elif kind == "replay":
+                source = ReplaySource(directory, latency=latency)
+            elif kind == "record":
+                source = RecordingSource(directory, fmt=fmt)
+            else:
+                raise ValueError(f"PRICE_SOURCE no soportado: {kind}")
+            _sources[config] = source
+    return source
@@ -0,0 +1,458 @@
+"""
+Almacén local de precios en disco, columnar por ticker y por campo.
+
+Estructura en disco:
+    <root>/<ticker>/dates.npy     fechas como int64 (ns desde epoch)
+    <root>/<ticker>/<campo>.npy   valores float64 alineados con dates.npy
+    <root>/<ticker>/meta.json     cobertura y momento de la última descarga
+
+Cada archivo se escribe en un temporal y se publica con os.replace, de modo
+que varios procesos pueden leer mientras otro actualiza.
+
+SharedPriceStore (PRICE_STORE_BACKEND=shared) guarda lo mismo en un solo
+archivo mapeado en memoria que comparten todos los workers; ver su docstring.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock, solo se usa PriceStore
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_FIELD = "adj_close"
+
+# Una descarga más reciente que esto se considera al día y no se refresca
+DEFAULT_MAX_AGE = timedelta(hours=6)
+
+# Retornos simples entre cotizaciones consecutivas, que SharedPriceStore
+# guarda junto a los precios
+RETURNS_FIELD = "returns"
+
+# Calendario de SharedPriceStore: una fila por día hábil (lunes a viernes)
+# desde 1970-01-01, para que una serie bursátil sea un tramo contiguo
+SHARED_EPOCH = np.datetime64("1970-01-01", "D")
+SHARED_ROWS = 100 * 262
+
+# Versión del formato en disco; va en los nombres de archivo, así que un
+# almacén de otra versión en el mismo directorio se ignora
+SHARED_FORMAT = 2
+
+# Segundos antes de reutilizar la columna que dejó una serie reescrita
+# (los lectores que leyeron el índice anterior terminan mucho antes)
+SHARED_REUSE_AFTER = 300
+
+_PERIOD_OFFSETS = {
+    "d": lambda n: pd.DateOffset(days=n),
+    "wk": lambda n: pd.DateOffset(weeks=n),
+    "mo": lambda n: pd.DateOffset(months=n),
+    "y": lambda n: pd.DateOffset(years=n),
+}
+
+
+def period_start(period, today=None):
+    """
+    Fecha de inicio equivalente a un `period` de yfinance ("1y", "6mo", "max"...).
+    Devuelve None para "max" (todo el histórico disponible).
+    """
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=today.year, month=1, day=1)
+    for suffix in sorted(_PERIOD_OFFSETS, key=len, reverse=True):
+        if period.endswith(suffix):
+            number = period[: -len(suffix)]
+            if number.isdigit():
+                return today - _PERIOD_OFFSETS[suffix](int(number))
+    raise ValueError(f"Periodo no soportado: {period}")
+
+
+class PriceStore:
+    """
+    Almacén persistente de series diarias de precios.
+
+    Solo guarda lo que ya se descargó: la lógica de qué pedir a Yahoo vive en
+    `markowitz.data`, que usa `needs_backfill` y `is_fresh` para decidir
+    entre servir desde disco, pedir solo los días faltantes o descargar todo.
+    """
+
+    def __init__(self, root, max_age=DEFAULT_MAX_AGE):
+        self.root = root
+        self.max_age = max_age
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.root, quote(ticker, safe=""))
+
+    def load(self, ticker, field=DEFAULT_FIELD):
+        """Serie guardada para `ticker` o None si no existe."""
+        ticker_dir = self._ticker_dir(ticker)
+        try:
+            dates = np.load(os.path.join(ticker_dir, "dates.npy"))
+            values = np.load(os.path.join(ticker_dir, f"{field}.npy"))
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        if len(dates) != len(values):
+            return None
+        return pd.Series(values, index=pd.DatetimeIndex(dates.astype("datetime64[ns]")), name=ticker)
+
+    def load_returns(self, ticker):
+        """Retornos simples entre cotizaciones guardadas consecutivas (NaN el primer día), o None."""
+        prices = self.load(ticker)
+        return None if prices is None else prices.pct_change(fill_method=None)
+
+    def meta(self, ticker):
+        """Metadatos de cobertura del ticker ({} si no hay)."""
+        try:
+            with open(os.path.join(self._ticker_dir(ticker), "meta.json"), encoding="utf-8") as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError, OSError):
+            return {}
+
+    def save(self, ticker, series, covered_from=None, field=DEFAULT_FIELD):
+        """
+        Reemplaza la serie guardada de `ticker`.
+        covered_from: inicio del periodo pedido al descargar (None = "max").
+        """
+        series = series.dropna().sort_index()
+        series = series[~series.index.duplicated(keep="last")]
+        index = pd.DatetimeIndex(series.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+
+        ticker_dir = self._ticker_dir(ticker)
+        os.makedirs(ticker_dir, exist_ok=True)
+        dates = index.values.astype("datetime64[ns]").astype(np.int64)
+        atomic_write(os.path.join(ticker_dir, "dates.npy"), lambda fh: np.save(fh, dates))
+        atomic_write(os.path.join(ticker_dir, f"{field}.npy"), lambda fh: np.save(fh, series.to_numpy(dtype=np.float64)))
+
+        meta = {
+            "covered_from": None if covered_from is None else pd.Timestamp(covered_from).isoformat(),
+            "fetched_at": datetime.now().isoformat(),
+            "rows": int(len(series)),
+        }
+        atomic_write(os.path.join(ticker_dir, "meta.json"), json.dumps(meta).encode("utf-8"))
+
+    def needs_backfill(self, ticker, start):
+        """True si lo guardado no cubre el inicio del periodo pedido."""
+        meta = self.meta(ticker)
+        if "covered_from" not in meta:
+            return True
+        covered_from = meta["covered_from"]
+        if covered_from is None:
+            return False
+        if start is None:
+            return True
+        return pd.Timestamp(covered_from) > pd.Timestamp(start)
+
+    def is_fresh(self, ticker, now=None):
+        """True si la última descarga es más reciente que max_age."""
+        fetched_at = self.meta(ticker).get("fetched_at")
+        if not fetched_at:
+            return False
+        now = now or datetime.now()
+        return now - datetime.fromisoformat(fetched_at) < self.max_age
+
+
+
+def merge_series(stored, fresh):
+    """
+    Une la serie guardada con días nuevos descargados.
+
+    Los precios ajustados de Yahoo se reescalan hacia atrás cuando hay
+    dividendos o splits. Si el día de solape difiere, se aplica el mismo
+    factor al histórico guardado para que la serie siga siendo consistente.
+    """
+    stored = stored.dropna()
+    fresh = fresh.dropna()
+    if fresh.empty:
+        return stored
+    overlap = stored.index.intersection(fresh.index)
+    if len(overlap):
+        last = overlap[-1]
+        old_value = float(stored.loc[last])
+        if old_value:
+            factor = float(fresh.loc[last]) / old_value
+            if not np.isclose(factor, 1.0, rtol=1e-9, atol=0.0):
+                stored = stored * factor
+    merged = pd.concat([stored[~stored.index.isin(fresh.index)], fresh]).sort_index()
+    merged.name = stored.name
+    return merged
+
+
+class SharedPriceStore(PriceStore):
+    """
+    PriceStore compartido entre procesos a través de archivos mapeados en memoria.
+
+    Estructura en disco (v = SHARED_FORMAT):
+        <root>/<campo>.v2.f8  float64, una columna contigua de SHARED_ROWS
+                              días hábiles (desde 1970-01-01) por ticker,
+                              con NaN donde no hay cotización (feriados)
+        <root>/index.v2.json  ticker -> columna, primer y último día con
+                              dato por campo, más la metadata de cobertura
+        <root>/.lock          lock de escritura (fcntl.flock)
+
+    Al guardar precios (DEFAULT_FIELD) se guardan también sus retornos
+    simples entre cotizaciones consecutivas (RETURNS_FIELD, ver
+    load_returns), para no recalcularlos en cada lectura.
+
+    Cada proceso mapea los archivos una vez (np.memmap de solo lectura) y
+    load devuelve Series sobre la columna mapeada, sin copiarla: las páginas
+    viven en el page cache del sistema y las comparten todos los workers, de
+    modo que la memoria no crece con la cantidad de procesos y un worker
+    nuevo arranca con todo lo ya descargado. Por eso la serie trae NaN en
+    los feriados, como una columna de get_price_panel. Las fechas de una
+    columna salen de su posición, así que todos los tickers quedan
+    alineados al mismo calendario. Las cotizaciones en fin de semana no
+    tienen fila y se descartan con un aviso.
+
+    Un solo proceso escribe a la vez (lock de archivo). Agregar días nuevos
+    a una serie escribe después de su último día publicado, que los lectores
+    todavía no miran; si cambian datos ya publicados (reajuste por
+    dividendos, backfill) la serie va a otra columna y el índice se publica
+    al final, así que nunca se lee una columna a medio reescribir. Las
+    columnas liberadas se reutilizan pasados SHARED_REUSE_AFTER segundos.
+    """
+
+    def __init__(self, root, max_age=DEFAULT_MAX_AGE):
+        super().__init__(root, max_age=max_age)
+        self._lock = threading.Lock()
+        self._index = None
+        self._index_stamp = None
+        self._maps = {}   # campo -> np.memmap de solo lectura
+
+    def load(self, ticker, field=DEFAULT_FIELD):
+        """
+        Serie guardada para `ticker` o None si no existe: una vista de solo
+        lectura del archivo mapeado, con NaN en los días hábiles sin dato.
+        """
+        with self._lock:
+            entry = self._read_index()["tickers"].get(ticker, {}).get(field)
+            if entry is None:
+                return None
+            column = self._column_view(field, entry["column"])
+        if column is None:
+            return None
+        first, last = entry["first"], entry["last"]
+        days = np.busday_offset(SHARED_EPOCH, np.arange(first, last + 1), roll="forward")
+        return pd.Series(column[first:last + 1], index=pd.DatetimeIndex(days.astype("datetime64[ns]")),
+                         name=ticker, copy=False)
+
+    def load_returns(self, ticker):
+        """Retornos guardados junto a los precios (vista del archivo mapeado, NaN sin dato)."""
+        return self.load(ticker, RETURNS_FIELD)
+
+    def meta(self, ticker):
+        """Metadatos de cobertura del ticker ({} si no hay)."""
+        with self._lock:
+            entry = self._read_index()["tickers"].get(ticker)
+        if entry is None:
+            return {}
+        return {key: entry[key] for key in ("covered_from", "fetched_at", "rows") if key in entry}
+
+    def save(self, ticker, series, covered_from=None, field=DEFAULT_FIELD):
+        """
+        Reemplaza la serie guardada de `ticker`.
+        covered_from: inicio del periodo pedido al descargar (None = "max").
+        """
+        series = series.dropna().sort_index()
+        series = series[~series.index.duplicated(keep="last")]
+        index = pd.DatetimeIndex(series.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        dates = index.values.astype("datetime64[D]")
+        weekdays = np.is_busday(dates)
+        if not weekdays.all():
+            print(f"Warning: {ticker} tiene {int((~weekdays).sum())} cotizaciones en fin de semana; "
+                  "el almacén compartido las descarta")
+            series, dates = series[weekdays], dates[weekdays]
+        days = np.busday_count(SHARED_EPOCH, dates)
+        if len(days) and (dates[0] < SHARED_EPOCH or days[-1] >= SHARED_ROWS):
+            raise ValueError(f"Fechas de {ticker} fuera del calendario del almacén compartido.")
+        values = series.to_numpy(dtype=np.float64)
+        columns = {field: values}
+        if field == DEFAULT_FIELD:
+            returns = np.full(len(values), np.nan)
+            returns[1:] = values[1:] / values[:-1] - 1.0
+            columns[RETURNS_FIELD] = returns
+
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, self._write_lock():
+            state = self._read_index(force=True)
+            entry = state["tickers"].setdefault(ticker, {})
+            for name, column_values in columns.items():
+                self._write_column(state, entry, name, days, column_values)
+
+            entry.update(
+                covered_from=None if covered_from is None else pd.Timestamp(covered_from).isoformat(),
+                fetched_at=datetime.now().isoformat(),
+                rows=int(len(series)),
+            )
+            atomic_write(self._index_path(), json.dumps(state).encode("utf-8"))
+            self._index_stamp = None
+
+    def _write_column(self, state, entry, field, days, values):
+        """Escribe `values` (en los días hábiles `days`) en la columna de `field` (con los locks tomados)."""
+        previous = entry.get(field)
+        if len(days) == 0:
+            if previous is not None:
+                self._release(state, field, previous)
+                del entry[field]
+            return
+        first, last = int(days[0]), int(days[-1])
+        dense = np.full(last - first + 1, np.nan)
+        dense[days - first] = values
+        path = self._data_path(field)
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as fh:
+            if previous is not None and self._extends(field, previous, first, dense):
+                # Solo días nuevos, después de lo que ya leen los demás
+                column = previous["column"]
+                start = previous["last"] + 1
+                fh.seek((column * SHARED_ROWS + start) * 8)
+                fh.write(dense[start - first:].tobytes())
+            else:
+                column = self._allocate(state, field, fh)
+                fh.seek((column * SHARED_ROWS + first) * 8)
+                fh.write(dense.tobytes())
+                if previous is not None:
+                    self._release(state, field, previous)
+        entry[field] = {"column": column, "first": first, "last": last}
+
+    def _extends(self, field, previous, first, dense):
+        """True si la serie nueva solo agrega días al final de la guardada."""
+        if first != previous["first"] or first + len(dense) - 1 < previous["last"]:
+            return False
+        column = self._column_view(field, previous["column"])
+        if column is None:
+            return False
+        stored = column[previous["first"]:previous["last"] + 1]
+        return np.array_equal(stored, dense[:len(stored)], equal_nan=True)
+
+    def _allocate(self, state, field, fh):
+        """Columna libre (reutilizada si ya pasó el plazo) o una nueva al final del archivo."""
+        free = state["free"].setdefault(field, [])
+        cutoff = time.time() - SHARED_REUSE_AFTER
+        for i, slot in enumerate(free):
+            if slot["released_at"] <= cutoff:
+                # Lo que dejó la serie anterior queda fuera de [first, last]
+                # de la nueva, que se escribe completa: no hace falta borrarlo
+                del free[i]
+                return slot["column"]
+        column = state["columns"].get(field, 0)
+        state["columns"][field] = column + 1
+        fh.truncate((column + 1) * SHARED_ROWS * 8)  # disperso: solo ocupa lo escrito
+        return column
+
+    @staticmethod
+    def _release(state, field, previous):
+        state["free"].setdefault(field, []).append(dict(previous, released_at=time.time()))
+
+    def _data_path(self, field):
+        return os.path.join(self.root, f"{field}.v{SHARED_FORMAT}.f8")
+
+    def _index_path(self):
+        return os.path.join(self.root, f"index.v{SHARED_FORMAT}.json")
+
+    def _read_index(self, force=False):
+        """Índice actual; se relee solo si el archivo cambió (con self._lock tomado)."""
+        path = self._index_path()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._index, self._index_stamp = {"tickers": {}, "columns": {}, "free": {}}, None
+            return self._index
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if force or stamp != self._index_stamp:
+            with open(path, encoding="utf-8") as fh:
+                self._index = json.load(fh)
+            self._index_stamp = stamp
+        return self._index
+
+    def _column_view(self, field, column):
+        """Vista (sin copia) de una columna; remapea si el archivo creció (con self._lock tomado)."""
+        mapped = self._maps.get(field)
+        end = (column + 1) * SHARED_ROWS
+        if mapped is None or mapped.size < end:
+            try:
+                size = os.path.getsize(self._data_path(field)) // 8
+            except OSError:
+                return None
+            if size < end:
+                return None
+            mapped = self._maps[field] = np.memmap(self._data_path(field), dtype="<f8", mode="r", shape=(size,))
+        return mapped[column * SHARED_ROWS:end]
+
+    @contextmanager
+    def _write_lock(self):
+        with open(os.path.join(self.root, ".lock"), "a+b") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+_shared_stores = {}
+
+
+def get_default_store():
+    """
+    Almacén configurado por la variable de entorno PRICE_STORE_DIR.
+    Por defecto usa el directorio temporal del sistema (escribible también en
+    despliegues serverless). PRICE_STORE_DIR vacío desactiva el almacén.
+
+    Con PRICE_STORE_BACKEND=shared se usa SharedPriceStore (uno por
+    directorio y proceso, para mantener el mapeo entre solicitudes).
+    """
+    root = os.getenv("PRICE_STORE_DIR")
+    if root is None:
+        root = os.path.join(tempfile.gettempdir(), "markowitz_prices")
+    if not root:
+        return None
+    if os.getenv("PRICE_STORE_BACKEND", "files") == "shared":
+        if fcntl is None:
+            print("Warning: PRICE_STORE_BACKEND=shared requiere fcntl; se usa el almacén por archivos.")
+            return PriceStore(root)
+        store = _shared_stores.get(root)
+        if store is None:
+            store = _shared_stores.setdefault(root, SharedPriceStore(root))
+        return store
+    return PriceStore(root)
+
+
+def atomic_write(path, payload):
+    """
+    Escribe `path` en un temporal del mismo directorio y lo publica con
+    os.replace: quien lee ve el archivo anterior o el nuevo, nunca uno a
+    medias (también entre procesos).
+
+    payload: bytes, o una función que recibe el archivo binario abierto y lo
+    escribe (p.ej. ``lambda fh: np.save(fh, array)``).
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            if callable(payload):
+                payload(fh)
+            else:
+                fh.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _silent_remove(tmp_path)
+        raise
+
+
+def _silent_remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,33 @@
+"""
+Límites de tamaño de la canasta.
+
+No importa el stack numérico: app.py los usa para validar y para mostrarlos
+en la página inicial sin cargar numpy/pandas (ver markowitz.warmup).
+"""
+import os
+
+MIN_TICKERS = 5
+# Tope configurable; desde optimizer.QP_MIN_ASSETS activos el optimizador usa
+# el solver QP para universos grandes. MAX_TICKERS_LIMIT es el techo que
+# cumplen las demás etapas (frontera, Monte Carlo, VaR) en pocos segundos;
+# un MAX_TICKERS mayor se recorta a ese valor.
+MAX_TICKERS_LIMIT = 500
+MAX_TICKERS = int(os.getenv("MAX_TICKERS", "30"))
+if MAX_TICKERS > MAX_TICKERS_LIMIT:
+    print(f"Warning: MAX_TICKERS={MAX_TICKERS} supera el máximo soportado; se usa {MAX_TICKERS_LIMIT}")
+    MAX_TICKERS = MAX_TICKERS_LIMIT
+
+
+class TickerCountError(ValueError):
+    """
+    Cantidad de tickers fuera de [MIN_TICKERS, MAX_TICKERS]. `code` identifica
+    el error sin depender del texto (la página lo traduce con sus límites).
+    """
+
+    code = "ticker_range"
+
+
+def validate_tickers(tickers):
+    """Lanza TickerCountError si la cantidad de tickers está fuera de rango."""
+    if not (MIN_TICKERS <= len(tickers) <= MAX_TICKERS):
+        raise TickerCountError(f"Debes ingresar entre {MIN_TICKERS} y {MAX_TICKERS} tickers.")
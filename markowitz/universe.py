@@ -0,0 +1,370 @@
+"""
+Índice precalculado de estadísticos para un universo completo de acciones.
+
+Un trabajo de precálculo (`precompute_universe`, o `python -m markowitz.universe`)
+descarga el universo (p.ej. todas las .SN, .MX o el S&P 500) y los proxies de
+mercado de MARKET_INDEX_BY_SUFFIX, y calcula en una sola pasada matricial:
+
+    - retorno medio anualizado y volatilidad anual de cada acción
+    - beta de cada acción contra cada proxy de mercado
+    - la matriz de correlación completa del universo
+
+El resultado se guarda en disco y `UniverseIndex` responde consultas
+("las N de menor beta en .SN", "las menos correlacionadas con X") sin
+descargar ni recalcular nada.
+
+Estructura en disco:
+    <root>/tickers.json         tickers del universo y proxies, en orden
+    <root>/stats.npz            retornos, volatilidades, betas, observaciones
+    <root>/correlation.npy      matriz N x N float32 (se abre con mmap)
+    <root>/meta.json            periodo y momento del cálculo (se escribe al final)
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from markowitz.capm import MARKET_INDEX_BY_SUFFIX, MIN_MARKET_ROWS, market_candidates
+from markowitz.data import download_adj_close, load_through_store
+from markowitz.model import TRADING_DAYS_PER_YEAR
+from markowitz.store import atomic_write, get_default_store
+
+# Observaciones comunes mínimas para informar una beta o una correlación
+MIN_OBSERVATIONS = MIN_MARKET_ROWS
+
+# Tickers por llamada a Yahoo durante el precálculo
+DOWNLOAD_CHUNK_SIZE = 200
+
+SCREEN_METRICS = ("beta", "annual_return", "volatility")
+
+
+def market_proxies():
+    """Todos los proxies de mercado conocidos (más ^GSPC), sin repetir."""
+    proxies = []
+    for candidates in MARKET_INDEX_BY_SUFFIX.values():
+        proxies.extend(candidates)
+    proxies.append("^GSPC")
+    return list(dict.fromkeys(proxies))
+
+
+def ticker_suffix(ticker):
+    """Sufijo de bolsa (".SN", ".MX"...) o "" para tickers de EE.UU."""
+    return "." + ticker.rsplit(".", 1)[1] if "." in ticker else ""
+
+
+def daily_returns(prices):
+    """
+    Retornos diarios de un panel con calendarios distintos (NaN donde un
+    ticker no cotizó). El retorno posterior a un feriado cubre todo el
+    intervalo en vez de perderse.
+    """
+    return prices.ffill().pct_change(fill_method=None).where(prices.notna()).iloc[1:]
+
+
+def pairwise_moments(x, y):
+    """
+    Covarianzas y varianzas con observaciones comunes por pares, en forma matricial.
+
+    x: (T, N) e y: (T, K) con NaN donde falta el dato. Devuelve (n, cov, var_x, var_y),
+    todos (N, K): cantidad de observaciones comunes, covarianza muestral y las
+    varianzas de cada serie restringidas a esas mismas fechas.
+    """
+    mask_x = ~np.isnan(x)
+    mask_y = ~np.isnan(y)
+    x0 = np.where(mask_x, x, 0.0)
+    y0 = np.where(mask_y, y, 0.0)
+    fx = mask_x.astype(float)
+    fy = mask_y.astype(float)
+
+    n = fx.T @ fy
+    sum_x = x0.T @ fy
+    sum_y = fx.T @ y0
+    sum_xy = x0.T @ y0
+    sum_xx = (x0 * x0).T @ fy
+    sum_yy = fx.T @ (y0 * y0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dof = np.where(n > 1, n - 1, np.nan)
+        cov = (sum_xy - sum_x * sum_y / n) / dof
+        var_x = (sum_xx - sum_x ** 2 / n) / dof
+        var_y = (sum_yy - sum_y ** 2 / n) / dof
+    return n, cov, var_x, var_y
+
+
+def compute_universe_stats(prices, market_prices, min_observations=MIN_OBSERVATIONS):
+    """
+    Estadísticos del universo en una pasada vectorizada.
+
+    Args:
+        prices: DataFrame de precios (columnas = tickers del universo, NaN permitido)
+        market_prices: DataFrame de precios de los proxies de mercado
+
+    Returns:
+        dict con tickers, proxies, annual_returns, volatilities, observations,
+        betas (N x K), market (índice del proxy propio de cada ticker, -1 si
+        ninguno tiene datos suficientes) y correlation (N x N).
+    """
+    index = prices.index.union(market_prices.index)
+    stock_returns = daily_returns(prices.reindex(index)).to_numpy(dtype=float)
+    market_returns = daily_returns(market_prices.reindex(index)).to_numpy(dtype=float)
+    tickers = list(prices.columns)
+    proxies = list(market_prices.columns)
+
+    observations = (~np.isnan(stock_returns)).sum(axis=0)
+    with np.errstate(invalid="ignore"):
+        annual_returns = np.nanmean(stock_returns, axis=0) * TRADING_DAYS_PER_YEAR
+        volatilities = np.nanstd(stock_returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    too_short = observations < min_observations
+    annual_returns[too_short] = np.nan
+    volatilities[too_short] = np.nan
+
+    n, cov, _, market_var = pairwise_moments(stock_returns, market_returns)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        betas = cov / market_var
+    betas[n < min_observations] = np.nan
+
+    n, cov, var_x, var_y = pairwise_moments(stock_returns, stock_returns)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = cov / np.sqrt(var_x * var_y)
+    correlation[n < min_observations] = np.nan
+    np.fill_diagonal(correlation, np.where(too_short, np.nan, 1.0))
+
+    # Proxy propio: el primer candidato del sufijo con beta disponible
+    proxy_position = {proxy: i for i, proxy in enumerate(proxies)}
+    market = np.full(len(tickers), -1, dtype=np.int64)
+    for i, ticker in enumerate(tickers):
+        for candidate in market_candidates([ticker]):
+            j = proxy_position.get(candidate)
+            if j is not None and not np.isnan(betas[i, j]):
+                market[i] = j
+                break
+
+    return {
+        "tickers": tickers,
+        "proxies": proxies,
+        "annual_returns": annual_returns,
+        "volatilities": volatilities,
+        "observations": observations.astype(np.int64),
+        "betas": betas,
+        "market": market,
+        "correlation": np.clip(correlation, -1.0, 1.0).astype(np.float32),
+    }
+
+
+def save_universe_index(root, stats, period):
+    """Escribe el índice en `root`; meta.json se publica al final."""
+    os.makedirs(root, exist_ok=True)
+    atomic_write(os.path.join(root, "tickers.json"), json.dumps(
+        {"tickers": stats["tickers"], "proxies": stats["proxies"]}).encode("utf-8"))
+    atomic_write(os.path.join(root, "stats.npz"), _npz_bytes(
+        annual_returns=stats["annual_returns"],
+        volatilities=stats["volatilities"],
+        observations=stats["observations"],
+        betas=stats["betas"],
+        market=stats["market"],
+    ))
+    atomic_write(os.path.join(root, "correlation.npy"), lambda fh: np.save(fh, stats["correlation"]))
+    meta = {
+        "period": period,
+        "built_at": datetime.now().isoformat(),
+        "n_tickers": len(stats["tickers"]),
+    }
+    atomic_write(os.path.join(root, "meta.json"), json.dumps(meta).encode("utf-8"))
+
+
+def precompute_universe(tickers, root, period="5y", chunk_size=DOWNLOAD_CHUNK_SIZE,
+                        fetch=download_adj_close, use_store=True):
+    """
+    Descarga el universo y los proxies de mercado, calcula los estadísticos
+    y los guarda en `root`. Devuelve el UniverseIndex resultante.
+
+    fetch(tickers, period=... | start=...) debe devolver un DataFrame con una
+    columna por ticker (por defecto la descarga de Yahoo de markowitz.data).
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        raise ValueError("El universo no tiene tickers.")
+    store = get_default_store() if use_store else None
+
+    def load(batch):
+        if store is not None:
+            return load_through_store(store, batch, period, fetch)
+        return fetch(batch, period=period)
+
+    frames = [load(tickers[i:i + chunk_size]) for i in range(0, len(tickers), chunk_size)]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        raise ValueError("No se pudieron descargar precios para el universo.")
+    prices = pd.concat(frames, axis=1)
+    prices = prices.loc[:, ~prices.columns.duplicated()]
+
+    market_prices = load(market_proxies())
+    if market_prices.empty:
+        raise ValueError("No se pudieron descargar los índices de mercado.")
+
+    missing = [t for t in tickers if t not in prices.columns]
+    if missing:
+        print(f"Warning: sin datos para {len(missing)} tickers del universo: {', '.join(missing[:20])}")
+
+    stats = compute_universe_stats(prices, market_prices.dropna(axis=1, how="all"))
+    save_universe_index(root, stats, period)
+    return UniverseIndex.load(root)
+
+
+class UniverseIndex:
+    """
+    Índice precalculado de solo lectura. La matriz de correlación se abre con
+    mmap, así que cargar el índice no lee N x N valores a memoria.
+    """
+
+    def __init__(self, tickers, proxies, annual_returns, volatilities, observations,
+                 betas, market, correlation, meta=None):
+        self.tickers = list(tickers)
+        self.proxies = list(proxies)
+        self.annual_returns = annual_returns
+        self.volatilities = volatilities
+        self.observations = observations
+        self.betas = betas
+        self.market = market
+        self.correlation = correlation
+        self.meta = meta or {}
+        self._position = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self._suffixes = np.array([ticker_suffix(t) for t in self.tickers])
+        self._own_beta = np.array([
+            betas[i, j] if j >= 0 else np.nan for i, j in enumerate(market)
+        ], dtype=float)
+
+    @classmethod
+    def load(cls, root):
+        """Abre el índice guardado en `root`. Lanza FileNotFoundError si no existe."""
+        with open(os.path.join(root, "meta.json"), encoding="utf-8") as fh:
+            meta = json.load(fh)
+        with open(os.path.join(root, "tickers.json"), encoding="utf-8") as fh:
+            names = json.load(fh)
+        with np.load(os.path.join(root, "stats.npz")) as arrays:
+            stats = {key: arrays[key] for key in arrays.files}
+        correlation = np.load(os.path.join(root, "correlation.npy"), mmap_mode="r")
+        return cls(names["tickers"], names["proxies"], correlation=correlation, meta=meta, **stats)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self._position
+
+    def stats(self, ticker):
+        """Estadísticos de un ticker como dict (KeyError si no está en el índice)."""
+        return self._row(self._position_of(ticker))
+
+    def screen(self, metric="beta", n=10, suffix=None, ascending=True):
+        """
+        Las `n` acciones con menor (o mayor) `metric`, opcionalmente solo las
+        de un sufijo (".SN"; "" para EE.UU.). La beta es contra el proxy
+        propio de cada acción. Las acciones sin dato se omiten.
+        """
+        if metric not in SCREEN_METRICS:
+            raise ValueError(f"Métrica no soportada: {metric}. Opciones: {', '.join(SCREEN_METRICS)}")
+        values = {"beta": self._own_beta, "annual_return": self.annual_returns,
+                  "volatility": self.volatilities}[metric]
+        candidates = np.flatnonzero(self._suffix_mask(suffix) & ~np.isnan(values))
+        order = np.argsort(values[candidates], kind="stable")
+        if not ascending:
+            order = order[::-1]
+        return [self._row(i) for i in candidates[order[:n]]]
+
+    def least_correlated(self, ticker, n=10, suffix=None):
+        """Las `n` acciones menos correlacionadas con `ticker` (correlación ascendente)."""
+        position = self._position_of(ticker)
+        row = np.asarray(self.correlation[position], dtype=float)
+        mask = self._suffix_mask(suffix) & ~np.isnan(row)
+        mask[position] = False
+        candidates = np.flatnonzero(mask)
+        order = np.argsort(row[candidates], kind="stable")
+        results = []
+        for i in candidates[order[:n]]:
+            entry = self._row(i)
+            entry["correlation"] = float(row[i])
+            results.append(entry)
+        return results
+
+    def correlation_between(self, first, second):
+        return float(self.correlation[self._position_of(first), self._position_of(second)])
+
+    def _position_of(self, ticker):
+        try:
+            return self._position[ticker]
+        except KeyError:
+            raise KeyError(f"{ticker} no está en el índice del universo.") from None
+
+    def _suffix_mask(self, suffix):
+        if suffix is None:
+            return np.ones(len(self.tickers), dtype=bool)
+        return self._suffixes == suffix
+
+    def _row(self, i):
+        j = int(self.market[i])
+        return {
+            "ticker": self.tickers[i],
+            "beta": _optional_float(self._own_beta[i]),
+            "market": self.proxies[j] if j >= 0 else None,
+            "annual_return": _optional_float(self.annual_returns[i]),
+            "volatility": _optional_float(self.volatilities[i]),
+            "observations": int(self.observations[i]),
+        }
+
+
+_default_index = {"root": None, "built_at": None, "index": None}
+
+
+def get_default_universe_index():
+    """
+    Índice en UNIVERSE_INDEX_DIR (por defecto <tmp>/markowitz_universe).
+    Se mantiene abierto entre solicitudes y se vuelve a abrir si el
+    precálculo lo reescribió. Devuelve None si todavía no se generó.
+    """
+    root = os.getenv("UNIVERSE_INDEX_DIR") or os.path.join(tempfile.gettempdir(), "markowitz_universe")
+    try:
+        with open(os.path.join(root, "meta.json"), encoding="utf-8") as fh:
+            built_at = json.load(fh).get("built_at")
+    except (FileNotFoundError, ValueError, OSError):
+        return None
+    if _default_index["root"] != root or _default_index["built_at"] != built_at:
+        _default_index.update(root=root, built_at=built_at, index=UniverseIndex.load(root))
+    return _default_index["index"]
+
+
+def _optional_float(value):
+    return None if np.isnan(value) else float(value)
+
+
+def _npz_bytes(**arrays):
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precalcula el índice de estadísticos de un universo.")
+    parser.add_argument("tickers_file", help="Archivo con un ticker por línea")
+    parser.add_argument("--output", default=os.getenv("UNIVERSE_INDEX_DIR")
+                        or os.path.join(tempfile.gettempdir(), "markowitz_universe"))
+    parser.add_argument("--period", default="5y")
+    parser.add_argument("--chunk-size", type=int, default=DOWNLOAD_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    with open(args.tickers_file, encoding="utf-8") as fh:
+        tickers = [line.strip().upper() for line in fh if line.strip() and not line.startswith("#")]
+
+    index = precompute_universe(tickers, args.output, period=args.period, chunk_size=args.chunk_size)
+    print(f"Índice con {len(index)} tickers guardado en {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
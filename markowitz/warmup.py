@@ -0,0 +1,90 @@
+"""
+Precarga del stack numérico.
+
+app.py solo importa Flask y módulos livianos (métricas, trabajos, caché de
+la tasa libre de riesgo, gráficos): la página inicial y los archivos
+estáticos responden sin cargar numpy, pandas, scipy ni yfinance, que toman
+más de un segundo en un arranque en frío (p.ej. una función serverless). Los
+handlers que optimizan importan el pipeline al usarse por primera vez.
+
+warm_up() hace esas importaciones por adelantado; el endpoint /warmup la
+expone para que el despliegue (un cron o el healthcheck) la llame antes de
+la primera optimización. benchmarks/bench_startup.py mide ambos caminos.
+"""
+import importlib
+import sys
+import threading
+import time
+
+from markowitz import metrics
+from markowitz.risk_free_rate import get_risk_free_rate_info
+
+# En orden de dependencia: así cada tiempo es el del módulo y no el de lo que arrastra
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "scipy.linalg",
+    "scipy.optimize",
+    "scipy.stats",
+    "yfinance",
+    "markowitz.pipeline",
+    "markowitz.batch",
+    "markowitz.backtest",
+    "markowitz.sensitivity",
+    "markowitz.universe",
+)
+
+_lock = threading.Lock()
+
+
+def lazy_import(module, name):
+    """
+    Función que importa `module` la primera vez que se llama y delega en su
+    `name`. Permite nombrar en app.py funciones de módulos pesados sin
+    importarlos al arrancar.
+    """
+    target = None
+
+    def proxy(*args, **kwargs):
+        nonlocal target
+        if target is None:
+            target = getattr(importlib.import_module(module), name)
+        return target(*args, **kwargs)
+
+    proxy.__name__ = proxy.__qualname__ = name
+    proxy.__doc__ = f"{module}.{name}, importado al primer uso."
+    return proxy
+
+
+def loaded_heavy_modules():
+    """Módulos de HEAVY_MODULES ya importados en este proceso."""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def warm_up(risk_free_rate=True):
+    """
+    Importa HEAVY_MODULES y, con risk_free_rate=True, deja la tasa libre de
+    riesgo en caché. Es idempotente: si ya está todo cargado no hace nada.
+
+    Returns:
+        dict con modules (segundos por módulo importado en esta llamada),
+        seconds (total) y already_warm.
+    """
+    timings = {}
+    start = time.perf_counter()
+    with _lock, metrics.span("warmup"):
+        for name in HEAVY_MODULES:
+            if name in sys.modules:
+                continue
+            module_start = time.perf_counter()
+            importlib.import_module(name)
+            timings[name] = time.perf_counter() - module_start
+        if risk_free_rate:
+            get_risk_free_rate_info()
+    if timings:
+        metrics.increment("markowitz_warmups_total")
+    return {
+        "modules": timings,
+        "seconds": time.perf_counter() - start,
+        "already_warm": not timings,
+    }
@@ -19,8 +19,8 @@ const TRANSLATIONS = {
         en: "Optimize your portfolio with the Markowitz approach"
     },
     "hero.subtitle": {
-        es: "Analiza hasta 30 acciones, descarga datos históricos y obtén la asignación con mejor ratio de Sharpe en minutos.",
-        en: "Analyze up to 30 stocks, download historical data and get the best Sharpe ratio allocation in minutes."
+        es: "Analiza hasta {max} acciones, descarga datos históricos y obtén la asignación con mejor ratio de Sharpe en minutos.",
+        en: "Analyze up to {max} stocks, download historical data and get the best Sharpe ratio allocation in minutes."
     },
     "hero.pill_data": { es: "Datos Yahoo Finance", en: "Yahoo Finance Data" },
     "hero.pill_long_only": { es: "Restricción sin cortos", en: "Long-only constraint" },
@@ -34,7 +34,7 @@ const TRANSLATIONS = {
         es: "Busca por ticker o nombre (ej: Apple, MSFT)...",
         en: "Search by ticker or name (e.g. Apple, MSFT)..."
     },
-    "form.counter_suffix": { es: "de 5-30 tickers seleccionados", en: "of 5-30 tickers selected" },
+    "form.counter_suffix": { es: "de {min}-{max} tickers seleccionados", en: "of {min}-{max} tickers selected" },
     "form.popular_stocks": { es: "Acciones populares:", en: "Popular stocks:" },
     "form.optimize_by_index": { es: "Optimizar por índice:", en: "Optimize by index:" },
     "form.index_ipsa_count": { es: "30 acciones", en: "30 stocks" },
@@ -48,8 +48,8 @@ const TRANSLATIONS = {
     "how.title": { es: "Cómo funciona", en: "How it works" },
     "how.step1_title": { es: "Define el universo", en: "Define the universe" },
     "how.step1_desc": {
-        es: "Ingresa entre 5 y 30 acciones que quieras evaluar. Podemos mezclar distintos sectores y mercados.",
-        en: "Enter between 5 and 30 stocks you want to evaluate. You can mix different sectors and markets."
+        es: "Ingresa entre {min} y {max} acciones que quieras evaluar. Podemos mezclar distintos sectores y mercados.",
+        en: "Enter between {min} and {max} stocks you want to evaluate. You can mix different sectors and markets."
     },
     "how.step2_title": { es: "Procesamos los datos", en: "We process the data" },
     "how.step2_desc": {
@@ -69,6 +69,9 @@ const TRANSLATIONS = {
         es: "Utilizamos la tasa libre de riesgo del bono del Tesoro de EE.UU. a 10 años (Federal Reserve Bank of New York) · Valor actual:",
         en: "We use the risk-free rate of the 10-year US Treasury bond (Federal Reserve Bank of New York) · Current value:"
     },
+    "rf_source.live": { es: "en vivo", en: "live" },
+    "rf_source.cached": { es: "en caché", en: "cached" },
+    "rf_source.fallback": { es: "estimado", en: "estimated" },
     "metrics.risk_label": { es: "Riesgo controlado", en: "Controlled risk" },
     "metrics.risk_title": { es: "Matriz de covarianzas", en: "Covariance matrix" },
     "metrics.risk_desc": {
@@ -124,6 +127,14 @@ const TRANSLATIONS = {
     "result.expected_return_label": { es: "Retorno Esperado:", en: "Expected Return:" },
     "result.volatility_label": { es: "Volatilidad:", en: "Volatility:" },
 
+    // Value at Risk
+    "result.risk_title": { es: "Riesgo del portafolio óptimo", en: "Optimal portfolio risk" },
+    "result.risk_subtitle": { es: "Pérdida diaria con confianza", en: "Daily loss at confidence" },
+    "result.th_risk_method": { es: "Método", en: "Method" },
+    "risk_method.parametric": { es: "Paramétrico", en: "Parametric" },
+    "risk_method.historical": { es: "Histórico", en: "Historical" },
+    "risk_method.monte_carlo": { es: "Monte Carlo", en: "Monte Carlo" },
+
     // Simulación de portafolios aleatorios
     "result.monte_carlo_title": { es: "Simulación de portafolios aleatorios", en: "Random portfolio simulation" },
     "result.mc_portfolios_generated": { es: "portafolios aleatorios generados", en: "random portfolios generated" },
@@ -147,6 +158,8 @@ const TRANSLATIONS = {
     "chart.optimal_slsqp": { es: "Portafolio Óptimo (SLSQP)", en: "Optimal Portfolio (SLSQP)" },
     "chart.best_sharpe_mc": { es: "Mejor Sharpe (simulado)", en: "Best Sharpe (simulated)" },
     "chart.min_vol_mc": { es: "Mínima Volatilidad (simulada)", en: "Minimum Volatility (simulated)" },
+    "chart.mc_envelope": { es: "Envolvente superior (simulada)", en: "Upper envelope (simulated)" },
+    "chart.mc_points_unavailable": { es: "No se pudieron cargar los portafolios simulados; se muestra solo la densidad de la simulación.", en: "The simulated portfolios could not be loaded; only the simulation density is shown." },
 
     // Chart Tooltips
     "chart.tooltip_rf": { es: "Rf:", en: "Rf:" },
@@ -166,14 +179,14 @@ const TRANSLATIONS = {
         es: "El ticker solo puede contener letras, números, puntos, guiones o guiones bajos",
         en: "Ticker can only contain letters, numbers, periods, hyphens or underscores"
     },
-    "validation.min_required": { es: "Mínimo 5 tickers requeridos", en: "Minimum 5 tickers required" },
+    "validation.min_required": { es: "Mínimo {min} tickers requeridos", en: "Minimum {min} tickers required" },
     "validation.min_reached": { es: "Mínimo alcanzado", en: "Minimum reached" },
     "validation.optimal_diversification": { es: "Diversificación óptima", en: "Optimal diversification" },
     "validation.max_reached": { es: "Máximo alcanzado", en: "Maximum reached" },
     "validation.almost_full": { es: "Casi lleno", en: "Almost full" },
     "validation.max_placeholder": {
-        es: "Máximo de 30 tickers alcanzado",
-        en: "Maximum of 30 tickers reached"
+        es: "Máximo de {max} tickers alcanzado",
+        en: "Maximum of {max} tickers reached"
     },
     "validation.input_placeholder": {
         es: "Escribe un ticker (ej: AAPL) y presiona Enter...",
@@ -181,20 +194,20 @@ const TRANSLATIONS = {
     },
     "validation.no_results": { es: "No se encontraron resultados", en: "No results found" },
     "validation.already_in_list": { es: "ya está en la lista", en: "is already in the list" },
-    "validation.max_allowed": { es: "Máximo 30 tickers permitidos", en: "Maximum 30 tickers allowed" },
+    "validation.max_allowed": { es: "Máximo {max} tickers permitidos", en: "Maximum {max} tickers allowed" },
     "validation.select_range": {
-        es: "Debes seleccionar entre 5 y 30 tickers.",
-        en: "You must select between 5 and 30 tickers."
+        es: "Debes seleccionar entre {min} y {max} tickers.",
+        en: "You must select between {min} and {max} tickers."
     },
     "validation.remove_ticker": { es: "Remover", en: "Remove" },
 
     // ===== CSS pseudo-content =====
     "css.no_tickers": { es: "Sin tickers seleccionados", en: "No tickers selected" },
 
-    // ===== Error messages from backend =====
+    // ===== Error messages from backend (by error code) =====
     "error.ticker_range": {
-        es: "Debes ingresar entre 5 y 30 tickers.",
-        en: "You must enter between 5 and 30 tickers."
+        es: "Debes ingresar entre {min} y {max} tickers.",
+        en: "You must enter between {min} and {max} tickers."
     },
 
     // ===== Chart.js loading errors =====
@@ -220,17 +233,30 @@ function setCurrentLang(lang) {
     localStorage.setItem("lang", lang);
 }
 
+/**
+ * Values for {placeholders} in translations: the ticker limits the server
+ * renders on the form (data-min-tickers / data-max-tickers)
+ * @returns {Object} { min, max }, empty if the page has no form
+ */
+function translationParams() {
+    const el = document.querySelector("[data-max-tickers]");
+    if (!el) return {};
+    return { min: el.dataset.minTickers, max: el.dataset.maxTickers };
+}
+
 /**
  * Get a translated string by key
  * @param {string} key - Translation key (e.g. 'nav.how_it_works')
  * @param {string} [lang] - Language override (defaults to current language)
- * @returns {string} Translated string, or the key if not found
+ * @returns {string} Translated string with {placeholders} filled, or the key if not found
  */
 function t(key, lang) {
     const l = lang || getCurrentLang();
     const entry = TRANSLATIONS[key];
     if (!entry) return key;
-    return entry[l] || entry["es"] || key;
+    const text = entry[l] || entry["es"] || key;
+    const params = translationParams();
+    return text.replace(/\{(\w+)\}/g, (match, name) => (params[name] !== undefined ? params[name] : match));
 }
 
 /**
@@ -331,6 +331,19 @@ function normalizeTicker(ticker) {
     return ticker.trim().toUpperCase();
 }
 
+/**
+ * Límites de la canasta que publica el servidor en el formulario
+ * (data-min-tickers / data-max-tickers, ver MAX_TICKERS en markowitz.tickers)
+ * @returns {{min: number, max: number}}
+ */
+function tickerLimits() {
+    const form = document.getElementById("portfolio-form");
+    return {
+        min: Number(form?.dataset.minTickers) || 5,
+        max: Number(form?.dataset.maxTickers) || 30,
+    };
+}
+
 /**
  * Actualiza el contador visual y su estado
  * @param {number} count - Número de tickers seleccionados
@@ -348,29 +361,30 @@ function updateTickerCounter(count) {
     validationEl.classList.remove("text-danger", "text-warning", "text-success");
 
     // Estados con código de colores
-    if (count < 5) {
+    const { min, max } = tickerLimits();
+    if (count < min) {
         counterEl.classList.add("counter-danger");
         validationEl.classList.add("text-danger");
         validationEl.textContent = `⚠ ${t('validation.min_required')}`;
-    } else if (count >= 5 && count <= 7) {
+    } else if (count >= max - 1) {
+        counterEl.classList.add("counter-warning");
+        validationEl.classList.add("text-warning");
+        validationEl.textContent = count >= max ? `⚠ ${t('validation.max_reached')}` : `⚠ ${t('validation.almost_full')}`;
+    } else if (count <= min + 2) {
         counterEl.classList.add("counter-warning");
         validationEl.classList.add("text-warning");
         validationEl.textContent = `✓ ${t('validation.min_reached')}`;
-    } else if (count >= 8 && count <= 28) {
+    } else {
         counterEl.classList.add("counter-optimal");
         validationEl.classList.add("text-success");
         validationEl.textContent = `✓ ${t('validation.optimal_diversification')}`;
-    } else if (count >= 29 && count <= 30) {
-        counterEl.classList.add("counter-warning");
-        validationEl.classList.add("text-warning");
-        validationEl.textContent = count === 30 ? `⚠ ${t('validation.max_reached')}` : `⚠ ${t('validation.almost_full')}`;
     }
 
     // Deshabilitar input si se alcanzó el máximo
     const searchInput = document.getElementById("ticker-search");
     if (searchInput) {
-        searchInput.disabled = count >= 30;
-        if (count >= 30) {
+        searchInput.disabled = count >= max;
+        if (count >= max) {
             searchInput.placeholder = t('validation.max_placeholder');
         } else {
             searchInput.placeholder = t('validation.input_placeholder');
@@ -590,7 +604,7 @@ class TickerSelector {
         }
 
         // Verificar límite máximo
-        if (this.selectedTickers.length >= 30) {
+        if (this.selectedTickers.length >= tickerLimits().max) {
             this.showError(t('validation.max_allowed'));
             return;
         }
@@ -655,7 +669,7 @@ class TickerSelector {
 
         suggestions.forEach(badge => {
             const ticker = badge.dataset.ticker;
-            badge.disabled = this.selectedTickers.includes(ticker) || this.selectedTickers.length >= 30;
+            badge.disabled = this.selectedTickers.includes(ticker) || this.selectedTickers.length >= tickerLimits().max;
         });
     }
 
@@ -696,17 +710,12 @@ class TickerSelector {
     }
 }
 
-// Translate known backend error messages
+// Translate known backend errors by their stable code (data-error-code)
 function translateErrorAlerts() {
-    const errorAlerts = document.querySelectorAll("[data-error-msg]");
+    const errorAlerts = document.querySelectorAll("[data-error-code]");
     errorAlerts.forEach((el) => {
-        const msg = el.getAttribute("data-error-msg");
-        // Map known Spanish error messages to i18n keys
-        const ERROR_MAP = {
-            "Debes ingresar entre 5 y 30 tickers.": "error.ticker_range",
-        };
-        const key = ERROR_MAP[msg];
-        if (key) {
+        const key = `error.${el.getAttribute("data-error-code")}`;
+        if (key in TRANSLATIONS) {
             el.textContent = t(key);
         }
     });
@@ -724,7 +733,8 @@ document.addEventListener("DOMContentLoaded", () => {
         // Validación al enviar formulario
         form.addEventListener("submit", (e) => {
             const tickers = tickerSelector.selectedTickers;
-            if (tickers.length < 5 || tickers.length > 30) {
+            const { min, max } = tickerLimits();
+            if (tickers.length < min || tickers.length > max) {
                 e.preventDefault();
                 alert(t('validation.select_range'));
                 return;
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from markowitz import pipeline
+
+
+@pytest.fixture(autouse=True)
+def _isolated_price_store(tmp_path, monkeypatch):
+    """Cada test usa su propio almacén de precios y de gráficos en disco."""
+    monkeypatch.setenv("PRICE_STORE_DIR", str(tmp_path / "prices"))
+    monkeypatch.setenv("CHART_STORE_DIR", str(tmp_path / "charts"))
+
+
+@pytest.fixture(autouse=True)
+def _empty_result_cache():
+    """Los resultados memoizados no pasan de un test a otro."""
+    pipeline.result_cache.clear()
+    yield
+    pipeline.result_cache.clear()
+
+
+def synthetic_prices(n_assets=5, n_days=300, seed=0, columns=None, start="2021-01-04", end=None, market=False):
+    """
+    Panel de precios diarios con un factor de mercado común (betas entre 0.5
+    y 1.5) y ruido idiosincrático de volatilidad distinta por activo.
+
+    Args:
+        n_assets: número de activos (se ignora si se pasan `columns`).
+        n_days: días hábiles del panel.
+        seed: semilla del generador.
+        columns: nombres de las columnas (por defecto T000, T001...).
+        start: primer día hábil; con `end` el panel termina en esa fecha.
+        market: si es True devuelve (prices, market_prices), con el índice
+            de mercado como Serie "^GSPC" en las mismas fechas.
+    """
+    columns = list(columns) if columns is not None else [f"T{i:03d}" for i in range(n_assets)]
+    rng = np.random.default_rng(seed)
+    factor = rng.normal(0.0004, 0.01, n_days)
+    betas = rng.uniform(0.5, 1.5, len(columns))
+    noise = rng.normal(0.0, 0.01, (n_days, len(columns))) * rng.uniform(0.5, 2.0, len(columns))
+    returns = factor[:, None] * betas + noise
+    if end is not None:
+        dates = pd.bdate_range(end=end, periods=n_days)
+    else:
+        dates = pd.bdate_range(start, periods=n_days)
+    prices = pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), index=dates, columns=columns)
+    if not market:
+        return prices
+    return prices, pd.Series(100 * np.cumprod(1 + factor), index=dates, name="^GSPC")
+
+
+@pytest.fixture
+def make_prices():
+    """La fábrica synthetic_prices, para los tests que necesitan precios sintéticos."""
+    return synthetic_prices
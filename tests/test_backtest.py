@@ -0,0 +1,145 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as app_module
+from markowitz import backtest
+from markowitz.backtest import RollingMoments, rebalance_positions, run_backtest
+from markowitz.model import TRADING_DAYS_PER_YEAR
+from markowitz.optimizer import optimize_portfolio
+from markowitz.qp import max_sharpe_weights
+
+
+def test_rolling_moments_match_full_recomputation(make_prices):
+    values = make_prices(6, 400).pct_change().iloc[1:].to_numpy() + 0.5  # media lejos de cero
+    window = 60
+    moments = RollingMoments(values, 0, window)
+
+    for start in list(range(1, 80)) + [150, 155, 300, 339]:
+        moments.slide_to(start, start + window)
+        block = values[start:start + window]
+        np.testing.assert_allclose(moments.mean, block.mean(axis=0), rtol=1e-12)
+        np.testing.assert_allclose(moments.cov, np.cov(block, rowvar=False), rtol=1e-8, atol=1e-14)
+
+    with pytest.raises(ValueError):
+        moments.slide_to(0, window)
+
+
+def test_rebalance_positions_monthly_and_fixed_step():
+    index = pd.bdate_range("2020-01-01", "2020-12-31")
+
+    monthly = rebalance_positions(index, 21, "M")
+    assert monthly[0] == 21
+    assert all(index[p].month != index[p - 1].month for p in monthly[1:])
+    assert len(monthly) == 12
+
+    np.testing.assert_array_equal(rebalance_positions(index, 100, 50), [100, 150, 200, 250])
+    with pytest.raises(ValueError):
+        rebalance_positions(index, 21, "D")
+    with pytest.raises(ValueError):
+        rebalance_positions(index, len(index), "M")
+
+
+def test_backtest_weights_match_optimizer_on_each_window(make_prices):
+    prices = make_prices(5, 400)
+    window = 120
+    result = run_backtest(prices, window=window, rebalance=63, risk_free_rate=0.02)
+    returns = prices.pct_change().iloc[1:]
+
+    for date, weights in zip(result["rebalance_dates"], result["weights"]):
+        position = returns.index.get_loc(date)
+        history = returns.iloc[position - window:position]
+        mean = history.mean().to_numpy() * TRADING_DAYS_PER_YEAR
+        cov = history.cov().to_numpy() * TRADING_DAYS_PER_YEAR
+        expected = max_sharpe_weights(mean, cov, 0.02)
+        np.testing.assert_allclose(weights, expected, atol=1e-3)
+
+    assert result["dates"][0] == result["rebalance_dates"][0]
+    assert len(result["returns"]) == len(returns) - window
+
+
+def test_backtest_realized_returns_turnover_and_drawdown(make_prices):
+    prices = make_prices(4, 300)
+    result = run_backtest(prices, window=100, rebalance=50, objective="min_variance", transaction_cost=0.001)
+    returns = prices.pct_change().iloc[1:].to_numpy()
+
+    # Reconstrucción día a día con pesos a la deriva
+    held = np.zeros(4)
+    expected = []
+    turnover = []
+    for i, start in enumerate(range(100, 299, 50)):
+        weights = result["weights"][i]
+        turnover.append(np.abs(weights - held).sum())
+        # El costo se descuenta del valor del día del rebalanceo
+        current = weights * (1.0 - 0.001 * turnover[-1])
+        previous_value = 1.0
+        for day in range(start, min(start + 50, 299)):
+            current = current * (1 + returns[day])
+            expected.append(current.sum() / previous_value - 1)
+            previous_value = current.sum()
+        held = current / current.sum()
+
+    np.testing.assert_allclose(result["turnover"], turnover, rtol=1e-10)
+    assert result["turnover"][0] == pytest.approx(1.0)
+    np.testing.assert_allclose(result["returns"], expected, rtol=1e-10, atol=1e-14)
+
+    equity = np.cumprod(1 + np.array(expected))
+    peaks = np.maximum.accumulate(np.maximum(equity, 1.0))
+    np.testing.assert_allclose(result["drawdown"], equity / peaks - 1, atol=1e-12)
+    assert result["summary"]["max_drawdown"] == pytest.approx(result["drawdown"].min())
+    assert result["summary"]["total_cost"] == pytest.approx(0.001 * sum(turnover))
+
+
+def test_backtest_full_window_matches_optimize_portfolio(make_prices):
+    prices = make_prices(4, 200)
+    result = run_backtest(prices, window=150, rebalance=1000, objective="min_variance")
+    expected = optimize_portfolio(prices.iloc[:151], objective="min_variance")
+
+    np.testing.assert_allclose(result["weights"][0], expected["weights"], atol=1e-4)
+
+
+def test_backtest_ten_years_monthly_thirty_assets_is_fast(make_prices):
+    prices = make_prices(30, 2520)
+
+    start = time.perf_counter()
+    result = run_backtest(prices, window=252, rebalance="M", risk_free_rate=0.02)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 5.0
+    assert len(result["rebalance_dates"]) > 100
+    assert result["summary"]["failures"] == 0
+    np.testing.assert_allclose(result["weights"].sum(axis=1), 1.0)
+
+
+def test_backtest_tickers_downloads_once_and_returns_json(make_prices, monkeypatch):
+    prices = make_prices(5, 400)
+    calls = []
+    monkeypatch.setattr(backtest, "get_price_data", lambda tickers, period: calls.append(period) or prices)
+    monkeypatch.setattr(backtest, "get_risk_free_rate_info", lambda: {"rate": 0.03, "source": "cached"})
+
+    result = backtest.backtest_tickers(list(prices.columns), period="2y", window=126, as_lists=True)
+
+    assert calls == ["2y"]
+    json.dumps(result)
+    expected = run_backtest(prices, window=126, risk_free_rate=0.03)
+    assert result["returns"] == pytest.approx(expected["returns"].tolist())
+    assert result["rebalance_dates"][0] == expected["rebalance_dates"][0].strftime("%Y-%m-%d")
+    assert result["risk_free_rate_source"] == "cached"
+
+
+def test_backtest_endpoint(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module, "backtest_tickers", lambda tickers, **kwargs: calls.append(kwargs) or {})
+    client = app_module.create_app().test_client()
+
+    response = client.post("/api/backtest", json={"tickers": "aaa bbb ccc ddd eee", "period": "5y", "rebalance": 21})
+    assert response.status_code == 202
+    assert "status_url" in response.get_json()
+
+    assert client.post("/api/backtest", json={"tickers": "AAA BBB CCC DDD EEE", "rebalance": "D"}).status_code == 400
+    assert client.post("/api/backtest", json={"tickers": "AAA BBB CCC DDD EEE", "window": 1}).status_code == 400
+    assert client.post("/api/backtest", json={"tickers": "AAA BBB CCC DDD EEE", "transaction_cost": -0.1}).status_code == 400
+    assert client.post("/api/backtest", json={"tickers": ["AAA"]}).status_code == 400
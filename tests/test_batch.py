@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+import app as app_module
+from markowitz import batch, fetch, pipeline
+
+
+@pytest.fixture
+def fake_downloads(make_prices, monkeypatch):
+    prices, market_prices = make_prices(columns=["AAA", "BBB", "CCC", "DDD", "EEE", "FFF", "GGG"], market=True)
+    prices.iloc[:40, -1] = np.nan  # GGG empieza a cotizar más tarde
+    calls = []
+
+    def fake_panel(tickers, period="5y"):
+        calls.append(list(tickers))
+        return prices[[t for t in tickers if t in prices.columns]]
+
+    monkeypatch.setattr(fetch, "get_price_panel", fake_panel)
+    monkeypatch.setattr(fetch, "get_market_data", lambda **kwargs: market_prices)
+    monkeypatch.setattr(fetch, "get_risk_free_rate_info", lambda: {"rate": 0.03, "source": "cached"})
+    return prices, market_prices, calls
+
+
+def test_batch_downloads_union_once_and_matches_single_runs(fake_downloads, monkeypatch):
+    prices, market_prices, calls = fake_downloads
+    baskets = [
+        ["AAA", "BBB", "CCC", "DDD", "EEE"],
+        ["BBB", "CCC", "DDD", "EEE", "FFF"],
+        ["AAA", "CCC", "EEE", "FFF", "GGG"],
+    ]
+
+    combined = batch.run_batch(baskets, period="1y")
+
+    assert calls == [["AAA", "BBB", "CCC", "DDD", "EEE", "FFF", "GGG"]]
+    assert combined["n_tickers"] == 7
+    # La canasta con GGG tiene menos fechas: usa su propio modelo
+    assert combined["shared_models"] == 2
+
+    for basket, entry in zip(baskets, combined["results"]):
+        monkeypatch.setattr(pipeline, "fetch_market_inputs", lambda tickers, period: {
+            "prices": prices[tickers].dropna(),
+            "market_prices": market_prices,
+            "risk_free_rate": 0.03,
+            "risk_free_rate_source": "cached",
+        })
+        single = pipeline.run_optimization(basket, period="1y")
+        assert entry["tickers"] == basket
+        assert entry["result"]["sharpe"] == pytest.approx(single["sharpe"], rel=1e-9)
+        assert [row["weight"] for row in entry["result"]["rows"]] == pytest.approx(
+            [row["weight"] for row in single["rows"]], abs=1e-9)
+
+
+def test_batch_reports_per_basket_errors(fake_downloads):
+    combined = batch.run_batch([
+        ["AAA", "BBB", "CCC", "DDD", "EEE"],
+        ["AAA", "BBB", "CCC", "DDD", "ZZZ"],
+    ])
+
+    assert "result" in combined["results"][0]
+    assert "ZZZ" in combined["results"][1]["error"]
+
+
+def test_batch_does_not_slice_ledoit_wolf(fake_downloads):
+    combined = batch.run_batch([["AAA", "BBB", "CCC", "DDD", "EEE"]], covariance="ledoit_wolf")
+
+    assert combined["shared_models"] == 0
+    assert "result" in combined["results"][0]
+
+
+def test_validate_baskets():
+    with pytest.raises(ValueError):
+        batch.validate_baskets([])
+    with pytest.raises(ValueError, match="Canasta 2"):
+        batch.validate_baskets([["A", "B", "C", "D", "E"], ["A"]])
+
+
+def test_batch_endpoint(monkeypatch):
+    monkeypatch.setattr(app_module, "run_batch", lambda baskets, period, covariance: {"results": baskets})
+    client = app_module.create_app().test_client()
+
+    response = client.post("/api/batch", json={"baskets": [["aaa", "bbb", "ccc", "ddd", "eee"], "AAA BBB CCC DDD FFF"]})
+    assert response.status_code == 202
+    assert response.get_json()["n_baskets"] == 2
+
+    assert client.post("/api/batch", json={"baskets": "AAA"}).status_code == 400
+    assert client.post("/api/batch", json={"baskets": [["AAA"]]}).status_code == 400
@@ -0,0 +1,45 @@
+from benchmarks.bench_markowitz import compare, run_benchmarks, synthetic_prices
+from benchmarks.bench_startup import measure_startup
+
+
+def test_synthetic_prices_shape():
+    prices = synthetic_prices(7, 40)
+
+    assert prices.shape == (40, 7)
+    assert (prices > 0).all().all()
+
+
+def test_run_benchmarks_tiny_grid():
+    grid = {"n_assets": [3], "n_days": [60], "n_portfolios": [100]}
+
+    results = run_benchmarks(grid, repeats=1, log=lambda *_: None)
+
+    cases = {entry["case"] for entry in results}
+    assert {"optimize_portfolio", "compute_efficient_frontier", "run_monte_carlo",
+            "calculate_betas", "clean_price_panel"} <= cases
+    assert all(entry["median"] >= 0 for entry in results)
+
+
+def test_compare_flags_regressions_only_above_threshold():
+    params = {"n_assets": 5, "n_days": 252}
+    baseline = {"results": [
+        {"case": "optimize_portfolio", "params": params, "median": 1.0},
+        {"case": "run_monte_carlo", "params": params, "median": 1.0},
+    ]}
+    current = [
+        {"case": "optimize_portfolio", "params": params, "median": 1.5},
+        {"case": "run_monte_carlo", "params": params, "median": 1.1},
+        {"case": "calculate_betas", "params": params, "median": 9.0},
+    ]
+
+    regressions = compare(current, baseline, threshold=0.25)
+
+    assert [r["case"] for r in regressions] == ["optimize_portfolio"]
+    assert regressions[0]["ratio"] == 1.5
+
+
+def test_landing_page_starts_without_numeric_stack():
+    results, heavy = measure_startup(repeats=1, log=lambda *_: None)
+
+    assert heavy == []
+    assert [entry["case"] for entry in results] == ["import_app", "first_landing", "warmup"]
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as app_module
+from markowitz import black_litterman, pipeline
+from markowitz.black_litterman import equilibrium_prior, get_prior, parse_views
+from markowitz.capm import get_capm_expected_returns
+from markowitz.model import MarketModel
+
+TICKERS = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+
+
+@pytest.fixture
+def prior(make_prices):
+    prices, market_prices = make_prices(n_days=400, columns=TICKERS, market=True)
+    model = MarketModel.from_prices(prices)
+    capm = get_capm_expected_returns(prices, 0.03, model=model, market_prices=market_prices)
+    return equilibrium_prior(model, 0.03, capm=capm)
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    black_litterman.clear_prior_cache()
+    yield
+    black_litterman.clear_prior_cache()
+
+
+def test_without_views_posterior_is_capm_prior(prior):
+    result = prior.posterior([])
+
+    pd.testing.assert_series_equal(result["expected_returns"], prior.capm["expected_returns"], check_names=False)
+
+
+def test_posterior_matches_textbook_formula(prior):
+    views = [
+        {"asset": "AAA", "return": 0.15, "confidence": 0.7},
+        {"long": "BBB", "short": "CCC", "return": 0.02},
+        {"weights": {"DDD": 0.5, "EEE": 0.5, "AAA": -1}, "return": -0.01, "confidence": 0.3},
+    ]
+    result = prior.posterior(views)
+
+    P, q, confidences = parse_views(views, TICKERS)
+    sigma = prior.model.cov_annual
+    pi = prior.expected_returns.to_numpy()
+    tau_sigma = prior.tau * sigma
+    omega = np.diag(np.diag(P @ tau_sigma @ P.T) * (1 - confidences) / confidences)
+    expected = pi + tau_sigma @ P.T @ np.linalg.inv(P @ tau_sigma @ P.T + omega) @ (q - P @ pi)
+
+    np.testing.assert_allclose(result["expected_returns"].to_numpy(), expected, rtol=1e-10)
+    assert result["views"][1]["weights"] == {"BBB": 1.0, "CCC": -1.0}
+    assert result["views"][0]["posterior_return"] == pytest.approx(expected[0])
+
+
+def test_full_confidence_view_is_matched_exactly(prior):
+    result = prior.posterior([{"asset": "CCC", "return": 0.25, "confidence": 1.0}])
+
+    assert result["expected_returns"]["CCC"] == pytest.approx(0.25)
+
+
+def test_market_weights_prior_is_reverse_optimization(make_prices):
+    prices, _ = make_prices(n_days=400, columns=TICKERS, market=True)
+    model = MarketModel.from_prices(prices)
+    weights = np.array([0.3, 0.25, 0.2, 0.15, 0.1])
+
+    prior = equilibrium_prior(model, 0.03, market_weights=weights, risk_aversion=3.0)
+
+    implied = np.linalg.solve(model.cov_annual, prior.expected_returns.to_numpy() - 0.03) / 3.0
+    np.testing.assert_allclose(implied, weights, rtol=1e-8)
+
+
+def test_prior_is_cached_and_views_only_resolve_small_system(make_prices, monkeypatch):
+    prices, market_prices = make_prices(n_days=400, columns=TICKERS, market=True)
+    built = []
+    original = MarketModel.from_prices
+    monkeypatch.setattr(MarketModel, "from_prices", lambda *a, **k: built.append(1) or original(*a, **k))
+
+    first = get_prior(prices, market_prices, 0.03, period="2y")
+    second = get_prior(prices, market_prices, 0.03, period="2y")
+    first.posterior([{"asset": "AAA", "return": 0.1}])
+    second.posterior([{"asset": "BBB", "return": 0.2}])
+
+    assert first is second
+    assert len(built) == 1
+    assert get_prior(prices.iloc[:-1], market_prices, 0.03, period="2y") is not first
+
+
+def test_parse_views_rejects_invalid_views():
+    for views in ([{"asset": "ZZZ", "return": 0.1}],
+                  [{"asset": "AAA"}],
+                  [{"asset": "AAA", "return": 0.1, "confidence": 0}],
+                  [{"return": 0.1}],
+                  [{"long": "AAA", "short": "AAA", "return": 0.1}]):
+        with pytest.raises(ValueError):
+            parse_views(views, TICKERS)
+
+
+def test_pipeline_uses_posterior_returns(make_prices, monkeypatch):
+    prices, market_prices = make_prices(n_days=400, columns=TICKERS, market=True)
+    monkeypatch.setattr(pipeline, "fetch_market_inputs", lambda tickers, period: {
+        "prices": prices, "market_prices": market_prices,
+        "risk_free_rate": 0.03, "risk_free_rate_source": "cached",
+    })
+    views = [{"asset": "EEE", "return": 0.40, "confidence": 0.9}]
+
+    plain = pipeline.run_optimization(TICKERS, period="2y")
+    with_views = pipeline.run_optimization(TICKERS, period="2y", views=views)
+
+    weight = {row["ticker"]: row["weight"] for row in with_views["rows"]}
+    plain_weight = {row["ticker"]: row["weight"] for row in plain["rows"]}
+    assert weight["EEE"] > plain_weight["EEE"]
+    assert with_views["rows"][4]["expected_return_bl"] > with_views["rows"][4]["expected_return_capm"]
+    assert with_views["black_litterman"]["views"][0]["return"] == 0.40
+    assert "black_litterman" not in plain
+
+
+def test_submit_job_rejects_invalid_views():
+    client = app_module.create_app().test_client()
+
+    response = client.post("/api/jobs", json={"tickers": TICKERS, "views": [{"asset": "ZZZ", "return": 0.1}]})
+
+    assert response.status_code == 400
+    assert "ZZZ" in response.get_json()["error"]
@@ -0,0 +1,109 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as app_module
+from markowitz import charts, pipeline
+from markowitz.charts import ChartStore, decode_columns, encode_columns, to_binary
+
+TICKERS = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+
+
+@pytest.fixture
+def fake_inputs(monkeypatch):
+    rng = np.random.default_rng(5)
+    dates = pd.bdate_range("2022-01-03", periods=300)
+    market = rng.normal(0.0005, 0.01, len(dates))
+    returns = market[:, None] * rng.uniform(0.6, 1.4, len(TICKERS)) + rng.normal(0, 0.01, (len(dates), len(TICKERS)))
+    prices = pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), index=dates, columns=TICKERS)
+    market_prices = pd.Series(100 * np.cumprod(1 + market), index=dates, name="^GSPC")
+    monkeypatch.setattr(pipeline, "fetch_market_inputs", lambda tickers, period: {
+        "prices": prices[tickers], "market_prices": market_prices,
+        "risk_free_rate": 0.03, "risk_free_rate_source": "cached",
+    })
+
+
+def test_encode_decode_roundtrip_is_float32():
+    values = np.linspace(-1, 1, 7)
+    payload = encode_columns({"a": values, "b": values * 2})
+
+    assert payload["dtype"] == "float32"
+    assert payload["length"] == 7
+    decoded = decode_columns(payload)
+    assert list(decoded) == ["a", "b"]
+    np.testing.assert_allclose(decoded["b"], values * 2, rtol=1e-6)
+    assert len(to_binary(payload)) == 2 * 7 * 4
+
+    with pytest.raises(ValueError):
+        encode_columns({"a": [1.0], "b": [1.0, 2.0]})
+
+
+def test_store_expires_and_bounds_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(charts.time, "time", lambda: now[0])
+    store = ChartStore(retention=10, max_entries=2)
+
+    first = store.put({"columns": {}})
+    second = store.put({"columns": {}})
+    third = store.put({"columns": {}})
+    assert store.get(first) is None
+    assert store.get(second) is not None
+
+    now[0] += 11
+    assert store.get(third) is None
+
+
+def test_store_shares_payloads_through_directory(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(charts.time, "time", lambda: now[0])
+    writer = ChartStore(retention=10, directory=str(tmp_path))
+    token = writer.put({"columns": {"a": "AAAA"}, "length": 1})
+    os.utime(tmp_path / f"{token}.json", (now[0], now[0]))
+
+    other_worker = ChartStore(retention=10, directory=str(tmp_path))
+    assert other_worker.get(token) == {"columns": {"a": "AAAA"}, "length": 1}
+    assert other_worker.get("../" + token) is None
+
+    now[0] += 11
+    assert other_worker.get(token) is None
+
+
+def test_pipeline_ships_columns_instead_of_dicts(fake_inputs):
+    result = pipeline.run_optimization(TICKERS, period="1y")
+
+    montecarlo = result["montecarlo"]
+    assert "portfolios" not in montecarlo
+    assert montecarlo["columns"]["length"] == montecarlo["n_portfolios"]
+    decoded = decode_columns(montecarlo["columns"])
+    assert decoded["sharpe"].max() == pytest.approx(montecarlo["best_sharpe"]["sharpe"], rel=1e-5)
+
+
+def test_result_page_fetches_chart_columns(fake_inputs):
+    client = app_module.create_app().test_client()
+
+    page = client.post("/", data={"tickers": " ".join(TICKERS), "period": "1y"}).get_data(as_text=True)
+    url = re.search(r'"(/api/charts/[0-9a-f]+)"', page).group(1)
+
+    payload = client.get(url).get_json()
+    assert set(payload["columns"]) == {"volatility", "return", "sharpe"}
+
+    binary = client.get(url + "?format=binary")
+    assert binary.headers["X-Chart-Columns"] == "volatility,return,sharpe"
+    columns = np.frombuffer(binary.data, dtype="<f4").reshape(3, -1)
+    np.testing.assert_array_equal(columns[2], decode_columns(payload)["sharpe"])
+
+    assert client.get("/api/charts/unknown").status_code == 404
+
+    # Otro worker (otra app con su propia memoria) sirve el mismo token
+    other_worker = app_module.create_app().test_client()
+    assert other_worker.get(url).get_json() == payload
+
+
+def test_sanitizer_converts_numeric_arrays_natively():
+    converted = pipeline.sanitize_for_template({"x": np.arange(3, dtype=np.float32), "y": np.array(["a", "b"])})
+
+    assert converted == {"x": [0.0, 1.0, 2.0], "y": ["a", "b"]}
+    assert type(converted["x"][0]) is float
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from markowitz import capm
+from markowitz import model as model_module
+from markowitz.covariance import (
+    FactorCovariance,
+    estimate_covariance,
+    ewma_covariance,
+    ledoit_wolf_covariance,
+    market_betas,
+    single_index_covariance,
+)
+from markowitz.model import TRADING_DAYS_PER_YEAR, MarketModel
+from markowitz.montecarlo import run_monte_carlo
+from markowitz.optimizer import compute_efficient_frontier, optimize_portfolio
+
+
+def _returns(n_assets=6, n_days=250, seed=11):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2022-01-03", periods=n_days)
+    market = pd.Series(rng.normal(0.0004, 0.01, n_days), index=dates, name="^GSPC")
+    betas = rng.uniform(0.5, 1.5, n_assets)
+    values = market.to_numpy()[:, None] * betas + rng.normal(0, 0.008, (n_days, n_assets))
+    returns = pd.DataFrame(values, index=dates, columns=[f"A{i}" for i in range(n_assets)])
+    return returns, market
+
+
+def test_ledoit_wolf_matches_definition():
+    returns, _ = _returns()
+    x = returns.to_numpy() - returns.to_numpy().mean(axis=0)
+    n_obs, n_assets = x.shape
+    sample = x.T @ x / n_obs
+    target = np.trace(sample) / n_assets
+    distance = np.sum((sample - target * np.eye(n_assets)) ** 2) / n_assets
+    dispersion = sum(np.sum((np.outer(row, row) - sample) ** 2) for row in x) / n_obs ** 2 / n_assets
+    expected_shrinkage = min(dispersion / distance, 1.0)
+
+    cov, shrinkage = ledoit_wolf_covariance(returns)
+
+    assert shrinkage == pytest.approx(expected_shrinkage)
+    np.testing.assert_allclose(cov, (1 - shrinkage) * sample + shrinkage * target * np.eye(n_assets))
+
+
+def test_ledoit_wolf_is_well_conditioned_with_few_observations():
+    returns, _ = _returns(n_assets=40, n_days=45)
+
+    shrunk, shrinkage = ledoit_wolf_covariance(returns)
+
+    assert 0 < shrinkage <= 1
+    assert np.linalg.cond(shrunk) < np.linalg.cond(np.cov(returns.to_numpy(), rowvar=False))
+
+
+def test_ewma_weights_recent_observations():
+    returns, _ = _returns(n_assets=3, n_days=60)
+    values = returns.to_numpy()
+    weights = 0.9 ** np.arange(59, -1, -1)
+    weights /= weights.sum()
+    centered = values - weights @ values
+    expected = sum(w * np.outer(row, row) for w, row in zip(weights, centered))
+
+    np.testing.assert_allclose(ewma_covariance(returns, decay=0.9), expected)
+    with pytest.raises(ValueError):
+        ewma_covariance(returns, decay=1.0)
+
+
+def test_factor_covariance_products_match_dense():
+    rng = np.random.default_rng(0)
+    factor = FactorCovariance(rng.normal(size=(8, 2)), [[0.04, 0.01], [0.01, 0.02]], rng.uniform(0.01, 0.05, 8))
+    dense = factor.dense()
+    w = rng.dirichlet(np.ones(8))
+    W = rng.dirichlet(np.ones(8), size=5)
+
+    np.testing.assert_allclose(factor @ w, dense @ w)
+    np.testing.assert_allclose(w @ factor, w @ dense)
+    np.testing.assert_allclose(W @ factor, W @ dense)
+    np.testing.assert_allclose(factor.diagonal(), np.diag(dense))
+    np.testing.assert_allclose((factor * 252).dense(), dense * 252)
+
+
+def test_single_index_keeps_total_variances():
+    returns, market = _returns()
+
+    factor = single_index_covariance(returns, market)
+
+    np.testing.assert_allclose(factor.diagonal(), returns.var().to_numpy())
+    betas = returns.apply(lambda col: col.cov(market)) / market.var()
+    np.testing.assert_allclose(factor.loadings[:, 0], betas.to_numpy())
+    with pytest.raises(ValueError):
+        estimate_covariance(returns, "single_index")
+
+
+def test_single_index_model_shares_betas_with_capm(monkeypatch):
+    returns, market = _returns()
+    prices = 100 * (1 + returns).cumprod()
+    market_prices = 100 * (1 + market).cumprod()
+    calls = []
+    monkeypatch.setattr(model_module, "market_betas", lambda *args: calls.append(1) or market_betas(*args))
+
+    model = MarketModel.from_prices(prices, covariance="single_index", market_prices=market_prices)
+    betas = capm.calculate_betas(prices, market_prices, model=model)
+
+    assert len(calls) == 1
+    np.testing.assert_allclose(model.cov_factor.loadings[:, 0], betas.to_numpy())
+    np.testing.assert_allclose(betas, capm.calculate_betas(prices, market_prices).to_numpy())
+
+
+def test_engines_accept_estimators():
+    returns, market = _returns()
+    prices = 100 * (1 + returns).cumprod()
+    market_prices = 100 * (1 + market).cumprod()
+
+    for covariance in ("ledoit_wolf", "ewma"):
+        result = optimize_portfolio(prices, risk_free_rate=0.01, covariance=covariance)
+        assert np.isclose(result["weights"].sum(), 1.0)
+        frontier = compute_efficient_frontier(prices, n_points=10, covariance=covariance)
+        assert len(frontier["frontier_volatilities"]) == 10
+
+    model = MarketModel.from_prices(prices, covariance="single_index", market_prices=market_prices)
+    assert model.cov_factor is not None
+    assert "cov_annual" not in vars(model)  # la matriz densa no se formó
+
+    mc = run_monte_carlo(model=model, n_portfolios=200, as_dicts=False)
+    weights = np.random.default_rng(42).standard_exponential((200, model.n_assets))
+    weights /= weights.sum(axis=1, keepdims=True)
+    dense = model.cov_factor.dense()
+    np.testing.assert_allclose(mc["volatilities"], np.sqrt(np.einsum("ij,jk,ik->i", weights, dense, weights)))
+
+    result = optimize_portfolio(model=model, risk_free_rate=0.01)
+    assert np.isclose(result["weights"].sum(), 1.0)
+    np.testing.assert_allclose(model.cov_annual, model.cov_factor.dense())
+    assert model.individual_volatilities[0] == pytest.approx(np.sqrt(returns.iloc[1:, 0].var() * TRADING_DAYS_PER_YEAR))
+
+
+def test_unknown_estimator_raises():
+    returns, _ = _returns()
+    with pytest.raises(ValueError):
+        MarketModel(returns, covariance="nope")
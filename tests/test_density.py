@@ -0,0 +1,111 @@
+import json
+
+import numpy as np
+import pytest
+
+import app as app_module
+from markowitz import pipeline
+from markowitz.charts import decode_columns
+from markowitz.density import CloudDensity
+from markowitz.montecarlo import run_monte_carlo
+
+TICKERS = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+
+
+def test_grid_matches_brute_force_per_cell():
+    rng = np.random.default_rng(0)
+    vols, rets, sharpes = rng.uniform(0.1, 0.3, 2000), rng.normal(0.08, 0.02, 2000), rng.normal(size=2000)
+    density = CloudDensity(bins=(8, 6))
+    density.add(vols, rets, sharpes)
+
+    vol_edges = np.linspace(*density.vol_range, 9)
+    ret_edges = np.linspace(*density.return_range, 7)
+    counts, _, _ = np.histogram2d(vols, rets, bins=[vol_edges, ret_edges])
+    np.testing.assert_array_equal(density.counts.reshape(8, 6), counts)
+
+    cols = np.digitize(vols, vol_edges) - 1
+    rows = np.digitize(rets, ret_edges) - 1
+    cell = 3 * 6 + 2
+    assert density.max_sharpe[cell] == sharpes[(cols == 3) & (rows == 2)].max()
+
+    envelope_vols, envelope_rets = density.envelope()
+    for vol, ret in zip(envelope_vols, envelope_rets):
+        col = np.digitize(vol, vol_edges) - 1
+        assert ret == rets[cols == col].max()
+        assert vol in vols[rets == ret]
+
+
+def test_grid_does_not_depend_on_block_size():
+    rng = np.random.default_rng(1)
+    n = 30_000
+    vols, rets, sharpes = rng.gamma(4.0, 0.05, n), rng.normal(0.08, 0.03, n), rng.normal(size=n)
+    whole = CloudDensity(range_sample=10_000)
+    whole.add(vols, rets, sharpes)
+    # Bloques de ~4 000 filas, como los de montecarlo con 500 activos
+    blocks = CloudDensity(range_sample=10_000)
+    for start in range(0, n, 4_000):
+        blocks.add(vols[start:start + 4_000], rets[start:start + 4_000], sharpes[start:start + 4_000])
+
+    assert blocks.vol_range == whole.vol_range == whole._padded_range(vols[:10_000])
+    assert blocks.return_range == whole.return_range
+    np.testing.assert_array_equal(blocks.counts, whole.counts)
+    np.testing.assert_array_equal(blocks.max_sharpe, whole.max_sharpe)
+    low, high = whole.vol_range
+    outside = (vols < low) | (vols >= high)
+    low, high = whole.return_range
+    outside |= (rets < low) | (rets >= high)
+    assert blocks.clipped == whole.clipped == np.count_nonzero(outside) > 0
+    assert blocks.n_portfolios == n
+
+
+def test_streamed_run_matches_in_memory_run(make_prices):
+    prices = make_prices(columns=TICKERS)
+    full = run_monte_carlo(prices, n_portfolios=30_000, chunk_size=7000, as_dicts=False)
+    streamed = run_monte_carlo(prices, n_portfolios=30_000, chunk_size=7000, as_dicts=False,
+                               density=CloudDensity(), keep_points=False)
+
+    assert "volatilities" not in streamed
+    assert streamed["best_sharpe"] == full["best_sharpe"]
+    assert streamed["min_vol"] == full["min_vol"]
+    density = streamed["density"]
+    assert density.n_portfolios == density.counts.sum() == 30_000
+    assert density.max_sharpe.max() == pytest.approx(full["best_sharpe"]["sharpe"])
+
+    with pytest.raises(ValueError):
+        run_monte_carlo(prices, n_portfolios=10, keep_points=False)
+
+
+def test_payload_size_does_not_grow_with_portfolios(make_prices):
+    prices = make_prices(columns=TICKERS)
+    sizes = []
+    for n_portfolios in (5_000, 500_000):
+        density = run_monte_carlo(prices, n_portfolios=n_portfolios, as_dicts=False,
+                                  density=CloudDensity(), keep_points=False)["density"]
+        payload = density.to_dict()
+        sizes.append(len(json.dumps(payload)))
+        cells = decode_columns(payload["cells"])
+        assert cells["count"].sum() == n_portfolios
+        assert payload["max_count"] == cells["count"].max()
+
+    assert sizes[1] < 16_000
+    assert sizes[1] < 2 * sizes[0]
+
+
+def test_large_simulation_renders_density_only(make_prices, monkeypatch):
+    prices = make_prices(columns=TICKERS)
+    monkeypatch.setattr(pipeline, "MONTE_CARLO_PORTFOLIOS", 50_000)
+    monkeypatch.setattr(pipeline, "MONTE_CARLO_SCATTER_MAX", 10_000)
+    monkeypatch.setattr(pipeline, "fetch_market_inputs", lambda tickers, period: {
+        "prices": prices, "market_prices": prices.mean(axis=1).rename("^GSPC"),
+        "risk_free_rate": 0.03, "risk_free_rate_source": "cached",
+    })
+
+    result = pipeline.run_optimization(TICKERS, period="1y")
+    assert "columns" not in result["montecarlo"]
+    assert result["montecarlo"]["density"]["n_portfolios"] == 50_000
+
+    page = app_module.create_app().test_client().post("/", data={"tickers": " ".join(TICKERS), "period": "1y"})
+    html = page.get_data(as_text=True)
+    assert page.status_code == 200
+    assert "/api/charts/" not in html
+    assert "densityLayer" in html
@@ -0,0 +1,75 @@
+import time
+
+import pandas as pd
+import pytest
+
+from markowitz import capm, fetch
+
+
+def _series(name, rows=60):
+    dates = pd.date_range("2023-01-01", periods=rows, freq="D")
+    return pd.Series(range(1, rows + 1), index=dates, name=name, dtype=float)
+
+
+def test_fetch_market_inputs_runs_downloads_concurrently(monkeypatch):
+    def slow(value):
+        def inner(*args, **kwargs):
+            time.sleep(0.3)
+            return value
+        return inner
+
+    monkeypatch.setattr(fetch, "get_risk_free_rate_info", slow({"rate": 0.045, "source": "live"}))
+    monkeypatch.setattr(fetch, "get_price_data", slow(pd.DataFrame({"AAA": [1.0]})))
+    monkeypatch.setattr(fetch, "get_market_data", slow(_series("^GSPC")))
+
+    start = time.monotonic()
+    inputs = fetch.fetch_market_inputs(["AAA"], period="1y")
+    elapsed = time.monotonic() - start
+
+    assert inputs["risk_free_rate"] == 0.045
+    assert list(inputs["prices"].columns) == ["AAA"]
+    assert inputs["market_prices"].name == "^GSPC"
+    assert elapsed < 0.8
+
+
+def test_fetch_market_inputs_falls_back_on_slow_risk_free_rate(monkeypatch):
+    def slow_rate():
+        time.sleep(1.0)
+        return {"rate": 0.05, "source": "live"}
+
+    monkeypatch.setattr(fetch, "get_risk_free_rate_info", slow_rate)
+    monkeypatch.setattr(fetch, "get_price_data", lambda *a, **k: pd.DataFrame({"AAA": [1.0]}))
+    monkeypatch.setattr(fetch, "get_market_data", lambda *a, **k: _series("^GSPC"))
+
+    inputs = fetch.fetch_market_inputs(["AAA"], timeout=0.2)
+
+    assert inputs["risk_free_rate"] == fetch.FALLBACK_RISK_FREE_RATE
+    assert inputs["risk_free_rate_source"] == "fallback"
+
+
+def test_fetch_market_inputs_times_out_on_prices(monkeypatch):
+    monkeypatch.setattr(fetch, "get_risk_free_rate_info", lambda: {"rate": 0.04, "source": "live"})
+    monkeypatch.setattr(fetch, "get_price_data", lambda *a, **k: time.sleep(1.0))
+    monkeypatch.setattr(fetch, "get_market_data", lambda *a, **k: _series("^GSPC"))
+
+    with pytest.raises(ValueError, match="no respondió a tiempo"):
+        fetch.fetch_market_inputs(["AAA"], timeout=0.2)
+
+
+def test_market_candidates_downloaded_in_parallel_keep_preference(monkeypatch):
+    delays = {"^MXX": 0.3, "EWW": 0.3, "^GSPC": 0.3}
+
+    def fake_candidate(candidate, period, store):
+        time.sleep(delays[candidate])
+        if candidate == "^MXX":
+            raise ValueError("solo 1 filas")
+        return _series(candidate)
+
+    monkeypatch.setattr(capm, "_load_market_candidate", fake_candidate)
+
+    start = time.monotonic()
+    series = capm.get_market_data(period="1y", tickers=["WALMEX.MX", "GFNORTEO.MX"])
+    elapsed = time.monotonic() - start
+
+    assert series.name == "EWW"
+    assert elapsed < 0.6
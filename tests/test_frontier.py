@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from markowitz import frontier
+from markowitz.frontier import CriticalLineError, critical_line, efficient_frontier_weights
+from markowitz.model import MarketModel
+from markowitz.optimizer import compute_efficient_frontier
+
+
+def test_critical_line_goes_from_max_return_to_min_variance(make_prices):
+    model = MarketModel.from_prices(make_prices(6, 400))
+    mu = model.annual_mean_returns
+    points = critical_line(mu, model.cov_annual)
+
+    assert np.argmax(points[0]) == np.argmax(mu)
+    assert np.isclose(points[0].max(), 1.0)
+    for w in points:
+        assert np.isclose(w.sum(), 1.0)
+        assert np.all(w >= 0)
+
+    # El último punto es la mínima varianza global: ningún otro punto la mejora
+    variances = [w @ model.cov_annual @ w for w in points]
+    assert np.argmin(variances) == len(points) - 1
+
+
+def test_cla_frontier_matches_slsqp(make_prices):
+    prices = make_prices(6, 400)
+    cla = compute_efficient_frontier(prices, n_points=25, method="cla")
+    slsqp = compute_efficient_frontier(prices, n_points=25, method="slsqp")
+
+    assert cla["frontier_returns"] == pytest.approx(slsqp["frontier_returns"])
+    assert cla["frontier_volatilities"] == pytest.approx(slsqp["frontier_volatilities"], abs=1e-3)
+
+
+def test_frontier_weights_hit_target_returns(make_prices):
+    model = MarketModel.from_prices(make_prices(6, 400))
+    mu = model.annual_mean_returns
+    targets = np.linspace(mu.min(), mu.max(), 50)
+
+    weights = efficient_frontier_weights(mu, model.cov_annual, targets)
+
+    assert np.allclose(weights @ mu, targets)
+    assert np.allclose(weights.sum(axis=1), 1.0)
+
+
+def test_frontier_falls_back_to_slsqp_on_ties(make_prices):
+    prices = make_prices(n_days=400, columns=["T0", "T1", "T2"])
+    tied = pd.Series({"T0": 0.1, "T1": 0.1, "T2": 0.05})
+
+    with pytest.raises(CriticalLineError):
+        critical_line(tied.values, MarketModel.from_prices(prices).cov_annual)
+
+    frontier = compute_efficient_frontier(prices, n_points=5, expected_returns_annual=tied)
+    assert len(frontier["frontier_returns"]) > 0
+
+
+def test_frontier_returns_weights_on_request(make_prices):
+    frontier = compute_efficient_frontier(make_prices(6, 400), n_points=10, return_weights=True)
+
+    assert len(frontier["frontier_weights"]) == 10
+    assert all(np.isclose(sum(w), 1.0) for w in frontier["frontier_weights"])
+
+
+def test_incremental_inverse_matches_full_refactorization(make_prices, monkeypatch):
+    model = MarketModel.from_prices(make_prices(80, 600))
+    mu, cov = model.annual_mean_returns, model.cov_annual
+    incremental = critical_line(mu, cov)
+
+    monkeypatch.setattr(frontier._FreeSet, "refresh_every", 1)
+    full = critical_line(mu, cov)
+
+    assert len(incremental) == len(full) > 20
+    np.testing.assert_allclose(incremental, full, atol=1e-10)
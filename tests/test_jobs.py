@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from markowitz.jobs import JobManager, JobQueueFull
+
+
+def _wait_for(manager, job_id, status, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"El trabajo no llegó a {status}")
+
+
+def test_job_manager_runs_job_and_keeps_result():
+    manager = JobManager(max_workers=1)
+    job_id = manager.submit(lambda x: x * 2, 21)
+
+    job = _wait_for(manager, job_id, "done")
+
+    assert job["result"] == 42
+    assert job["error"] is None
+
+
+def test_job_manager_records_errors():
+    manager = JobManager(max_workers=1)
+
+    def failing():
+        raise ValueError("datos insuficientes")
+
+    job = _wait_for(manager, manager.submit(failing), "error")
+
+    assert job["error"] == "datos insuficientes"
+
+
+def test_job_manager_rejects_when_full():
+    release = threading.Event()
+    manager = JobManager(max_workers=1, max_pending=1)
+    manager.submit(release.wait)
+
+    with pytest.raises(JobQueueFull):
+        manager.submit(release.wait)
+    release.set()
+
+
+def test_job_manager_expires_finished_jobs():
+    manager = JobManager(max_workers=1, retention=0)
+    job_id = manager.submit(lambda: 1)
+    deadline = time.monotonic() + 2
+    while manager.get(job_id) is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert manager.get(job_id) is None
+
+
+def test_job_api_submit_and_poll(monkeypatch):
+    monkeypatch.setattr(app_module, "run_optimization", lambda tickers, period: {"tickers": tickers, "period": period})
+    client = app_module.create_app().test_client()
+
+    response = client.post("/api/jobs", json={"tickers": ["aaa", "bbb", "ccc", "ddd", "eee"], "period": "1y"})
+    assert response.status_code == 202
+    status_url = response.get_json()["status_url"]
+
+    deadline = time.monotonic() + 2
+    body = client.get(status_url).get_json()
+    while body["status"] != "done" and time.monotonic() < deadline:
+        time.sleep(0.01)
+        body = client.get(status_url).get_json()
+
+    assert body["result"] == {"tickers": ["AAA", "BBB", "CCC", "DDD", "EEE"], "period": "1y"}
+
+
+def test_job_api_validates_ticker_count():
+    client = app_module.create_app().test_client()
+
+    response = client.post("/api/jobs", json={"tickers": "AAA BBB"})
+
+    assert response.status_code == 400
+    assert "tickers" in response.get_json()["error"]
+
+
+def test_job_api_unknown_job():
+    client = app_module.create_app().test_client()
+
+    assert client.get("/api/jobs/nope").status_code == 404
+
+
+def test_submit_job_rejects_unknown_covariance_estimator():
+    client = app_module.create_app().test_client()
+
+    response = client.post("/api/jobs", json={"tickers": ["aaa", "bbb", "ccc", "ddd", "eee"], "covariance": "nope"})
+
+    assert response.status_code == 400
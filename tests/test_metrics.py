@@ -0,0 +1,72 @@
+import pytest
+
+import app as app_module
+from markowitz import metrics
+
+
+@pytest.fixture(autouse=True)
+def _clean_metrics():
+    metrics.reset()
+    metrics.set_enabled(True)
+    yield
+    metrics.reset()
+    metrics.set_enabled(True)
+
+
+def test_span_collects_request_spans_and_histogram():
+    token = metrics.start_request()
+    with metrics.span("optimize"):
+        pass
+    metrics.observe("optimize", 0.2)
+    spans = metrics.finish_request(token)
+
+    assert [name for name, _ in spans] == ["optimize", "optimize"]
+    header = metrics.server_timing_header(spans)
+    assert header.startswith("optimize;dur=")
+    assert "," not in header  # duraciones sumadas por etapa
+
+    text = metrics.render_prometheus()
+    assert 'markowitz_stage_duration_seconds_count{stage="optimize"} 2' in text
+    assert 'markowitz_stage_duration_seconds_bucket{stage="optimize",le="0.25"} 2' in text
+
+
+def test_counters_render_with_labels():
+    metrics.increment("markowitz_fallbacks_total", kind="risk_free_rate")
+    metrics.increment("markowitz_fallbacks_total", kind="risk_free_rate")
+
+    text = metrics.render_prometheus()
+
+    assert "# TYPE markowitz_fallbacks_total counter" in text
+    assert 'markowitz_fallbacks_total{kind="risk_free_rate"} 2' in text
+
+
+def test_disabled_metrics_record_nothing():
+    metrics.set_enabled(False)
+
+    assert metrics.start_request() is None
+    with metrics.span("fetch"):
+        pass
+    metrics.increment("markowitz_fallbacks_total", kind="x")
+
+    assert metrics.render_prometheus() == "\n"
+
+
+def test_server_timing_header_and_metrics_endpoint(monkeypatch):
+    def fake_optimization(tickers, period):
+        with metrics.span("optimize"):
+            pass
+        raise ValueError("sin datos")
+
+    monkeypatch.setattr(app_module, "run_optimization", fake_optimization)
+    monkeypatch.setattr(app_module, "get_risk_free_rate_info", lambda: {"rate": 0.04, "source": "fallback"})
+    client = app_module.create_app().test_client()
+
+    response = client.post("/", data={"tickers": "AAA BBB CCC DDD EEE", "period": "1y"})
+
+    timing = response.headers["Server-Timing"]
+    assert "optimize;dur=" in timing
+    assert "request;dur=" in timing
+
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'stage="optimize"' in body
+    assert 'stage="request"' in body
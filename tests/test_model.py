@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from markowitz.model import TRADING_DAYS_PER_YEAR, MarketModel
+from markowitz.montecarlo import run_monte_carlo
+from markowitz.optimizer import compute_efficient_frontier, optimize_portfolio
+
+
+def _sample_prices():
+    dates = pd.date_range("2020-01-01", periods=200, freq="D")
+    rng = np.random.default_rng(7)
+    return pd.DataFrame(
+        {
+            "AAA": 100 * np.cumprod(1 + rng.normal(0.0005, 0.01, 200)),
+            "BBB": 200 * np.cumprod(1 + rng.normal(0.0003, 0.015, 200)),
+            "CCC": 50 * np.cumprod(1 + rng.normal(0.0008, 0.012, 200)),
+        },
+        index=dates,
+    )
+
+
+def test_model_matches_pandas_statistics():
+    prices = _sample_prices()
+    returns = prices.pct_change().dropna()
+    model = MarketModel.from_prices(prices)
+
+    assert model.tickers == ["AAA", "BBB", "CCC"]
+    assert np.allclose(model.cov_daily, returns.cov().values)
+    assert np.allclose(model.annual_mean_returns, returns.mean().values * TRADING_DAYS_PER_YEAR)
+    assert np.allclose(model.cholesky @ model.cholesky.T, model.cov_annual)
+    assert np.allclose(model.individual_volatilities, returns.std().values * np.sqrt(TRADING_DAYS_PER_YEAR))
+
+
+def test_model_arrays_are_read_only():
+    model = MarketModel.from_prices(_sample_prices())
+
+    with pytest.raises(ValueError):
+        model.cov_annual[0, 0] = 1.0
+
+
+def test_expected_returns_aligns_series_by_ticker():
+    model = MarketModel.from_prices(_sample_prices())
+    capm = pd.Series({"CCC": 0.12, "AAA": 0.10, "BBB": 0.08})
+
+    assert list(model.expected_returns(capm)) == [0.10, 0.08, 0.12]
+
+
+def test_entry_points_accept_shared_model():
+    prices = _sample_prices()
+    model = MarketModel.from_prices(prices)
+
+    assert np.allclose(
+        optimize_portfolio(model=model, risk_free_rate=0.01)["weights"],
+        optimize_portfolio(prices, risk_free_rate=0.01)["weights"],
+    )
+    assert compute_efficient_frontier(model=model, n_points=5) == compute_efficient_frontier(prices, n_points=5)
+    assert run_monte_carlo(model=model, n_portfolios=50)["best_sharpe"] == \
+        run_monte_carlo(prices, n_portfolios=50)["best_sharpe"]
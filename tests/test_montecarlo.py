@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 
+from markowitz import montecarlo
 from markowitz.montecarlo import run_monte_carlo
 
 
@@ -87,3 +88,45 @@ def test_montecarlo_reproducible_with_seed():
     for p1, p2 in zip(r1["portfolios"], r2["portfolios"]):
         assert p1["volatility"] == p2["volatility"]
         assert p1["return"] == p2["return"]
+
+
+def test_montecarlo_returns_columnar_arrays():
+    prices = _sample_prices()
+    result = run_monte_carlo(prices, n_portfolios=300)
+
+    for key in ("volatilities", "returns", "sharpes"):
+        assert isinstance(result[key], np.ndarray)
+        assert result[key].shape == (300,)
+
+    vols = [p["volatility"] for p in result["portfolios"]]
+    assert np.allclose(result["volatilities"], vols)
+
+
+def test_montecarlo_chunking_does_not_change_results():
+    prices = _sample_prices()
+    full = run_monte_carlo(prices, n_portfolios=1000, seed=7)
+    chunked = run_monte_carlo(prices, n_portfolios=1000, seed=7, chunk_size=64)
+
+    assert np.allclose(full["returns"], chunked["returns"])
+    assert np.allclose(full["volatilities"], chunked["volatilities"])
+    assert full["best_sharpe"] == chunked["best_sharpe"]
+
+
+def test_montecarlo_default_chunk_follows_byte_budget(monkeypatch):
+    prices = _sample_prices()
+    full = run_monte_carlo(prices, n_portfolios=1000, seed=7)
+    # 64 portafolios por bloque con estos activos
+    monkeypatch.setattr(montecarlo, "DEFAULT_CHUNK_BYTES", 64 * 16 * prices.shape[1])
+    budgeted = run_monte_carlo(prices, n_portfolios=1000, seed=7)
+
+    assert np.allclose(full["returns"], budgeted["returns"])
+    assert full["best_sharpe"] == budgeted["best_sharpe"]
+
+
+def test_montecarlo_without_dict_view():
+    prices = _sample_prices()
+    result = run_monte_carlo(prices, n_portfolios=200, as_dicts=False)
+
+    assert "portfolios" not in result
+    assert result["best_sharpe"]["sharpe"] == float(result["sharpes"].max())
+    assert result["min_vol"]["volatility"] == float(result["volatilities"].min())
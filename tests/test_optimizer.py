@@ -20,3 +20,55 @@ def test_optimize_portfolio_weights_sum_to_one():
     assert np.isclose(result["weights"].sum(), 1.0)
     assert np.all(result["weights"] >= -1e-6)
     assert result["expected_return"] > 0
+
+
+def _random_problem(n_assets=5, seed=0):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(size=(n_assets, n_assets))
+    cov = factors @ factors.T / n_assets + np.eye(n_assets) * 0.01
+    mu = rng.uniform(0.02, 0.15, n_assets)
+    weights = rng.dirichlet(np.ones(n_assets))
+    return mu, cov, weights
+
+
+def test_neg_sharpe_gradient_matches_finite_differences():
+    from scipy.optimize import check_grad
+
+    from markowitz.optimizer import neg_sharpe_and_grad
+
+    mu, cov, weights = _random_problem()
+    error = check_grad(
+        lambda w: neg_sharpe_and_grad(w, mu, cov, 0.03)[0],
+        lambda w: neg_sharpe_and_grad(w, mu, cov, 0.03)[1],
+        weights,
+    )
+    assert error < 1e-6
+
+
+def test_variance_gradient_matches_finite_differences():
+    from scipy.optimize import check_grad
+
+    from markowitz.optimizer import portfolio_variance_and_grad
+
+    _, cov, weights = _random_problem(seed=1)
+    error = check_grad(
+        lambda w: portfolio_variance_and_grad(w, cov)[0],
+        lambda w: portfolio_variance_and_grad(w, cov)[1],
+        weights,
+    )
+    assert error < 1e-6
+
+
+def test_optimize_portfolio_same_result_without_gradients():
+    rng = np.random.default_rng(5)
+    dates = pd.date_range("2020-01-01", periods=300, freq="D")
+    data = pd.DataFrame(
+        100 * np.cumprod(1 + rng.normal(0.0005, 0.01, (300, 4)), axis=0),
+        columns=["AAA", "BBB", "CCC", "DDD"],
+        index=dates,
+    )
+
+    analytic = optimize_portfolio(data, risk_free_rate=0.02)
+    numeric = optimize_portfolio(data, risk_free_rate=0.02, use_gradients=False)
+
+    assert np.isclose(analytic["sharpe"], numeric["sharpe"], atol=1e-5)
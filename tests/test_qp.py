@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+import app as app_module
+from markowitz import tickers as ticker_limits
+from markowitz.model import MarketModel
+from markowitz.optimizer import optimize_portfolio
+from markowitz.qp import max_sharpe_weights, min_variance_weights
+from markowitz.tickers import TickerCountError, validate_tickers
+
+
+def _assert_kkt(cov, a, x, tol=1e-8):
+    """Multiplicadores no negativos en los activos con peso cero."""
+    free = x > 0
+    gradient = cov @ x
+    nu = np.mean(gradient[free] / a[free])
+    np.testing.assert_allclose(gradient[free], nu * a[free], rtol=1e-6, atol=1e-12)
+    assert np.all(gradient[~free] - nu * a[~free] >= -tol)
+
+
+def test_qp_solver_matches_slsqp(make_prices):
+    model = MarketModel.from_prices(make_prices(15, 500))
+
+    for objective in ("max_sharpe", "min_variance"):
+        slsqp = optimize_portfolio(model=model, risk_free_rate=0.02, objective=objective, solver="slsqp")
+        qp = optimize_portfolio(model=model, risk_free_rate=0.02, objective=objective, solver="qp")
+
+        assert set(qp) == set(slsqp)
+        assert list(qp["contrib_var"].index) == model.tickers
+        np.testing.assert_allclose(qp["weights"], slsqp["weights"], atol=1e-2)
+        if objective == "max_sharpe":
+            assert qp["sharpe"] >= slsqp["sharpe"] - 1e-8
+        else:
+            assert qp["volatility"] <= slsqp["volatility"] + 1e-8
+
+
+def test_qp_solver_large_universe_satisfies_optimality(make_prices):
+    model = MarketModel.from_prices(make_prices(400, 500))
+    cov = model.cov_annual
+
+    weights = min_variance_weights(cov)
+    assert weights.sum() == pytest.approx(1.0)
+    assert weights.min() >= 0
+    _assert_kkt(cov, np.ones(400), weights)
+
+    excess = model.annual_mean_returns - 0.02
+    sharpe_weights = max_sharpe_weights(model.annual_mean_returns, cov, 0.02)
+    _assert_kkt(cov, excess, sharpe_weights / (sharpe_weights @ excess))
+
+
+def test_max_sharpe_below_risk_free_rate_matches_slsqp(make_prices):
+    model = MarketModel.from_prices(make_prices(12, 500))
+    rate = float(model.annual_mean_returns.max()) + 0.05
+
+    qp = optimize_portfolio(model=model, risk_free_rate=rate, solver="qp")
+    slsqp = optimize_portfolio(model=model, risk_free_rate=rate, solver="slsqp")
+
+    assert qp["weights"].sum() == pytest.approx(1.0)
+    assert qp["sharpe"] >= slsqp["sharpe"] - 1e-6
+    assert np.count_nonzero(qp["weights"]) == 1
+
+
+def test_auto_solver_uses_qp_for_large_universes(make_prices, monkeypatch):
+    import markowitz.optimizer as optimizer
+
+    calls = []
+    monkeypatch.setattr(optimizer, "min_variance_weights", lambda cov: calls.append(cov) or np.full(len(cov), 1 / len(cov)))
+
+    optimizer.optimize_portfolio(model=MarketModel.from_prices(make_prices(optimizer.QP_MIN_ASSETS, 500)),
+                                 objective="min_variance")
+
+    assert len(calls) == 1
+
+
+def test_ticker_cap_is_configurable(monkeypatch):
+    tickers = [f"T{i}" for i in range(40)]
+    with pytest.raises(TickerCountError) as excinfo:
+        validate_tickers(tickers)
+    assert excinfo.value.code == "ticker_range"
+
+    monkeypatch.setattr(ticker_limits, "MAX_TICKERS", ticker_limits.MAX_TICKERS_LIMIT)
+    validate_tickers(tickers)
+
+
+def test_warm_start_returns_same_solution(make_prices):
+    model = MarketModel.from_prices(make_prices(40, 500))
+    mean, cov = model.annual_mean_returns, model.cov_annual
+
+    cold = max_sharpe_weights(mean, cov, 0.02)
+    np.testing.assert_allclose(max_sharpe_weights(mean, cov, 0.02, x0=cold), cold, atol=1e-10)
+    np.testing.assert_allclose(max_sharpe_weights(mean, cov, 0.02, x0=np.full(40, 1 / 40)), cold, atol=1e-8)
+    np.testing.assert_allclose(min_variance_weights(cov, x0=cold), min_variance_weights(cov), atol=1e-8)
+
+
+def test_form_uses_configured_ticker_limits(monkeypatch):
+    rate = {"rate": 0.04, "source": "cached"}
+    monkeypatch.setattr(app_module, "get_risk_free_rate_info", lambda: rate)
+    monkeypatch.setattr(app_module, "peek_risk_free_rate_info", lambda: rate)
+    monkeypatch.setattr(ticker_limits, "MAX_TICKERS", 40)
+    monkeypatch.setattr(app_module, "MAX_TICKERS", 40)
+    client = app_module.create_app().test_client()
+
+    page = client.get("/").get_data(as_text=True)
+    assert 'data-min-tickers="5" data-max-tickers="40"' in page
+    assert "de 5-40 tickers seleccionados" in page
+
+    page = client.post("/", data={"tickers": " ".join(f"T{i}" for i in range(41))}).get_data(as_text=True)
+    assert 'data-error-code="ticker_range"' in page
+    assert "Debes ingresar entre 5 y 40 tickers." in page
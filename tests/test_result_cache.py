@@ -0,0 +1,142 @@
+import os
+
+import pandas as pd
+import pytest
+
+import app as app_module
+from markowitz import metrics, pipeline
+from markowitz import risk_free_rate as rfr
+from markowitz.model import MarketModel
+from markowitz.result_cache import ResultCache, result_key
+from markowitz.store import get_default_store
+
+TICKERS = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+
+
+@pytest.fixture
+def downloads(make_prices, monkeypatch):
+    prices, market_prices = make_prices(columns=TICKERS, market=True)
+    state = {"prices": prices, "rate": 0.03, "built": 0}
+    monkeypatch.setattr(pipeline, "fetch_market_inputs", lambda tickers, period: {
+        "prices": state["prices"][tickers], "market_prices": market_prices,
+        "risk_free_rate": state["rate"], "risk_free_rate_source": "cached",
+    })
+    original = MarketModel.from_prices
+
+    def counting(*args, **kwargs):
+        state["built"] += 1
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(MarketModel, "from_prices", counting)
+    return state
+
+
+def test_key_normalizes_tickers_and_rounds_rate():
+    key = result_key(["aaa", "BBB ", "ccc"], "5y", 0.041234, pd.Timestamp("2026-06-30 16:00"))
+
+    assert key == result_key(["CCC", "AAA", "BBB"], "5y", 0.04118, "2026-06-30")
+    assert key != result_key(["AAA", "BBB", "CCC"], "5y", 0.0413, "2026-06-30")
+    assert key != result_key(["AAA", "BBB", "CCC"], "5y", 0.0412, "2026-07-01")
+    assert key != result_key(["AAA", "BBB", "CCC"], "5y", 0.0412, "2026-06-30", covariance="ewma")
+
+
+def test_memory_lru_is_bounded_by_bytes_and_returns_copies():
+    cache = ResultCache(max_bytes=2500)
+    for name in ("a", "b", "c"):
+        cache.put(name, {"payload": name * 1000})
+
+    assert cache.get("a") is None
+    first = cache.get("b")
+    first["payload"] = "changed"
+    assert cache.get("b") == {"payload": "b" * 1000}
+
+    cache.put("d", {"payload": "d" * 1000})
+    assert cache.get("c") is None
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= 2500
+    assert stats["hits"] == 2 and stats["misses"] == 2
+    assert stats["hit_rate"] == 0.5
+
+    cache.put("huge", {"payload": "x" * 5000})
+    assert cache.get("huge") is None
+
+
+def test_disk_tier_survives_restart_and_is_pruned(tmp_path):
+    directory = str(tmp_path / "results")
+    ResultCache(directory=directory).put("basket", {"sharpe": 1.2})
+
+    restarted = ResultCache(directory=directory)
+    assert restarted.get("basket") == {"sharpe": 1.2}
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.get("basket") == {"sharpe": 1.2}
+    assert restarted.stats()["hits"] == 1
+
+    small = ResultCache(directory=directory, disk_max_bytes=1500)
+    for i in range(5):
+        small.put(f"key-{i}", {"payload": "x" * 500})
+    assert sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) <= 1500
+
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), "wb") as fh:
+            fh.write(b"not a pickle")
+    assert ResultCache(directory=directory).get("key-4") is None
+
+
+def test_pipeline_serves_repeats_from_cache_until_new_data(downloads):
+    first = pipeline.run_optimization(TICKERS, period="1y")
+    again = pipeline.run_optimization(list(reversed(TICKERS)), period="1y")
+
+    assert downloads["built"] == 1
+    assert [row["ticker"] for row in again["rows"]] == list(reversed(TICKERS))
+    assert again["sharpe"] == first["sharpe"]
+    assert [a["ticker"] for a in again["frontier"]["individual_assets"]] == list(reversed(TICKERS))
+
+    downloads["rate"] = 0.03004
+    pipeline.run_optimization(TICKERS, period="1y")
+    assert downloads["built"] == 1
+
+    downloads["prices"] = downloads["prices"].iloc[:-1]
+    pipeline.run_optimization(TICKERS, period="1y")
+    pipeline.run_optimization(TICKERS, period="1y", views=[{"asset": "AAA", "return": 0.1}])
+    assert downloads["built"] == 3
+    assert pipeline.result_cache.stats()["hits"] == 2
+
+
+def test_repeat_with_fresh_store_skips_download(make_prices, downloads, monkeypatch):
+    prices, market_prices = make_prices(columns=TICKERS, market=True)
+    store = get_default_store()
+    for ticker in TICKERS:
+        store.save(ticker, prices[ticker], covered_from=None)
+    store.save("^GSPC", market_prices, covered_from=None)
+    monkeypatch.setattr(rfr, "_fetch_treasury_rate", lambda: downloads["rate"])
+    rfr.clear_risk_free_rate_cache()
+    rfr.get_risk_free_rate_info()
+
+    first = pipeline.run_optimization(TICKERS, period="1y")
+
+    def offline(*args, **kwargs):
+        raise AssertionError("un acierto no debe descargar")
+
+    monkeypatch.setattr(pipeline, "fetch_market_inputs", offline)
+    again = pipeline.run_optimization(TICKERS, period="1y")
+    rfr.clear_risk_free_rate_cache()
+
+    assert again["sharpe"] == first["sharpe"]
+    assert pipeline.result_cache.stats()["hits"] == 1
+    assert pipeline.result_cache.stats()["misses"] == 1
+
+
+def test_metrics_expose_hits_and_bytes(downloads):
+    metrics.reset()
+    client = app_module.create_app().test_client()
+    for _ in range(2):
+        assert client.post("/", data={"tickers": " ".join(TICKERS), "period": "1y"}).status_code == 200
+
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'markowitz_result_cache_requests_total{result="hit",tier="memory"} 1' in body
+    assert 'markowitz_result_cache_requests_total{result="miss"} 1' in body
+    assert "# TYPE markowitz_result_cache_bytes gauge" in body
+    assert f"markowitz_result_cache_bytes {pipeline.result_cache.stats()['bytes']}" in body
+    assert "markowitz_result_cache_entries 1" in body
+    assert "markowitz_result_cache_hit_ratio 0.5" in body
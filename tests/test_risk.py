@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import norm
+
+from markowitz import pipeline, risk
+from markowitz.model import TRADING_DAYS_PER_YEAR, MarketModel
+from markowitz.risk import historical_var, monte_carlo_var, parametric_var, value_at_risk
+
+
+@pytest.fixture
+def model(make_prices):
+    return MarketModel.from_prices(make_prices(5, 600))
+
+
+def test_parametric_var_matches_normal_formula(model):
+    weights = np.array([0.4, 0.3, 0.1, 0.1, 0.1])
+    mean = weights @ model.annual_mean_returns * 10 / TRADING_DAYS_PER_YEAR
+    vol = np.sqrt(weights @ model.cov_annual @ weights * 10 / TRADING_DAYS_PER_YEAR)
+
+    result = parametric_var(weights, model, confidence=0.99, horizon_days=10)
+
+    assert result["var"] == pytest.approx(-(mean + norm.ppf(0.01) * vol))
+    assert result["cvar"] == pytest.approx(-(mean - vol * norm.pdf(norm.ppf(0.99)) / 0.01))
+    assert result["cvar"] > result["var"] > 0
+
+
+def test_historical_var_uses_realized_portfolio_returns(model):
+    weights = np.full(5, 0.2)
+    realized = model.returns.to_numpy() @ weights
+
+    daily = historical_var(weights, model, confidence=0.95)
+    assert daily["var"] == pytest.approx(-np.quantile(realized, 0.05))
+    assert daily["cvar"] == pytest.approx(-realized[realized <= np.quantile(realized, 0.05)].mean())
+
+    weekly = historical_var(weights, model, confidence=0.95, horizon_days=5)
+    sums = pd.Series(realized).rolling(5).sum().dropna().to_numpy()
+    assert weekly["var"] == pytest.approx(-np.quantile(sums, 0.05))
+
+
+def test_monte_carlo_var_converges_to_parametric(model):
+    weights = np.array([0.2, 0.3, 0.1, 0.25, 0.15])
+
+    simulated = monte_carlo_var(weights, model, confidence=0.99, n_scenarios=2_000_000, chunk_size=100_000)
+    exact = parametric_var(weights, model, confidence=0.99)
+
+    assert simulated["var"] == pytest.approx(exact["var"], rel=1e-2)
+    assert simulated["cvar"] == pytest.approx(exact["cvar"], rel=1e-2)
+
+
+def test_monte_carlo_evaluates_many_weight_vectors_at_once(model):
+    rng = np.random.default_rng(0)
+    weights = rng.dirichlet(np.ones(5), size=20)
+
+    together = monte_carlo_var(weights, model, n_scenarios=30_000, chunk_size=7_000)
+
+    assert together["var"].shape == (20,)
+    for i in (0, 7, 19):
+        alone = monte_carlo_var(weights[i], model, n_scenarios=30_000, chunk_size=7_000)
+        assert together["var"][i] == pytest.approx(alone["var"], rel=1e-12)
+        assert together["cvar"][i] == pytest.approx(alone["cvar"], rel=1e-12)
+
+
+def test_monte_carlo_chunk_follows_byte_budget(model, monkeypatch):
+    weights = np.full(5, 0.2)
+    explicit = monte_carlo_var(weights, model, n_scenarios=30_000, chunk_size=7_000)
+    monkeypatch.setattr(risk, "DEFAULT_CHUNK_BYTES", 7_000 * 8 * (model.n_assets + 1))
+
+    assert monte_carlo_var(weights, model, n_scenarios=30_000) == explicit
+
+
+def test_value_at_risk_validates_inputs(model):
+    with pytest.raises(ValueError):
+        value_at_risk(np.full(5, 0.2), model=model, confidence=0.3)
+    with pytest.raises(ValueError):
+        value_at_risk(np.full(5, 0.2), model=model, methods=("garch",))
+    with pytest.raises(ValueError):
+        value_at_risk(np.full(4, 0.25), model=model)
+
+
+def test_pipeline_reports_var_of_optimal_portfolio(make_prices, monkeypatch):
+    prices = make_prices(6, 600)
+    market = pd.Series(100 * np.cumprod(1 + prices.pct_change().fillna(0).mean(axis=1)), name="^GSPC")
+    monkeypatch.setattr(pipeline, "fetch_market_inputs", lambda tickers, period: {
+        "prices": prices,
+        "market_prices": market,
+        "risk_free_rate": 0.03,
+        "risk_free_rate_source": "cached",
+    })
+
+    result = pipeline.run_optimization(list(prices.columns), period="2y")
+
+    risk = result["risk"]
+    assert risk["confidence"] == pipeline.RISK_CONFIDENCE
+    for method in ("parametric", "historical", "monte_carlo"):
+        assert isinstance(risk[method]["var"], float)
+        assert 0 < risk[method]["var"] < risk[method]["cvar"]
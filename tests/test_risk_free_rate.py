@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from markowitz import risk_free_rate as rfr
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+    rfr.clear_risk_free_rate_cache()
+    yield
+    rfr.clear_risk_free_rate_cache()
+
+
+def test_first_call_is_live_then_cached(monkeypatch):
+    calls = []
+    monkeypatch.setattr(rfr, "_fetch_treasury_rate", lambda: calls.append(1) or 0.045)
+
+    first = rfr.get_risk_free_rate_info()
+    second = rfr.get_risk_free_rate_info()
+
+    assert first["rate"] == 0.045 and first["source"] == "live"
+    assert second["rate"] == 0.045 and second["source"] == "cached"
+    assert len(calls) == 1
+    assert rfr.get_10year_treasury_rate() == 0.045
+
+
+def test_fallback_when_yahoo_fails(monkeypatch):
+    def failing():
+        raise ConnectionError("sin red")
+
+    monkeypatch.setattr(rfr, "_fetch_treasury_rate", failing)
+
+    info = rfr.get_risk_free_rate_info()
+
+    assert info["rate"] == rfr.FALLBACK_RISK_FREE_RATE
+    assert info["source"] == "fallback"
+
+
+def test_stale_value_served_while_refreshing_in_background(monkeypatch):
+    monkeypatch.setattr(rfr, "_fetch_treasury_rate", lambda: 0.04)
+    rfr.get_risk_free_rate_info()
+
+    release = threading.Event()
+
+    def slow_fetch():
+        release.wait(2)
+        return 0.05
+
+    monkeypatch.setattr(rfr, "_fetch_treasury_rate", slow_fetch)
+
+    start = time.monotonic()
+    stale = rfr.get_risk_free_rate_info(ttl=0)
+    assert time.monotonic() - start < 0.5
+    assert stale["rate"] == 0.04 and stale["source"] == "cached"
+
+    release.set()
+    for _ in range(100):
+        if rfr.get_risk_free_rate_info(ttl=60)["rate"] == 0.05:
+            break
+        time.sleep(0.01)
+    assert rfr.get_risk_free_rate_info(ttl=60)["rate"] == 0.05
+
+
+def test_failed_refresh_keeps_last_good_value(monkeypatch):
+    monkeypatch.setattr(rfr, "_fetch_treasury_rate", lambda: 0.043)
+    rfr.get_risk_free_rate_info()
+
+    def failing():
+        raise ConnectionError("sin red")
+
+    monkeypatch.setattr(rfr, "_fetch_treasury_rate", failing)
+    rfr._refresh()
+
+    info = rfr.get_risk_free_rate_info(ttl=60)
+    assert info["rate"] == 0.043 and info["source"] == "cached"
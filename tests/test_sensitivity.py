@@ -0,0 +1,134 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as app_module
+from markowitz import fetch, sensitivity
+from markowitz.capm import calculate_betas, calculate_capm_returns
+from markowitz.model import MarketModel
+from markowitz.optimizer import optimize_portfolio
+
+TICKERS = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+
+
+@pytest.fixture
+def fake_downloads(monkeypatch):
+    rng = np.random.default_rng(8)
+    n_days = 1400
+    dates = pd.bdate_range(end="2026-06-30", periods=n_days)
+    market = rng.normal(0.0005, 0.01, n_days)
+    returns = market[:, None] * rng.uniform(0.6, 1.4, len(TICKERS)) + rng.normal(0.0002, 0.01, (n_days, len(TICKERS)))
+    prices = pd.DataFrame(100 * np.cumprod(1 + returns, axis=0), index=dates, columns=TICKERS)
+    market_prices = pd.Series(100 * np.cumprod(1 + market), index=dates, name="^GSPC")
+    periods = []
+
+    def fake_panel(tickers, period="5y"):
+        periods.append(period)
+        return prices[tickers]
+
+    monkeypatch.setattr(fetch, "get_price_panel", fake_panel)
+    monkeypatch.setattr(fetch, "get_market_data", lambda **kwargs: market_prices)
+    monkeypatch.setattr(fetch, "get_risk_free_rate_info", lambda: {"rate": 0.03, "source": "cached"})
+    return prices, market_prices, periods
+
+
+def test_sweep_downloads_longest_period_once_and_fills_cube(fake_downloads):
+    prices, _, periods = fake_downloads
+
+    result = sensitivity.run_sensitivity(TICKERS, periods=["1y", "5y", "3y"],
+                                         risk_free_rates=[0.04, 0.0, 0.02], max_workers=1)
+
+    assert periods == ["5y"]
+    assert result["weights"].shape == (3, 2, 3, 5)
+    assert result["frontier_volatilities"].shape == (3, 2, 3, sensitivity.SENSITIVITY_FRONTIER_POINTS)
+    np.testing.assert_array_equal(result["risk_free_rates"], [0.0, 0.02, 0.04])
+    np.testing.assert_allclose(result["weights"].sum(axis=-1), 1.0)
+    assert not result["errors"]
+    assert result["observations"]["1y"] < result["observations"]["3y"] < result["observations"]["5y"]
+    # Con medias históricas la frontera no cambia con la tasa
+    historical = result["frontier_volatilities"][:, 1]
+    np.testing.assert_allclose(historical, historical[:, :1].repeat(3, axis=1))
+
+
+def test_sweep_points_match_single_optimizations(fake_downloads):
+    prices, market_prices, _ = fake_downloads
+    result = sensitivity.run_sensitivity(TICKERS, periods=["2y"], risk_free_rates=[0.01, 0.03, 0.05],
+                                         max_workers=1)
+
+    start = sensitivity.period_start("2y", today=prices.index[-1])
+    window = prices.loc[start:]
+    model = MarketModel.from_prices(window)
+    betas = calculate_betas(window, market_prices.loc[start:], model=model)
+    market_return = float(market_prices.loc[start:].pct_change().dropna().mean() * 252)
+    for r, rate in enumerate(result["risk_free_rates"]):
+        capm = optimize_portfolio(model=model, risk_free_rate=rate,
+                                  expected_returns_annual=calculate_capm_returns(betas, rate, market_return))
+        historical = optimize_portfolio(model=model, risk_free_rate=rate)
+        np.testing.assert_allclose(result["weights"][0, 0, r], capm["weights"], atol=1e-4)
+        np.testing.assert_allclose(result["weights"][0, 1, r], historical["weights"], atol=1e-4)
+        assert result["sharpe"][0, 1, r] == pytest.approx(historical["sharpe"], rel=1e-5)
+
+
+def test_process_pool_matches_serial_run(fake_downloads):
+    kwargs = dict(periods=["1y", "2y"], risk_free_rates=[0.02, 0.04], return_models=["historical"])
+
+    serial = sensitivity.run_sensitivity(TICKERS, max_workers=1, **kwargs)
+    parallel = sensitivity.run_sensitivity(TICKERS, max_workers=2, **kwargs)
+
+    np.testing.assert_allclose(parallel["weights"], serial["weights"])
+    np.testing.assert_allclose(parallel["frontier_returns"], serial["frontier_returns"])
+
+    # El pool se crea una vez, sin fork, y lo reusa el siguiente barrido
+    pool = sensitivity._pools[2]
+    assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+    sensitivity.run_sensitivity(TICKERS, max_workers=2, **kwargs)
+    assert sensitivity._pools[2] is pool
+
+
+def test_failing_period_is_recorded_and_others_are_kept(fake_downloads, monkeypatch):
+    sweep_period = sensitivity.sweep_period
+
+    def singular_on_short_window(prices, *args):
+        if len(prices) < 400:
+            raise np.linalg.LinAlgError("Singular matrix")
+        return sweep_period(prices, *args)
+
+    monkeypatch.setattr(sensitivity, "sweep_period", singular_on_short_window)
+    result = sensitivity.run_sensitivity(TICKERS, periods=["1y", "3y"], risk_free_rates=[0.02],
+                                         return_models=["historical"], max_workers=1)
+
+    assert result["errors"] == {"1y": "Singular matrix"}
+    assert np.isnan(result["weights"][0]).all()
+    np.testing.assert_allclose(result["weights"][1].sum(axis=-1), 1.0)
+
+
+def test_sweep_as_lists_is_json_ready_and_grid_is_validated(fake_downloads):
+    result = sensitivity.run_sensitivity(TICKERS, periods=["1y", "10y"], risk_free_rates=[0.03],
+                                         max_workers=1, as_lists=True)
+
+    assert result["errors"] == {}
+    json.dumps(result)
+    assert result["weights"][1][0][0][0] is not None
+
+    with pytest.raises(ValueError):
+        sensitivity.validate_sweep(["1y"], return_models=["garch"])
+    with pytest.raises(ValueError):
+        sensitivity.validate_sweep(["max"])
+    with pytest.raises(ValueError):
+        sensitivity.validate_sweep(["1y"], risk_free_rates=["x"])
+
+
+def test_sensitivity_endpoint(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module, "run_sensitivity", lambda tickers, **kwargs: calls.append(kwargs) or {})
+    client = app_module.create_app().test_client()
+
+    response = client.post("/api/sensitivity", json={"tickers": "aaa bbb ccc ddd eee", "periods": ["1y", "5y"],
+                                                      "risk_free_rates": [0.02, 0.04]})
+    assert response.status_code == 202
+
+    assert client.post("/api/sensitivity", json={"tickers": TICKERS, "periods": "1y"}).status_code == 400
+    assert client.post("/api/sensitivity", json={"tickers": TICKERS, "return_models": ["x"]}).status_code == 400
+    assert client.post("/api/sensitivity", json={"tickers": ["AAA"]}).status_code == 400
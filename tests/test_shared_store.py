@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from markowitz import store as store_module
+from markowitz.data import load_through_store
+from markowitz.store import DEFAULT_FIELD, RETURNS_FIELD, PriceStore, SharedPriceStore, get_default_store
+
+
+def _series(values, start="2024-01-01", name="AAA"):
+    dates = pd.bdate_range(start, periods=len(values))
+    return pd.Series(values, index=dates, name=name, dtype=float)
+
+
+def _write_many(root, offset):
+    shared = SharedPriceStore(root)
+    for i in range(5):
+        shared.save(f"T{offset}{i}", _series(np.arange(1.0, 21.0) + offset))
+
+
+def test_roundtrip_and_meta(tmp_path):
+    shared = SharedPriceStore(str(tmp_path))
+    series = _series([1.0, 2.0, 3.0, 4.0], name="^GSPC")
+
+    shared.save("^GSPC", series, covered_from=pd.Timestamp("2023-12-01"))
+    loaded = shared.load("^GSPC")
+
+    assert np.allclose(loaded.values, series.values)
+    assert list(loaded.index) == list(series.index)
+    assert shared.meta("^GSPC")["rows"] == 4
+    assert shared.needs_backfill("^GSPC", pd.Timestamp("2020-01-01"))
+    assert shared.is_fresh("^GSPC")
+    assert shared.load("MISSING") is None and shared.meta("MISSING") == {}
+
+
+def test_other_instances_see_writes(tmp_path):
+    writer = SharedPriceStore(str(tmp_path))
+    writer.save("AAA", _series([1.0, 2.0]))
+    reader = SharedPriceStore(str(tmp_path))   # arranque en caliente
+    assert list(reader.load("AAA").values) == [1.0, 2.0]
+
+    # Columnas nuevas agrandan el archivo: el lector vuelve a mapearlo
+    for i in range(3):
+        writer.save(f"N{i}", _series([5.0, 6.0, float(i)]))
+    assert list(reader.load("N2").values) == [5.0, 6.0, 2.0]
+    assert list(reader.load("AAA").values) == [1.0, 2.0]
+
+
+def test_append_in_place_and_rewrite_to_new_column(tmp_path, monkeypatch):
+    shared = SharedPriceStore(str(tmp_path))
+    shared.save("AAA", _series([1.0, 2.0, 3.0]))
+    column = shared._read_index()["tickers"]["AAA"][DEFAULT_FIELD]["column"]
+
+    shared.save("AAA", _series([1.0, 2.0, 3.0, 4.0, 5.0]))
+    entry = shared._read_index()["tickers"]["AAA"][DEFAULT_FIELD]
+    assert entry["column"] == column
+    assert list(shared.load("AAA").values) == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+    # Un reajuste cambia datos ya publicados: va a otra columna
+    shared.save("AAA", _series([0.5, 1.0, 1.5, 2.0, 2.5, 3.0]))
+    assert shared._read_index()["tickers"]["AAA"][DEFAULT_FIELD]["column"] != column
+    assert list(shared.load("AAA").values) == [0.5, 1.0, 1.5, 2.0, 2.5, 3.0]
+
+    # La columna liberada se reutiliza (limpia) recién pasado el plazo
+    monkeypatch.setattr(store_module, "SHARED_REUSE_AFTER", 0)
+    shared.save("BBB", _series([7.0], start="2024-01-02"))
+    assert shared._read_index()["tickers"]["BBB"][DEFAULT_FIELD]["column"] == column
+    assert list(shared.load("BBB").values) == [7.0]
+    assert os.path.getsize(shared._data_path(DEFAULT_FIELD)) == 2 * store_module.SHARED_ROWS * 8
+
+
+def test_load_is_a_view_with_nan_gaps_and_returns_are_stored(tmp_path):
+    shared = SharedPriceStore(str(tmp_path))
+    series = _series([10.0, 11.0, 12.1, 12.1, 13.31])
+    shared.save("AAA", series.drop(series.index[2]))   # un feriado a mitad de semana
+
+    loaded = shared.load("AAA")
+    column = shared._maps[DEFAULT_FIELD]
+    assert np.shares_memory(loaded.to_numpy(), column)
+    assert list(loaded.index) == list(series.index)
+    assert np.isnan(loaded.iloc[2])
+    assert list(loaded.dropna().values) == [10.0, 11.0, 12.1, 13.31]
+
+    returns = shared.load_returns("AAA")
+    expected = PriceStore(str(tmp_path / "files"))
+    expected.save("AAA", series.drop(series.index[2]))
+    np.testing.assert_allclose(returns.dropna().values, expected.load_returns("AAA").dropna().values)
+    assert np.isnan(returns.iloc[0]) and np.isnan(returns.iloc[2])
+
+    # Agregar días extiende precios y retornos en su misma columna
+    entry = shared._read_index()["tickers"]["AAA"]
+    shared.save("AAA", pd.concat([series.drop(series.index[2]), _series([14.641], start="2024-01-08")]))
+    after = shared._read_index()["tickers"]["AAA"]
+    assert after[DEFAULT_FIELD]["column"] == entry[DEFAULT_FIELD]["column"]
+    assert after[RETURNS_FIELD]["column"] == entry[RETURNS_FIELD]["column"]
+    assert shared.load_returns("AAA").iloc[-1] == pytest.approx(0.1)
+
+
+def test_weekend_quotes_are_dropped(tmp_path, capsys):
+    shared = SharedPriceStore(str(tmp_path))
+    dates = pd.DatetimeIndex(["2024-01-05", "2024-01-06", "2024-01-08"])
+    shared.save("BTC", pd.Series([1.0, 2.0, 3.0], index=dates))
+
+    assert list(shared.load("BTC").values) == [1.0, 3.0]
+    assert "fin de semana" in capsys.readouterr().out
+
+
+def test_load_through_store_with_shared_store(tmp_path):
+    shared = SharedPriceStore(str(tmp_path), max_age=timedelta(0))
+    calls = []
+    start = datetime.now() - timedelta(days=10)
+
+    def fetch(tickers, **kwargs):
+        calls.append(kwargs)
+        if "period" in kwargs:
+            return pd.DataFrame({t: _series([1.0, 2.0, 3.0], start=start) for t in tickers})
+        return pd.DataFrame({t: _series([3.0, 4.0], start=start + timedelta(days=2)) for t in tickers})
+
+    load_through_store(shared, ["AAA", "BBB"], "1y", fetch)
+    second = load_through_store(shared, ["AAA", "BBB"], "1y", fetch)
+
+    assert "period" in calls[0] and "start" in calls[1]
+    assert list(second["AAA"].values) == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_concurrent_writers_from_several_processes(tmp_path):
+    root = str(tmp_path)
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_write_many, args=(root, offset)) for offset in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    shared = SharedPriceStore(root)
+    columns = set()
+    for offset in range(4):
+        for i in range(5):
+            assert list(shared.load(f"T{offset}{i}").values) == list(np.arange(1.0, 21.0) + offset)
+            columns.add(shared._read_index()["tickers"][f"T{offset}{i}"][DEFAULT_FIELD]["column"])
+    assert len(columns) == 20
+
+
+def test_default_store_backend(monkeypatch, tmp_path):
+    monkeypatch.setenv("PRICE_STORE_DIR", str(tmp_path))
+    assert type(get_default_store()) is PriceStore
+
+    monkeypatch.setenv("PRICE_STORE_BACKEND", "shared")
+    shared = get_default_store()
+    assert isinstance(shared, SharedPriceStore)
+    assert get_default_store() is shared
+
+    monkeypatch.setattr(store_module, "fcntl", None)
+    assert type(get_default_store()) is PriceStore
+
+
+def test_dates_outside_calendar_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        SharedPriceStore(str(tmp_path)).save("OLD", _series([1.0], start="1960-01-04"))
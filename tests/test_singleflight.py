@@ -0,0 +1,151 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import yfinance as yf
+
+from markowitz import data, metrics, pipeline
+from markowitz.singleflight import SingleFlight, coalesced
+
+TICKERS = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+
+
+def _run_concurrently(group, n_callers, call):
+    """Lanza n_callers hilos y suelta al primero cuando todos los demás ya esperan."""
+    results, errors = [None] * n_callers, [None] * n_callers
+
+    def worker(i):
+        try:
+            results[i] = call()
+        except Exception as exc:  # noqa: BLE001
+            errors[i] = exc
+
+    before = group.stats()["coalesced"]
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_callers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while group.stats()["coalesced"] - before < n_callers - 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return threads, results, errors
+
+
+def test_concurrent_identical_calls_run_once():
+    release = threading.Event()
+    calls = []
+
+    @coalesced("test")
+    def slow(x, scale=1):
+        calls.append(x)
+        release.wait(5)
+        return x * scale
+
+    threads, results, errors = _run_concurrently(slow.singleflight, 5, lambda: slow(3, scale=2))
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [3]
+    assert results == [6] * 5 and errors == [None] * 5
+    assert slow.singleflight.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+    # Terminada la llamada no queda nada guardado; otra clave tampoco se comparte
+    assert slow(3, scale=2) == 6 and slow(3) == 3
+    assert calls == [3, 3, 3]
+
+
+def test_errors_reach_every_waiting_caller():
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ValueError("sin datos")
+
+    group = SingleFlight("test")
+    threads, _, errors = _run_concurrently(group, 3, lambda: group.do("key", failing))
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert group.stats()["in_flight"] == 0
+
+
+def test_share_gives_each_caller_its_own_copy():
+    release = threading.Event()
+
+    def build():
+        release.wait(5)
+        return {"rows": [1, 2, 3]}
+
+    group = SingleFlight("test", share=lambda value: {"rows": list(value["rows"])})
+    threads, results, _ = _run_concurrently(group, 3, lambda: group.do("key", build))
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    results[0]["rows"].clear()
+    assert results[1] == results[2] == {"rows": [1, 2, 3]}
+    assert results[1] is not results[2]
+
+
+def test_concurrent_price_requests_share_one_download(monkeypatch):
+    dates = pd.bdate_range("2024-01-01", periods=30)
+    frame = pd.concat(
+        [pd.DataFrame({"Adj Close": np.linspace(10, 20, 30)}, index=dates),
+         pd.DataFrame({"Adj Close": np.linspace(20, 30, 30)}, index=dates)],
+        axis=1, keys=["AAA", "BBB"],
+    )
+    release = threading.Event()
+    downloads = []
+
+    def fake_download(*args, **kwargs):
+        downloads.append(args)
+        release.wait(5)
+        return frame
+
+    monkeypatch.setattr(yf, "download", fake_download)
+    metrics.reset()
+
+    threads, results, errors = _run_concurrently(
+        data.get_price_panel.singleflight, 4,
+        lambda: data.get_price_data(["AAA", "BBB"], period="1y", use_store=False),
+    )
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(downloads) == 1
+    assert errors == [None] * 4
+    assert len({id(result) for result in results}) == 4
+    assert 'markowitz_coalesced_calls_total{operation="price_panel"} 3' in metrics.render_prometheus()
+
+
+def test_concurrent_optimizations_run_pipeline_once(monkeypatch):
+    rng = np.random.default_rng(2)
+    dates = pd.bdate_range("2022-01-03", periods=300)
+    prices = pd.DataFrame(100 * np.cumprod(1 + rng.normal(0.0004, 0.01, (300, 5)), axis=0),
+                          index=dates, columns=TICKERS)
+    release = threading.Event()
+    fetches = []
+
+    def fake_fetch(tickers, period):
+        fetches.append(period)
+        release.wait(5)
+        return {"prices": prices, "market_prices": prices.mean(axis=1).rename("^GSPC"),
+                "risk_free_rate": 0.03, "risk_free_rate_source": "cached"}
+
+    monkeypatch.setattr(pipeline, "fetch_market_inputs", fake_fetch)
+
+    threads, results, _ = _run_concurrently(pipeline.run_optimization.singleflight, 3,
+                                            lambda: pipeline.run_optimization(TICKERS, period="1y"))
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert fetches == ["1y"]
+    results[0]["montecarlo"].pop("columns")
+    assert "columns" in results[1]["montecarlo"] and "columns" in results[2]["montecarlo"]
+    assert results[1]["sharpe"] == pytest.approx(results[0]["sharpe"])
@@ -0,0 +1,124 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import yfinance as yf
+
+from markowitz import capm, data, pipeline, risk_free_rate, sources
+from markowitz.sources import PriceSource, RecordingSource, ReplaySource, extract_field, write_panel
+
+TICKERS = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+
+
+@pytest.fixture
+def no_network(monkeypatch):
+    def offline(*args, **kwargs):
+        raise AssertionError("no debería usar la red")
+
+    monkeypatch.setattr(yf, "download", offline)
+    yield
+    sources.set_source(None)
+
+
+class FakeSource(PriceSource):
+    def __init__(self, panel):
+        self.panel = panel
+        self.calls = []
+
+    def history(self, tickers, field="Adj Close", interval="1d", period=None, start=None):
+        self.calls.append((tuple(tickers), field, period, start))
+        data = self.panel[[t for t in tickers if t in self.panel.columns]]
+        return data.loc[data.index >= pd.Timestamp(start)] if start is not None else data
+
+
+def test_extract_field_handles_yahoo_layouts(capsys):
+    dates = pd.date_range("2024-01-01", periods=3)
+    by_ticker = pd.concat([pd.DataFrame({"Adj Close": [1.0, 2, 3], "Close": [9.0, 9, 9]}, index=dates),
+                           pd.DataFrame({"Adj Close": [4.0, 5, 6], "Close": [9.0, 9, 9]}, index=dates)],
+                          axis=1, keys=["AAA", "BBB"])
+    assert extract_field(by_ticker, ["AAA", "BBB"])["BBB"].tolist() == [4.0, 5.0, 6.0]
+    by_price = by_ticker.swaplevel(axis=1)
+    assert extract_field(by_price, ["AAA", "BBB"], field="Close")["AAA"].tolist() == [9.0, 9.0, 9.0]
+
+    flat = pd.DataFrame({"Close": [7.0, 8.0, 9.0]}, index=dates)
+    assert list(extract_field(flat, ["^GSPC"]).columns) == ["^GSPC"]
+    assert "Warning" in capsys.readouterr().out
+    with pytest.raises(ValueError):
+        extract_field(flat.rename(columns={"Close": "Volume"}), ["^GSPC"])
+
+
+def test_record_then_replay(make_prices, tmp_path):
+    panel = make_prices(n_days=400, columns=["AAA", "BBB"], end="2024-06-28")
+    recorder = RecordingSource(str(tmp_path), source=FakeSource(panel))
+
+    recorder.history(["AAA"], period="max")
+    recorder.history(["AAA", "BBB", "ZZZ"], start="2024-06-01")
+    replay = ReplaySource(str(tmp_path), latency=0.05)
+
+    start = time.monotonic()
+    year = replay.history(["BBB", "AAA", "ZZZ"], period="1y")
+    assert time.monotonic() - start >= 0.05
+
+    # Los periodos se cuentan desde la última fecha grabada
+    assert list(year.columns) == ["BBB", "AAA"]
+    assert year.index[0] >= pd.Timestamp("2023-06-28") and year.index[-1] == pd.Timestamp("2024-06-28")
+    assert np.allclose(year["AAA"], panel["AAA"].loc[year.index])
+    assert year["BBB"].notna().sum() == len(panel.loc["2024-06-01":])
+    assert replay.history(["AAA"], start="2024-06-27")["AAA"].tolist() == panel["AAA"].iloc[-2:].tolist()
+    assert replay.history(["ZZZ"], period="1y").empty
+
+
+def test_parquet_panels(make_prices, tmp_path):
+    pytest.importorskip("pyarrow")
+    panel = make_prices(n_days=50, columns=["AAA"], end=pd.Timestamp.today())
+    RecordingSource(str(tmp_path), source=FakeSource(panel), fmt="parquet").history(["AAA"], period="max")
+
+    assert (tmp_path / "adj_close_1d.parquet").exists()
+    assert np.allclose(ReplaySource(str(tmp_path)).history(["AAA"], period="max")["AAA"], panel["AAA"])
+
+
+def test_full_pipeline_runs_offline_from_replay(make_prices, tmp_path, no_network):
+    prices = make_prices(columns=TICKERS + ["^GSPC"], end=pd.Timestamp.today())
+    write_panel(prices, str(tmp_path / "adj_close_1d.csv"))
+    write_panel(pd.DataFrame({"^TNX": [4.1, 4.2, 4.25]}, index=prices.index[-3:]), str(tmp_path / "close_1d.csv"))
+    sources.set_source(ReplaySource(str(tmp_path)))
+
+    assert risk_free_rate._fetch_treasury_rate() == pytest.approx(0.0425)
+    assert capm.get_market_data(period="1y").name == "^GSPC"
+
+    result = pipeline.run_optimization(TICKERS, period="1y")
+    assert [row["ticker"] for row in result["rows"]] == TICKERS
+
+
+def test_store_window_follows_replay_reference_date(make_prices, tmp_path, no_network):
+    prices = make_prices(n_days=600, columns=TICKERS, end="2024-06-28")
+    write_panel(prices, str(tmp_path / "adj_close_1d.csv"))
+    sources.set_source(ReplaySource(str(tmp_path)))
+
+    # Con el almacén activo (ver conftest) la ventana se cuenta desde la grabación, no desde hoy
+    year = data.get_price_data(TICKERS, period="1y")
+    again = data.get_price_data(TICKERS, period="1y")
+
+    assert year.index[-1] == pd.Timestamp("2024-06-28")
+    assert year.index[0] >= pd.Timestamp("2023-06-28")
+    assert list(again.index) == list(year.index)
+    np.testing.assert_allclose(again.to_numpy(), year.to_numpy())
+    assert sources.PriceSource().reference_date() is None
+
+
+def test_source_selected_from_environment(tmp_path, monkeypatch):
+    assert isinstance(sources.get_source(), sources.YahooSource)
+
+    monkeypatch.setenv("PRICE_SOURCE", "replay")
+    monkeypatch.setenv("PRICE_SOURCE_DIR", str(tmp_path))
+    monkeypatch.setenv("PRICE_SOURCE_LATENCY", "0.2")
+    replay = sources.get_source()
+    assert isinstance(replay, ReplaySource) and replay.latency == 0.2
+    assert sources.get_source() is replay
+
+    monkeypatch.setenv("PRICE_SOURCE", "record")
+    assert isinstance(sources.get_source(), RecordingSource)
+    monkeypatch.setenv("PRICE_SOURCE", "ftp")
+    with pytest.raises(ValueError):
+        sources.get_source()
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from markowitz.data import load_through_store
+from markowitz.store import PriceStore, merge_series, period_start
+
+
+def _series(values, start="2024-01-01", name="AAA"):
+    dates = pd.date_range(start, periods=len(values), freq="D")
+    return pd.Series(values, index=dates, name=name, dtype=float)
+
+
+def test_store_roundtrip(tmp_path):
+    store = PriceStore(str(tmp_path))
+    series = _series([1.0, 2.0, 3.0], name="^GSPC")
+
+    store.save("^GSPC", series, covered_from=None)
+    loaded = store.load("^GSPC")
+
+    assert np.allclose(loaded.values, series.values)
+    assert list(loaded.index) == list(series.index)
+    assert store.load("MISSING") is None
+    assert not store.needs_backfill("^GSPC", pd.Timestamp("2000-01-01"))
+
+
+def test_period_start():
+    today = pd.Timestamp("2024-06-15")
+    assert period_start("1y", today) == pd.Timestamp("2023-06-15")
+    assert period_start("6mo", today) == pd.Timestamp("2023-12-15")
+    assert period_start("max", today) is None
+
+
+def test_merge_series_rescales_history_on_adjustment():
+    stored = _series([10.0, 11.0, 12.0])
+    # Yahoo reajustó el histórico: el día de solape ahora vale la mitad
+    fresh = _series([6.0, 6.5], start="2024-01-03")
+
+    merged = merge_series(stored, fresh)
+
+    assert list(merged.values) == [5.0, 5.5, 6.0, 6.5]
+
+
+def test_load_through_store_fetches_only_missing_days(tmp_path):
+    store = PriceStore(str(tmp_path), max_age=timedelta(0))
+    calls = []
+    start = datetime.now() - timedelta(days=10)
+
+    def fetch(tickers, **kwargs):
+        calls.append(kwargs)
+        if "period" in kwargs:
+            return pd.DataFrame({t: _series([1.0, 2.0, 3.0], start=start) for t in tickers})
+        return pd.DataFrame({t: _series([3.0, 4.0], start=start + timedelta(days=2)) for t in tickers})
+
+    first = load_through_store(store, ["AAA", "BBB"], "1y", fetch)
+    second = load_through_store(store, ["AAA", "BBB"], "1y", fetch)
+
+    assert "period" in calls[0]
+    assert "start" in calls[1]
+    assert len(first) == 3
+    assert len(second) == 4
+    assert list(second["AAA"].values) == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_load_through_store_serves_stored_data_when_offline(tmp_path):
+    store = PriceStore(str(tmp_path), max_age=timedelta(0))
+    start = datetime.now() - timedelta(days=10)
+    store.save("AAA", _series([1.0, 2.0], start=start), covered_from=start - timedelta(days=400))
+
+    def offline_fetch(tickers, **kwargs):
+        raise ConnectionError("sin red")
+
+    data = load_through_store(store, ["AAA"], "1y", offline_fetch)
+
+    assert list(data["AAA"].values) == [1.0, 2.0]
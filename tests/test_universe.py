@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as app_module
+from markowitz.universe import (
+    UniverseIndex,
+    compute_universe_stats,
+    precompute_universe,
+    save_universe_index,
+)
+
+
+def _universe(n_days=300, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2021-01-04", periods=n_days)
+    market = rng.normal(0.0005, 0.01, n_days)
+    chile = rng.normal(0.0003, 0.012, n_days)
+    returns = {
+        "AAA": 0.5 * market + rng.normal(0, 0.004, n_days),
+        "BBB": 1.5 * market + rng.normal(0, 0.004, n_days),
+        "CCC": -0.2 * market + rng.normal(0, 0.01, n_days),
+        "SQM-B.SN": 1.2 * chile + rng.normal(0, 0.004, n_days),
+        "COPEC.SN": 0.8 * chile + rng.normal(0, 0.004, n_days),
+    }
+    prices = pd.DataFrame({t: 100 * np.cumprod(1 + r) for t, r in returns.items()}, index=dates)
+    markets = pd.DataFrame({
+        "^GSPC": 100 * np.cumprod(1 + market),
+        "ECH": 100 * np.cumprod(1 + chile),
+    }, index=dates)
+    return prices, markets
+
+
+def test_universe_stats_match_pandas_on_complete_data():
+    prices, markets = _universe()
+
+    stats = compute_universe_stats(prices, markets)
+
+    returns = prices.pct_change().dropna()
+    market_returns = markets["^GSPC"].pct_change().dropna()
+    expected_beta = returns["BBB"].cov(market_returns) / market_returns.var()
+    gspc = stats["proxies"].index("^GSPC")
+    assert stats["betas"][1, gspc] == pytest.approx(expected_beta)
+    assert stats["volatilities"][0] == pytest.approx(returns["AAA"].std() * np.sqrt(252))
+    np.testing.assert_allclose(stats["correlation"], returns.corr().to_numpy(), atol=1e-6)
+    # Las acciones chilenas usan ECH como proxy propio
+    assert stats["proxies"][stats["market"][3]] == "ECH"
+    assert stats["proxies"][stats["market"][0]] == "^GSPC"
+
+
+def test_universe_stats_handle_different_calendars():
+    prices, markets = _universe()
+    prices.iloc[10:20, 3] = np.nan  # feriados locales
+    prices.iloc[:5, 0] = np.nan     # ticker que empieza a cotizar después
+
+    stats = compute_universe_stats(prices, markets)
+
+    assert stats["observations"][0] == len(prices) - 6
+    assert stats["observations"][3] == len(prices) - 11
+    assert not np.isnan(stats["correlation"]).any()
+
+
+def test_universe_index_screens_without_recomputing(tmp_path):
+    prices, markets = _universe()
+    save_universe_index(str(tmp_path), compute_universe_stats(prices, markets), period="1y")
+
+    index = UniverseIndex.load(str(tmp_path))
+
+    assert [row["ticker"] for row in index.screen("beta", n=2)] == ["CCC", "AAA"]
+    assert [row["ticker"] for row in index.screen("beta", n=1, suffix=".SN")] == ["COPEC.SN"]
+    assert index.screen("volatility", n=1, ascending=False)[0]["ticker"] == "BBB"
+    least = index.least_correlated("BBB", n=5)
+    assert least[0]["ticker"] == "CCC"
+    assert "BBB" not in [row["ticker"] for row in least]
+    assert index.stats("SQM-B.SN")["market"] == "ECH"
+    with pytest.raises(ValueError):
+        index.screen("sharpe")
+    with pytest.raises(KeyError):
+        index.least_correlated("ZZZ")
+
+
+def test_precompute_universe_downloads_in_chunks(tmp_path):
+    prices, markets = _universe()
+    panel = pd.concat([prices, markets], axis=1)
+    calls = []
+
+    def fake_fetch(tickers, **kwargs):
+        calls.append(list(tickers))
+        return panel.reindex(columns=[t for t in tickers if t in panel.columns])
+
+    index = precompute_universe(list(prices.columns), str(tmp_path), period="max",
+                                chunk_size=2, fetch=fake_fetch, use_store=False)
+
+    assert len(index) == 5
+    assert calls[:3] == [["AAA", "BBB"], ["CCC", "SQM-B.SN"], ["COPEC.SN"]]
+
+
+def test_universe_endpoints(tmp_path, monkeypatch):
+    prices, markets = _universe()
+    save_universe_index(str(tmp_path), compute_universe_stats(prices, markets), period="1y")
+    monkeypatch.setenv("UNIVERSE_INDEX_DIR", str(tmp_path))
+    client = app_module.create_app().test_client()
+
+    body = client.get("/api/universe/screen?metric=beta&suffix=.SN&n=1").get_json()
+    assert body["results"][0]["ticker"] == "COPEC.SN"
+    assert client.get("/api/universe/screen?metric=nope").status_code == 400
+
+    body = client.get("/api/universe/least-correlated/bbb?n=1").get_json()
+    assert body["results"][0]["ticker"] == "CCC"
+    assert client.get("/api/universe/least-correlated/ZZZ").status_code == 404
+
+    monkeypatch.setenv("UNIVERSE_INDEX_DIR", str(tmp_path / "missing"))
+    assert client.get("/api/universe/screen").status_code == 404
@@ -0,0 +1,60 @@
+import threading
+import time
+
+import app as app_module
+from markowitz import risk_free_rate as rfr
+from markowitz import warmup
+
+
+def test_lazy_import_resolves_on_first_call():
+    proxy = warmup.lazy_import("markowitz.store", "period_start")
+
+    assert proxy.__name__ == "period_start"
+    assert str(proxy("1y", "2024-06-15").date()) == "2023-06-15"
+
+
+def test_landing_page_revalidates_rate_in_background(monkeypatch):
+    release = threading.Event()
+    fetches = []
+
+    def slow_fetch():
+        fetches.append(1)
+        release.wait(5)
+        return 0.045
+
+    rfr.clear_risk_free_rate_cache()
+    monkeypatch.setattr(rfr, "_fetch_treasury_rate", slow_fetch)
+    client = app_module.create_app().test_client()
+
+    # La primera visita no espera la descarga: muestra el estimado y la programa
+    assert client.get("/").status_code == 200
+    assert rfr.peek_risk_free_rate_info()["source"] == rfr.SOURCE_FALLBACK
+    release.set()
+    deadline = time.monotonic() + 5
+    while rfr.peek_risk_free_rate_info()["source"] != rfr.SOURCE_CACHED and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert rfr.peek_risk_free_rate_info()["rate"] == 0.045
+    assert len(fetches) == 1
+
+    # Vencido el TTL, la siguiente visita vuelve a revalidar
+    rfr.peek_risk_free_rate_info(ttl=0)
+    deadline = time.monotonic() + 5
+    while (len(fetches) < 2 or rfr._cache["refreshing"]) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(fetches) == 2
+    rfr.clear_risk_free_rate_cache()
+
+
+def test_warmup_endpoint_loads_modules_and_caches_rate(monkeypatch):
+    rfr.clear_risk_free_rate_cache()
+    monkeypatch.setattr(rfr, "_fetch_treasury_rate", lambda: 0.042)
+    client = app_module.create_app().test_client()
+
+    body = client.get("/warmup").get_json()
+
+    assert set(warmup.loaded_heavy_modules()) == set(warmup.HEAVY_MODULES)
+    assert body["seconds"] >= 0
+    assert rfr.peek_risk_free_rate_info() == {"rate": 0.042, "source": rfr.SOURCE_CACHED,
+                                              "fetched_at": rfr._cache["fetched_at"]}
+    assert client.post("/warmup").get_json()["already_warm"]
+    rfr.clear_risk_free_rate_cache()